@@ -0,0 +1,157 @@
+import os
+import math
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from congestion_history import HOTSPOT_THRESHOLD, congestion_history
+from traffic_probes import (
+    GRID_LAT_SPAN,
+    GRID_LNG_SPAN,
+    PROBE_BATCH_SIZE,
+    async_city_center,
+    async_measure_congestion,
+    probe_store,
+)
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# "grid" probes the uniform sample_points grid, "adaptive" refines a coarse quadtree
+SAMPLING_MODE = os.environ.get("HOTSPOT_SAMPLING_MODE", "grid")
+# Cells at least this congested are subdivided; kept below the 1.3 hotspot
+# cut-off so congestion that peaks between coarse nodes is still found
+REFINE_THRESHOLD = float(os.environ.get("HOTSPOT_REFINE_THRESHOLD", 1.2))
+# Levels of subdivision below the coarse grid (each level halves the cell size)
+MAX_DEPTH = int(os.environ.get("HOTSPOT_MAX_DEPTH", 3))
+# Distance Matrix requests per scan; by default what the uniform grid would use
+CALL_BUDGET = os.environ.get("HOTSPOT_CALL_BUDGET")
+
+
+class Cell:
+    """One quadtree cell, probed at its center"""
+
+    __slots__ = ("lat", "lng", "half_lat", "half_lng", "depth")
+
+    def __init__(
+        self, lat: float, lng: float, half_lat: float, half_lng: float, depth: int
+    ):
+        self.lat = lat
+        self.lng = lng
+        self.half_lat = half_lat
+        self.half_lng = half_lng
+        self.depth = depth
+
+    def children(self) -> List["Cell"]:
+        """The four quadrants of this cell"""
+        half_lat, half_lng = self.half_lat / 2, self.half_lng / 2
+        return [
+            Cell(
+                self.lat + dlat * half_lat,
+                self.lng + dlng * half_lng,
+                half_lat,
+                half_lng,
+                self.depth + 1,
+            )
+            for dlat in (-1, 1)
+            for dlng in (-1, 1)
+        ]
+
+
+def coarse_cells(center_lat: float, center_lng: float, grid_size: int) -> List[Cell]:
+    """Square grid of grid_size x grid_size cells covering the scan area"""
+    cell_lat = GRID_LAT_SPAN / grid_size
+    cell_lng = GRID_LNG_SPAN / grid_size
+    south = center_lat - GRID_LAT_SPAN / 2
+    west = center_lng - GRID_LNG_SPAN / 2
+    return [
+        Cell(
+            south + (i + 0.5) * cell_lat,
+            west + (j + 0.5) * cell_lng,
+            cell_lat / 2,
+            cell_lng / 2,
+            0,
+        )
+        for i in range(grid_size)
+        for j in range(grid_size)
+    ]
+
+
+def default_budget(sample_points: int) -> int:
+    """Distance Matrix requests the uniform grid spends on its sample_points nodes"""
+    if CALL_BUDGET:
+        return max(1, int(CALL_BUDGET))
+    grid_nodes = int(sample_points**0.5) ** 2
+    return max(1, math.ceil(grid_nodes / PROBE_BATCH_SIZE))
+
+
+async def async_adaptive_scan(
+    city: str,
+    sample_points: int = 60,
+    budget: Optional[int] = None,
+    refine_threshold: float = REFINE_THRESHOLD,
+    max_depth: int = MAX_DEPTH,
+) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    Probe a coarse grid, then subdivide only the congested cells.
+
+    The coarse grid has a quarter of sample_points cells. Each round measures
+    the children of every cell at or above refine_threshold, most congested
+    first, until max_depth is reached or the Distance Matrix request budget
+    runs out. Snapping new cell centers does not count against the budget;
+    it happens once per point and is persisted by the probe store.
+
+    Args:
+        city: City to scan
+        sample_points: Size of the equivalent uniform grid
+        budget: Distance Matrix requests to spend (default: same as the uniform grid)
+        refine_threshold: Congestion factor at which a cell is subdivided
+        max_depth: Maximum subdivision depth below the coarse grid
+
+    Returns:
+        (probe, congestion_factor) for every measured cell
+    """
+    budget = budget or default_budget(sample_points)
+    center = await async_city_center(city)
+    if center is None:
+        return []
+
+    grid_size = max(2, int((sample_points / 4) ** 0.5))
+    cells = coarse_cells(center[0], center[1], grid_size)
+
+    # Probe historically congested cells first; if a very small budget cannot
+    # cover the coarse grid, those are the ones that are kept
+    probes = await probe_store.snap_points(city, [(c.lat, c.lng) for c in cells])
+    order = sorted(
+        range(len(cells)),
+        key=lambda i: -(congestion_history.prior(probes[i]) or HOTSPOT_THRESHOLD),
+    )
+    cells = [cells[i] for i in order[: budget * PROBE_BATCH_SIZE]]
+
+    measured = []
+    requests = 0
+    while cells:
+        probes = await probe_store.snap_points(city, [(c.lat, c.lng) for c in cells])
+        factors = await async_measure_congestion(probes)
+        requests += math.ceil(len(cells) / PROBE_BATCH_SIZE)
+
+        congested = []
+        for cell, probe, factor in zip(cells, probes, factors):
+            if factor is None:
+                continue
+            measured.append((probe, factor))
+            if factor >= refine_threshold and cell.depth < max_depth:
+                congested.append((factor, cell))
+
+        # Spend what is left on the most congested cells, four probes each
+        remaining = budget - requests
+        affordable = remaining * PROBE_BATCH_SIZE // 4
+        congested.sort(key=lambda item: item[0], reverse=True)
+        cells = [
+            child for _, cell in congested[:affordable] for child in cell.children()
+        ]
+
+    logger.info(
+        f"Adaptive scan of {city} measured {len(measured)} probes "
+        f"with {requests}/{budget} Distance Matrix requests"
+    )
+    return measured
@@ -0,0 +1,219 @@
+"""
+Native ASGI entry point for the recommender API.
+
+Serves the same routes as the Flask app in server.py, but every handler is a
+coroutine running directly on the ASGI server's event loop, so concurrency is
+bounded by upstream I/O instead of a pool of blocked worker threads.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import logging
+import contextlib
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import server
+from async_runtime import io_loop
+
+logger = logging.getLogger(__name__)
+
+
+def error_response(e: Exception) -> JSONResponse:
+    return JSONResponse({"status": "error", "message": f"Error: {str(e)}"}, 500)
+
+
+async def health_check(request):
+    """Health check endpoint to verify server is running"""
+    return JSONResponse(
+        {"status": "healthy", "model_loaded": server.model_data is not None}
+    )
+
+
+async def get_stats_api(request):
+    """API endpoint exposing cache, request coalescing and rate limiter counters"""
+    return JSONResponse(server.collect_stats())
+
+
+async def get_traffic_hotspots_api(request):
+    """API endpoint to get traffic hotspots"""
+    try:
+        sample_points = int(request.query_params.get("sample_points", 60))
+        body, status = await server.async_traffic_hotspots_response(sample_points)
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(f"Error getting traffic hotspots: {str(e)}", exc_info=True)
+        return error_response(e)
+
+
+async def api_get_recommendations(request):
+    """API endpoint to get location recommendations based on time"""
+    try:
+        time_input = request.query_params.get("time", None)
+        top_n = int(request.query_params.get("top_n", 5))
+        body, status = await server.async_recommendations_response(time_input, top_n)
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(f"Error getting recommendations: {str(e)}", exc_info=True)
+        return error_response(e)
+
+
+async def find_parking_spots_api(request):
+    """API endpoint to find parking spots near hotspots or specific locations"""
+    try:
+        params = request.query_params
+        try:
+            limit = server.parse_limit(params.get("limit"))
+        except ValueError as e:
+            return JSONResponse(*server.bad_request(e))
+        body, status = await server.async_find_parking_response(
+            params.get("lat"),
+            params.get("lng"),
+            params.get("location"),
+            int(params.get("radius", 300)),
+            int(params.get("max_results", 3)),
+            limit,
+        )
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(f"Error finding parking spots: {str(e)}", exc_info=True)
+        return error_response(e)
+
+
+async def api_get_recommendations_with_parking(request):
+    """API endpoint to get location recommendations and nearby parking spots"""
+    try:
+        params = request.query_params
+        try:
+            limit = server.parse_limit(params.get("limit"))
+        except ValueError as e:
+            return JSONResponse(*server.bad_request(e))
+        body, status = await server.async_recommendations_with_parking_response(
+            params.get("time", None),
+            int(params.get("top_n", 5)),
+            int(params.get("radius", 300)),
+            limit,
+        )
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(
+            f"Error getting recommendations with parking: {str(e)}", exc_info=True
+        )
+        return error_response(e)
+
+
+async def parking_spots_page_api(request):
+    """API endpoint for further pages of a parking response"""
+    try:
+        params = request.query_params
+        try:
+            limit = server.parse_limit(params.get("limit"))
+        except ValueError as e:
+            return JSONResponse(*server.bad_request(e))
+        body, status = await server.async_parking_spots_page_response(
+            params.get("cursor"), limit
+        )
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(f"Error paging parking spots: {str(e)}", exc_info=True)
+        return error_response(e)
+
+
+async def walking_details_api(request):
+    """API endpoint with walking directions (polyline and steps) for one parking spot"""
+    try:
+        body, status = await server.async_walking_details_response(
+            request.path_params["spot_id"]
+        )
+        return JSONResponse(body, status)
+    except Exception as e:
+        logger.error(f"Error getting walking directions: {str(e)}", exc_info=True)
+        return error_response(e)
+
+
+async def stream_traffic_hotspots_api(request):
+    """Streaming variant of /api/traffic-hotspots (NDJSON, or SSE with ?format=sse)"""
+    sample_points = int(request.query_params.get("sample_points", 60))
+    media_type = server.stream_media_type(
+        request.query_params.get("format"), request.headers.get("accept")
+    )
+    events = server.async_stream_traffic_hotspots(sample_points)
+    return StreamingResponse(
+        server.encode_stream(events, media_type),
+        media_type=media_type,
+        headers=server.STREAM_HEADERS,
+    )
+
+
+async def stream_recommendations_with_parking_api(request):
+    """Streaming variant of /api/get-recommendations-with-parking"""
+    if not server.model_data:
+        body, status = server.MODEL_NOT_LOADED
+        return JSONResponse(body, status)
+
+    params = request.query_params
+    try:
+        limit = server.parse_limit(params.get("limit"))
+    except ValueError as e:
+        return JSONResponse(*server.bad_request(e))
+    media_type = server.stream_media_type(
+        params.get("format"), request.headers.get("accept")
+    )
+    events = server.async_stream_recommendations_with_parking(
+        params.get("time", None),
+        int(params.get("top_n", 5)),
+        int(params.get("radius", 300)),
+        limit,
+    )
+    return StreamingResponse(
+        server.encode_stream(events, media_type),
+        media_type=media_type,
+        headers=server.STREAM_HEADERS,
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Load the model and probe sets, open the session and start the refresher"""
+    server.load_model_on_startup(server.DEFAULT_MODEL_PATH)
+    server.probe_store.load()
+    await io_loop.attach()
+    await server.hotspot_refresher.start()
+    try:
+        yield
+    finally:
+        await server.hotspot_refresher.stop()
+        await io_loop.detach()
+
+
+routes = [
+    Route("/health", health_check, methods=["GET"]),
+    Route("/api/stats", get_stats_api, methods=["GET"]),
+    Route("/api/traffic-hotspots", get_traffic_hotspots_api, methods=["GET"]),
+    Route("/api/traffic-hotspots/stream", stream_traffic_hotspots_api, methods=["GET"]),
+    Route("/api/get-recommendations", api_get_recommendations, methods=["GET"]),
+    Route("/api/find-parking", find_parking_spots_api, methods=["GET"]),
+    Route("/api/parking-spots", parking_spots_page_api, methods=["GET"]),
+    Route("/api/parking-spots/{spot_id}/walking", walking_details_api, methods=["GET"]),
+    Route(
+        "/api/get-recommendations-with-parking",
+        api_get_recommendations_with_parking,
+        methods=["GET"],
+    ),
+    Route(
+        "/api/get-recommendations-with-parking/stream",
+        stream_recommendations_with_parking_api,
+        methods=["GET"],
+    ),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"])],
+    lifespan=lifespan,
+)
@@ -0,0 +1,142 @@
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Any, AsyncGenerator, Coroutine, Iterator, Optional
+
+import aiohttp
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning for outbound Google Maps traffic
+POOL_SIZE = int(os.environ.get("MAPS_POOL_SIZE", 100))
+POOL_SIZE_PER_HOST = int(os.environ.get("MAPS_POOL_SIZE_PER_HOST", 30))
+DNS_CACHE_TTL = int(os.environ.get("MAPS_DNS_CACHE_TTL", 300))
+KEEPALIVE_TIMEOUT = float(os.environ.get("MAPS_KEEPALIVE_TIMEOUT", 60))
+REQUEST_TIMEOUT = float(os.environ.get("MAPS_REQUEST_TIMEOUT", 30))
+
+
+def create_session() -> aiohttp.ClientSession:
+    """Create the pooled keep-alive session; must be called on the loop that will use it"""
+    connector = aiohttp.TCPConnector(
+        limit=POOL_SIZE,
+        limit_per_host=POOL_SIZE_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+
+class BackgroundLoop:
+    """
+    A long-lived event loop running in a dedicated daemon thread.
+
+    The loop owns one aiohttp session for the whole process, so TCP and TLS
+    connections are reused across requests. Synchronous code hands coroutines
+    to it with submit() and waits on the returned concurrent.futures.Future.
+    """
+
+    def __init__(self, name: str = "maps-io-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._thread: Optional[threading.Thread] = None
+        self._attached = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread and open the session (idempotent)"""
+        with self._lock:
+            if self._attached or (self._thread is not None and self._thread.is_alive()):
+                return
+
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._run, name=self.name, daemon=True
+            )
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._open_session(), self.loop).result()
+            logger.info(f"Started background event loop '{self.name}'")
+
+    async def attach(self):
+        """
+        Adopt the currently running loop instead of starting a thread.
+
+        Used by the ASGI entry point, where the server's own loop runs the
+        handlers and must also own the session.
+        """
+        with self._lock:
+            self.loop = asyncio.get_running_loop()
+            self.session = create_session()
+            self._attached = True
+        logger.info(f"Attached '{self.name}' to the running event loop")
+
+    async def detach(self):
+        """Close the session opened by attach()"""
+        if self.session is not None:
+            await self.session.close()
+        with self._lock:
+            self.session = None
+            self.loop = None
+            self._attached = False
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _open_session(self):
+        self.session = create_session()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the background loop from any thread"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the background loop and block until it finishes"""
+        return self.submit(coro).result(timeout)
+
+    def iterate(self, agen: AsyncGenerator) -> Iterator:
+        """
+        Drive an async generator on the background loop from synchronous code.
+
+        Each item is produced on the loop and handed back as soon as it is
+        ready, which lets WSGI responses stream the output of coroutines.
+        """
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(agen.aclose())
+
+    def stop(self):
+        """Close the session and stop the loop thread"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                return
+
+            if self.session is not None:
+                asyncio.run_coroutine_threadsafe(
+                    self.session.close(), self.loop
+                ).result()
+                self.session = None
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self._thread = None
+            logger.info(f"Stopped background event loop '{self.name}'")
+
+
+# Process-wide loop used by the Flask handlers
+io_loop = BackgroundLoop()
+atexit.register(io_loop.stop)
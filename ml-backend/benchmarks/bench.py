@@ -0,0 +1,403 @@
+"""
+Micro-benchmarks for the ml-backend hot paths.
+
+Measures p50/p95/p99 latency, throughput and peak allocations per call for
+the recommendation helpers and for every Flask route end to end. Upstream
+Google calls are answered in-process by the synthetic responders from
+fake_maps_server.py, so results do not depend on the network or quota.
+
+Usage:
+    python benchmarks/bench.py                    # compare against baselines.json
+    python benchmarks/bench.py --update-baseline  # record new baselines
+    python benchmarks/bench.py --filter route     # run a subset
+
+Every benchmark runs --repeat times and keeps its fastest run. A p50 only
+counts as a regression when it is past --threshold and also slower than the
+baseline by more than that benchmark's noise margin: --spread times its
+baseline p95 - p50, or its opt-in floor_ms for the noisiest routes. Exits
+with status 1 on a regression.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import tempfile
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep benchmark runs away from the on-disk caches and the real API
+os.environ["GEOCODE_CACHE_PATH"] = ""
+os.environ["CONGESTION_HISTORY_PATH"] = ""
+os.environ["PARKING_CATALOGUE_PATH"] = ""
+os.environ["WALKING_LEGS_PATH"] = ""
+os.environ["PARKING_RESULTS_PATH"] = ""
+os.environ["TRAFFIC_PROBE_DIR"] = tempfile.mkdtemp(prefix="bench-probes-")
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "benchmark")
+
+import numpy as np  # noqa: E402
+
+import server  # noqa: E402
+import geo_distance  # noqa: E402
+import parking_catalogue  # noqa: E402
+import traffic_probes  # noqa: E402
+import walking_legs  # noqa: E402
+from fake_maps_server import SYNTHESIZERS  # noqa: E402
+from geocode_utils import parse_reverse_geocode_result  # noqa: E402
+from maps_client import fixture_endpoint  # noqa: E402
+from namma_yatri_recommender import get_recommended_locations  # noqa: E402
+from parking_planner import rank_parking_spots  # noqa: E402
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baselines.json"
+)
+MODEL_PATH = os.path.join(BACKEND_DIR, "namma_yatri_location_model.pkl")
+
+logger = logging.getLogger(__name__)
+
+
+async def fake_fetch_json(session, url: str) -> Dict[str, Any]:
+    """Answer Maps requests in-process with the fake server's synthetic responders"""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+    return SYNTHESIZERS[fixture_endpoint(parts.path)](params)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return sorted_values[rank]
+
+
+def measure(
+    func: Callable[[], Any], iterations: int, warmup: int, inner: int = 1
+) -> Dict[str, float]:
+    """
+    Time func() and measure its peak allocations.
+
+    Each sample runs func() `inner` times so sub-microsecond helpers are not
+    dominated by timer overhead. Timing and allocation tracking run in
+    separate passes because tracemalloc slows every allocation down.
+    """
+    for _ in range(warmup):
+        func()
+
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            func()
+        timings.append((time.perf_counter() - t0) / inner)
+    elapsed = time.perf_counter() - start
+    timings.sort()
+
+    alloc_iterations = max(1, iterations // 10)
+    peaks = []
+    tracemalloc.start()
+    for _ in range(alloc_iterations):
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "ops_per_sec": round(iterations * inner / elapsed, 1) if elapsed else 0.0,
+        "alloc_peak_kb": round(sum(peaks) / len(peaks) / 1024, 2),
+    }
+
+
+def best_of(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """The run with the lowest p50, with the lowest allocation peak of all runs"""
+    best = dict(min(runs, key=lambda r: r["p50_ms"]))
+    best["alloc_peak_kb"] = min(r["alloc_peak_kb"] for r in runs)
+    return best
+
+
+def build_benchmarks() -> Dict[str, Dict[str, Any]]:
+    """Create the benchmark callables, keyed by name"""
+    model = server.model_data
+    rng = random.Random(42)
+
+    # Parking search results for ten hotspots, as returned by the Places API
+    parking_results = []
+    for _ in range(10):
+        spots = []
+        for _ in range(20):
+            spots.append(
+                {
+                    "place_id": f"place_{rng.randint(0, 150)}",
+                    "is_edge_location": rng.random() > 0.5,
+                    "distance_from_hotspot": rng.randint(0, 800),
+                }
+            )
+        parking_results.append(spots)
+
+    reverse_response = SYNTHESIZERS["geocode"]({"latlng": "12.9716,77.5946"})
+    reverse_result = reverse_response["results"][0]
+    points = [
+        (12.9 + rng.random() * 0.1, 77.5 + rng.random() * 0.1) for _ in range(1000)
+    ]
+    point_array = np.array(points)
+    hotspot_array = point_array[:50]
+    point_distances = geo_distance.distances_from(12.97, 77.59, point_array)
+    client = server.app.test_client()
+
+    def route(path):
+        def call():
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+
+        return call
+
+    return {
+        "helper.get_recommended_locations": {
+            "func": lambda: get_recommended_locations(
+                "09:30",
+                model["top_locations_by_hour"],
+                model["time_block_locations"],
+                model["duration_map"],
+                5,
+            ),
+            "iterations": 500,
+            "inner": 100,
+        },
+        "helper.calculate_distance_x1000": {
+            "func": lambda: [
+                geo_distance.calculate_distance(12.97, 77.59, lat, lng)
+                for lat, lng in points
+            ],
+            "iterations": 500,
+        },
+        "helper.haversine_x1000": {
+            "func": lambda: geo_distance.distances_from(12.97, 77.59, point_array),
+            "iterations": 500,
+            "inner": 10,
+        },
+        "helper.distance_matrix_1000x50": {
+            "func": lambda: geo_distance.distance_matrix(point_array, hotspot_array),
+            "iterations": 200,
+        },
+        "helper.top_k_10_of_1000": {
+            "func": lambda: geo_distance.top_k(point_distances, 10),
+            "iterations": 500,
+            "inner": 50,
+        },
+        "helper.rank_parking_spots": {
+            "func": lambda: rank_parking_spots(parking_results),
+            "iterations": 500,
+            "inner": 20,
+        },
+        "helper.parse_reverse_geocode_result": {
+            "func": lambda: parse_reverse_geocode_result(reverse_result),
+            "iterations": 500,
+            "inner": 500,
+        },
+        "route.health": {"func": route("/health"), "iterations": 500},
+        "route.get_recommendations": {
+            "func": route("/api/get-recommendations?time=09:00"),
+            "iterations": 200,
+        },
+        "route.traffic_hotspots": {
+            "func": route("/api/traffic-hotspots"),
+            "iterations": 200,
+            # Around a millisecond, where scheduling alone moves p50 by 50%
+            "floor_ms": 1.0,
+        },
+        "route.find_parking_location": {
+            "func": route("/api/find-parking?location=Chickpet"),
+            "iterations": 200,
+            # Around a millisecond, where scheduling alone moves p50 by 50%
+            "floor_ms": 1.0,
+        },
+        "route.find_parking_coordinates": {
+            "func": route("/api/find-parking?lat=12.9716&lng=77.5946"),
+            "iterations": 200,
+            # Around a millisecond, where scheduling alone moves p50 by 50%
+            "floor_ms": 1.0,
+        },
+        "route.get_recommendations_with_parking": {
+            "func": route("/api/get-recommendations-with-parking?time=18:00"),
+            "iterations": 100,
+        },
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baselines: Dict[str, Dict[str, float]],
+    threshold: float,
+    spread: float = 1.0,
+    floors: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    """
+    Return a description of every metric that regressed past the threshold.
+
+    A p50 slowdown within the benchmark's noise margin is ignored whatever
+    its percentage. The margin is spread times the baseline p95 - p50, or
+    the benchmark's entry in floors (milliseconds) if that is larger.
+    """
+    floors = floors or {}
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        # Tail percentiles are reported but too noisy to gate on
+        for metric in ("p50_ms", "alloc_peak_kb"):
+            base = baseline.get(metric)
+            if metric == "p50_ms" and base:
+                margin = max(
+                    spread * (baseline.get("p95_ms", base) - base),
+                    floors.get(name, 0.0),
+                )
+                if result[metric] - base <= margin:
+                    continue
+            if base and result[metric] > base * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {result[metric]} vs baseline {base} "
+                    f"(+{(result[metric] / base - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="ml-backend micro-benchmarks")
+    parser.add_argument(
+        "--filter", type=str, default="", help="Only run benchmarks containing this"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown relative to the baseline (0.5 = 50%%)",
+    )
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=1.0,
+        help="Noise margin of a p50, in multiples of its baseline p95 - p50",
+    )
+    parser.add_argument(
+        "--floor-ms",
+        type=float,
+        default=0.0,
+        help="Minimum noise margin in milliseconds for every benchmark (opt-in)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per benchmark; the fastest one is reported",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply every benchmark's iteration count",
+    )
+    parser.add_argument(
+        "--baseline", type=str, default=BASELINE_PATH, help="Baseline JSON file"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--json", type=str, default=None, help="Also write the results to this file"
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    server.load_model_on_startup(MODEL_PATH)
+    # Every module that calls Google holds its own reference to fetch_json
+    for module in (server, traffic_probes, parking_catalogue, walking_legs):
+        module.fetch_json = fake_fetch_json
+
+    benchmarks = build_benchmarks()
+    results = {}
+    for name, bench in benchmarks.items():
+        if args.filter not in name:
+            continue
+        iterations = max(1, int(bench["iterations"] * args.scale))
+        results[name] = best_of(
+            [
+                measure(
+                    bench["func"],
+                    iterations,
+                    warmup=max(1, iterations // 10),
+                    inner=bench.get("inner", 1),
+                )
+                for _ in range(max(1, args.repeat))
+            ]
+        )
+        r = results[name]
+        print(
+            f"{name:42s} p50 {r['p50_ms']:9.3f}ms  p95 {r['p95_ms']:9.3f}ms  "
+            f"p99 {r['p99_ms']:9.3f}ms  {r['ops_per_sec']:10.1f} ops/s  "
+            f"{r['alloc_peak_kb']:9.1f} KB"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baselines written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+
+    with open(args.baseline) as f:
+        baselines = json.load(f)
+    floors = {
+        name: max(args.floor_ms, bench.get("floor_ms", 0.0))
+        for name, bench in benchmarks.items()
+    }
+    regressions = compare(results, baselines, args.threshold, args.spread, floors)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) past {args.threshold * 100:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"\nNo regressions past {args.threshold * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Chunked training over large trip logs.
+
+Reads Trips and Trip_Details a chunk at a time from CSV or Parquet files and
+keeps only what the model needs: the sorted array of completed trip ids and
+per-hour origin/destination counts per location. Peak memory is one chunk
+plus those aggregates, however long the trip history is, and the result is
+the same as preprocess_data followed by analyze_location_patterns.
+
+The data directory holds one file per sheet, <Sheet>.parquet or
+<Sheet>.csv, e.g. a directory of the Parquet ingest cache.
+"""
+
+import os
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ingest_cache import DEFAULT_CACHE_DIR, convert_workbook, pq
+from namma_yatri_recommender import build_mappings, rank_location_activity
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Rows read at a time from the Trips and Trip_Details files
+DEFAULT_CHUNK_SIZE = int(os.environ.get("TRAINING_CHUNK_SIZE", 250000))
+SHEETS = ["Trips", "Trip_Details", "Duration", "Assembly"]
+
+
+def sheet_file(data_dir: str, sheet: str) -> str:
+    """Parquet or CSV file of a sheet in a data directory"""
+    for extension in (".parquet", ".csv"):
+        path = os.path.join(data_dir, sheet + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {sheet}.parquet or {sheet}.csv in {data_dir}")
+
+
+def iter_chunks(
+    path: str, columns: Optional[List[str]], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    """
+    DataFrames of at most chunk_size rows from a Parquet or CSV file.
+
+    Args:
+        path: File to read
+        columns: Columns to read, or None for every column
+        chunk_size: Maximum rows per chunk
+    """
+    if path.endswith(".parquet"):
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet training data")
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=columns
+        ):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+def read_sheet(path: str) -> pd.DataFrame:
+    """A small lookup sheet (Duration, Assembly) in full"""
+    return pd.concat(iter_chunks(path, None), ignore_index=True)
+
+
+def sorted_unique(arrays: List[np.ndarray]) -> np.ndarray:
+    """Sorted distinct values of several integer arrays"""
+    values = np.sort(np.concatenate(arrays))
+    if len(values) < 2:
+        return values
+    return values[np.concatenate(([True], values[1:] != values[:-1]))]
+
+
+def completed_trip_ids(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """Sorted unique ids of trips with end_ride == 1 in Trip_Details"""
+    completed = np.empty(0, dtype=np.int64)
+    pending = []
+    pending_size = 0
+    for chunk in iter_chunks(path, ["tripid", "end_ride"], chunk_size):
+        ids = chunk.loc[chunk["end_ride"] == 1, "tripid"].to_numpy(dtype=np.int64)
+        pending.append(ids)
+        pending_size += len(ids)
+        # Merge once the pending ids outgrow the merged ones, so every id is
+        # re-sorted only a logarithmic number of times
+        if pending_size > max(len(completed), chunk_size):
+            completed = sorted_unique([completed, *pending])
+            pending, pending_size = [], 0
+    if pending:
+        completed = sorted_unique([completed, *pending])
+    return completed
+
+
+def hours_by_duration(duration_map: Dict) -> Dict:
+    """Starting hour of every duration id, e.g. '17-18' -> 17"""
+    return {key: int(str(value).split("-")[0]) for key, value in duration_map.items()}
+
+
+def count_location_activity(
+    trips_path: str,
+    completed: np.ndarray,
+    duration_map: Dict,
+    assembly_map: Dict,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Tuple[pd.DataFrame, pd.DataFrame, int, int]:
+    """
+    Per-hour origin and destination counts of completed trips.
+
+    Returns:
+        (origin_counts, dest_counts, completed trips, total trips), with the
+        counts shaped like the groupby().size() frames in
+        analyze_location_patterns
+    """
+    hours = hours_by_duration(duration_map)
+    origin_total = None
+    dest_total = None
+    completed_count = 0
+    total_count = 0
+
+    columns = ["tripid", "loc_from", "loc_to", "duration"]
+    for chunk in iter_chunks(trips_path, columns, chunk_size):
+        total_count += len(chunk)
+        # completed is sorted, so membership is a binary search per trip
+        tripids = chunk["tripid"].to_numpy(dtype=np.int64)
+        if len(completed):
+            index = np.searchsorted(completed, tripids)
+            np.minimum(index, len(completed) - 1, out=index)
+            mask = completed[index] == tripids
+        else:
+            mask = np.zeros(len(tripids), dtype=bool)
+        trips = chunk[mask]
+        completed_count += len(trips)
+        if trips.empty:
+            continue
+
+        hour_start = trips["duration"].map(hours)
+        if hour_start.isna().any():
+            unknown = trips.loc[hour_start.isna(), "duration"].unique().tolist()
+            raise ValueError(f"Trips reference unknown duration ids: {unknown}")
+        frame = pd.DataFrame(
+            {
+                "hour_start": hour_start.astype(int).to_numpy(),
+                "from_location": trips["loc_from"].map(assembly_map).to_numpy(),
+                "to_location": trips["loc_to"].map(assembly_map).to_numpy(),
+            }
+        )
+
+        origins = frame.groupby(["hour_start", "from_location"]).size()
+        dests = frame.groupby(["hour_start", "to_location"]).size()
+        origin_total = (
+            origins if origin_total is None else origin_total.add(origins, fill_value=0)
+        )
+        dest_total = (
+            dests if dest_total is None else dest_total.add(dests, fill_value=0)
+        )
+
+    def counts_frame(total, location_column, count_column):
+        if total is None:
+            return pd.DataFrame(
+                {
+                    "hour_start": pd.Series(dtype=int),
+                    location_column: pd.Series(dtype=object),
+                    count_column: pd.Series(dtype="int64"),
+                }
+            )
+        # Same row order and dtypes as a single groupby over all trips
+        total = total.sort_index().astype("int64")
+        total.index = total.index.set_names(["hour_start", location_column])
+        return total.reset_index(name=count_column)
+
+    return (
+        counts_frame(origin_total, "from_location", "origin_count"),
+        counts_frame(dest_total, "to_location", "dest_count"),
+        completed_count,
+        total_count,
+    )
+
+
+def resolve_data_dir(path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Data directory for a path: itself, or the Parquet ingest cache of a workbook"""
+    if os.path.isdir(path):
+        return path
+    if pq is None:
+        raise ImportError("pyarrow is required to stream a workbook")
+    return convert_workbook(path, SHEETS, cache_dir)
+
+
+def train_chunked(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple:
+    """
+    Train from trip data read a chunk at a time.
+
+    Args:
+        path: Data directory of per-sheet Parquet/CSV files, or an Excel workbook
+            (converted once through the ingest cache)
+        chunk_size: Rows read at a time from Trips and Trip_Details
+
+    Returns:
+        (top_locations_by_hour, location_totals, duration_map, assembly_map),
+        as preprocess_data and analyze_location_patterns would produce
+    """
+    data_dir = resolve_data_dir(path)
+    duration_map, assembly_map = build_mappings(
+        read_sheet(sheet_file(data_dir, "Duration")),
+        read_sheet(sheet_file(data_dir, "Assembly")),
+    )
+
+    completed = completed_trip_ids(sheet_file(data_dir, "Trip_Details"), chunk_size)
+    origin_counts, dest_counts, completed_count, total_count = count_location_activity(
+        sheet_file(data_dir, "Trips"), completed, duration_map, assembly_map, chunk_size
+    )
+    logger.info(
+        f"Found {completed_count} completed trips out of {total_count} total trips"
+    )
+
+    top_locations_by_hour, location_totals = rank_location_activity(
+        origin_counts, dest_counts
+    )
+    return top_locations_by_hour, location_totals, duration_map, assembly_map
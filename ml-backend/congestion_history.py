@@ -0,0 +1,252 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from hotspot_clustering import cluster_hotspots
+from traffic_probes import point_key
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# SQLite file holding every congestion measurement (empty string: memory only)
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "CONGESTION_HISTORY_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "congestion_history.sqlite3"
+    ),
+)
+# Samples older than this many days are dropped on startup
+DEFAULT_RETENTION_DAYS = int(os.environ.get("CONGESTION_RETENTION_DAYS", 56))
+# Hour-of-week slots need this many samples before they are trusted as a prior
+DEFAULT_MIN_SAMPLES = int(os.environ.get("CONGESTION_PRIOR_MIN_SAMPLES", 2))
+# Same cut-off as the live scan
+HOTSPOT_THRESHOLD = 1.3
+
+
+def hour_of_week(when: Optional[datetime] = None) -> int:
+    """0 for Monday 00:00-00:59 up to 167 for Sunday 23:00-23:59 (local time)"""
+    when = when or datetime.now()
+    return when.weekday() * 24 + when.hour
+
+
+class CongestionHistory:
+    """
+    Append-only store of congestion measurements with hour-of-week priors.
+
+    Every probe measured by a hotspot scan is written to SQLite as a compact
+    (probe, timestamp, hour of week, congestion factor) row. Running sums per
+    probe and hour-of-week are kept in memory, so priors, probe ordering and
+    the "expected hotspots now" fallback never touch the disk.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = DEFAULT_HISTORY_PATH,
+        retention_days: int = DEFAULT_RETENTION_DAYS,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, or None/empty to keep history in memory only
+            retention_days: Age in days after which samples are discarded
+            min_samples: Samples an hour-of-week slot needs to count as a prior
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self._conn = None
+        # probe key -> (lat, lng, place_id)
+        self._probes: Dict[str, Tuple[float, float, Optional[str]]] = {}
+        # hour of week -> probe key -> [sample count, sum of congestion factors]
+        self._sums: Dict[int, Dict[str, List[float]]] = {}
+        # hour of week -> expected hotspots, rebuilt after new samples arrive
+        self._expected: Dict[int, List[Dict[str, Any]]] = {}
+        self._stats = {"samples": 0, "writes": 0, "expected_reads": 0}
+
+        try:
+            self._conn = sqlite3.connect(db_path or ":memory:", check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                "probe_key TEXT PRIMARY KEY, lat REAL, lng REAL, place_id TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                "probe_key TEXT, ts INTEGER, hour_of_week INTEGER, congestion REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS samples_ts ON samples (ts)")
+            self._conn.execute(
+                "DELETE FROM samples WHERE ts < ?",
+                (int(time.time() - retention_days * 86400),),
+            )
+            self._conn.commit()
+            self._load()
+        except sqlite3.Error as e:
+            logger.error(f"Error opening congestion history at {db_path}: {str(e)}")
+            self._conn = None
+
+    def _load(self):
+        """Rebuild the in-memory sums from the samples on disk"""
+        for probe_key, lat, lng, place_id in self._conn.execute(
+            "SELECT probe_key, lat, lng, place_id FROM probes"
+        ):
+            self._probes[probe_key] = (lat, lng, place_id)
+
+        for how, probe_key, count, total in self._conn.execute(
+            "SELECT hour_of_week, probe_key, COUNT(*), SUM(congestion) "
+            "FROM samples GROUP BY hour_of_week, probe_key"
+        ):
+            self._sums.setdefault(how, {})[probe_key] = [count, total]
+            self._stats["samples"] += count
+
+        if self._stats["samples"]:
+            logger.info(
+                f"Loaded {self._stats['samples']} congestion samples for "
+                f"{len(self._probes)} probes"
+            )
+
+    def record(
+        self,
+        measurements: List[Tuple[Dict[str, Any], Optional[float]]],
+        when: Optional[datetime] = None,
+    ):
+        """
+        Append one scan's measurements.
+
+        Args:
+            measurements: (probe, congestion_factor) pairs; None factors are skipped
+            when: Time of the scan (default: now)
+        """
+        when = when or datetime.now()
+        how = hour_of_week(when)
+        ts = int(when.timestamp())
+
+        probe_rows = []
+        sample_rows = []
+        with self._lock:
+            slot = self._sums.setdefault(how, {})
+            for probe, factor in measurements:
+                if factor is None:
+                    continue
+                key = point_key(probe["lat"], probe["lng"])
+                if key not in self._probes:
+                    self._probes[key] = (
+                        probe["lat"],
+                        probe["lng"],
+                        probe.get("place_id"),
+                    )
+                    probe_rows.append(
+                        (key, probe["lat"], probe["lng"], probe.get("place_id"))
+                    )
+                sums = slot.setdefault(key, [0, 0.0])
+                sums[0] += 1
+                sums[1] += factor
+                sample_rows.append((key, ts, how, factor))
+
+            if not sample_rows:
+                return
+            self._expected.pop(how, None)
+            self._stats["samples"] += len(sample_rows)
+
+            if self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO probes (probe_key, lat, lng, place_id) "
+                        "VALUES (?, ?, ?, ?)",
+                        probe_rows,
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO samples (probe_key, ts, hour_of_week, congestion) "
+                        "VALUES (?, ?, ?, ?)",
+                        sample_rows,
+                    )
+                    self._conn.commit()
+                    self._stats["writes"] += 1
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing congestion history: {str(e)}")
+
+    def prior(
+        self, probe: Dict[str, Any], when: Optional[datetime] = None
+    ) -> Optional[float]:
+        """Mean congestion factor of a probe in this hour of the week, if known"""
+        sums = self._sums.get(hour_of_week(when), {}).get(
+            point_key(probe["lat"], probe["lng"])
+        )
+        if sums is None or sums[0] < self.min_samples:
+            return None
+        return sums[1] / sums[0]
+
+    def order_probes(
+        self, probes: List[Dict[str, Any]], when: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Sort probes so the historically most congested are measured first.
+
+        Probes without a prior are treated as sitting right at the hotspot
+        threshold, ahead of probes known to be free-flowing.
+        """
+        return sorted(
+            probes,
+            key=lambda probe: -(self.prior(probe, when) or HOTSPOT_THRESHOLD),
+        )
+
+    def expected_hotspots(
+        self,
+        when: Optional[datetime] = None,
+        threshold: float = HOTSPOT_THRESHOLD,
+    ) -> List[Dict[str, Any]]:
+        """
+        Hotspots expected at this hour of the week, most congested first.
+
+        Built from the in-memory sums and memoised per hour until new samples
+        arrive, so repeated calls are constant time.
+        """
+        how = hour_of_week(when)
+        with self._lock:
+            expected = self._expected.get(how)
+            if expected is None:
+                expected = []
+                for key, (count, total) in self._sums.get(how, {}).items():
+                    if count < self.min_samples or total / count <= threshold:
+                        continue
+                    lat, lng, place_id = self._probes[key]
+                    congestion_factor = total / count
+                    expected.append(
+                        {
+                            "lat": lat,
+                            "lng": lng,
+                            "place_id": place_id,
+                            "congestion_factor": congestion_factor,
+                            "congestion_percent": round((congestion_factor - 1) * 100),
+                            "name": f"Expected Traffic Hotspot ({round((congestion_factor - 1) * 100)}% delay)",
+                            "expected": True,
+                            "samples": count,
+                        }
+                    )
+                expected = cluster_hotspots(expected)
+                expected.sort(key=lambda x: x["congestion_factor"], reverse=True)
+                self._expected[how] = expected
+            self._stats["expected_reads"] += 1
+        return [dict(hotspot) for hotspot in expected]
+
+    def stats(self) -> Dict[str, Any]:
+        """Sample counts and prior coverage"""
+        with self._lock:
+            return {
+                **self._stats,
+                "probes": len(self._probes),
+                "hours_with_priors": sum(
+                    1
+                    for slot in self._sums.values()
+                    if any(count >= self.min_samples for count, _ in slot.values())
+                ),
+            }
+
+
+# Process-wide history fed by every hotspot scan
+congestion_history = CongestionHistory()
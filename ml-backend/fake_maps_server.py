@@ -0,0 +1,361 @@
+"""
+Local stand-in for the Google Maps and Roads APIs used by server.py.
+
+Replays fixtures recorded with MAPS_RECORD_DIR and synthesizes deterministic
+responses for requests that were never recorded, with optional injected
+latency and quota errors. Point the API server at it with:
+
+    GOOGLE_MAPS_BASE_URL=http://localhost:8099 \\
+    GOOGLE_ROADS_BASE_URL=http://localhost:8099 python server.py
+"""
+
+import os
+import json
+import math
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+from typing import Any, Dict, Tuple
+
+from aiohttp import web
+
+from maps_client import fixture_endpoint, fixture_path
+
+# Set up logging
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# Synthetic results are scattered around central Bangalore
+CITY_CENTER = (12.9716, 77.5946)
+DEFAULT_FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "maps"
+)
+
+
+def _rng(*parts) -> random.Random:
+    """Random generator seeded by the request so synthetic answers are repeatable"""
+    seed = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return random.Random(int(seed[:16], 16))
+
+
+def _parse_point(value: str) -> Tuple[float, float]:
+    lat, lng = value.split(",")[:2]
+    return float(lat), float(lng)
+
+
+def _distance_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    """Equirectangular approximation; plenty for synthetic responses"""
+    x = math.radians(b[1] - a[1]) * math.cos(math.radians((a[0] + b[0]) / 2))
+    y = math.radians(b[0] - a[0])
+    return 6371000 * math.hypot(x, y)
+
+
+def synth_geocode(params: Dict[str, str]) -> Dict[str, Any]:
+    if "latlng" in params:
+        rng = _rng("reverse", params["latlng"])
+        road = f"{rng.randint(1, 40)}th Cross Road"
+        area = rng.choice(["Indiranagar", "Jayanagar", "Koramangala", "Malleswaram"])
+        return {
+            "status": "OK",
+            "results": [
+                {
+                    "formatted_address": f"{road}, {area}, Bengaluru, Karnataka 5600{rng.randint(10, 99)}, India",
+                    "address_components": [
+                        {"long_name": road, "types": ["route"]},
+                        {
+                            "long_name": area,
+                            "types": ["sublocality_level_1", "sublocality"],
+                        },
+                        {"long_name": "Bengaluru", "types": ["locality"]},
+                        {
+                            "long_name": "Karnataka",
+                            "types": ["administrative_area_level_1"],
+                        },
+                        {"long_name": "India", "types": ["country"]},
+                    ],
+                }
+            ],
+        }
+
+    address = params.get("address", "")
+    if not address:
+        return {"status": "INVALID_REQUEST", "results": []}
+    rng = _rng("geocode", address.casefold())
+    return {
+        "status": "OK",
+        "results": [
+            {
+                "formatted_address": f"{address}, Bengaluru, Karnataka, India",
+                "geometry": {
+                    "location": {
+                        "lat": CITY_CENTER[0] + rng.uniform(-0.08, 0.08),
+                        "lng": CITY_CENTER[1] + rng.uniform(-0.08, 0.08),
+                    }
+                },
+            }
+        ],
+    }
+
+
+def synth_snap_to_roads(params: Dict[str, str]) -> Dict[str, Any]:
+    snapped = []
+    for index, point in enumerate(params.get("path", "").split("|")):
+        if not point:
+            continue
+        lat, lng = _parse_point(point)
+        rng = _rng("snap", point)
+        snapped.append(
+            {
+                "location": {
+                    "latitude": lat + rng.uniform(-0.0003, 0.0003),
+                    "longitude": lng + rng.uniform(-0.0003, 0.0003),
+                },
+                "originalIndex": index,
+                "placeId": f"FAKE_ROAD_{hashlib.sha1(point.encode()).hexdigest()[:12]}",
+            }
+        )
+    return {"snappedPoints": snapped}
+
+
+def synth_distance_matrix(params: Dict[str, str]) -> Dict[str, Any]:
+    origins = [_parse_point(o) for o in params.get("origins", "").split("|") if o]
+    destinations = [
+        _parse_point(d) for d in params.get("destinations", "").split("|") if d
+    ]
+    walking = params.get("mode") == "walking"
+
+    rows = []
+    for origin in origins:
+        # Congestion is a property of the origin so repeated probes agree
+        congestion = _rng("traffic", origin).uniform(1.0, 2.2)
+        elements = []
+        for destination in destinations:
+            distance = max(1, round(_distance_m(origin, destination) * 1.3))
+            duration = max(1, round(distance / (1.3 if walking else 8.0)))
+            element = {
+                "status": "OK",
+                "distance": {"text": f"{distance} m", "value": distance},
+                "duration": {
+                    "text": f"{max(1, duration // 60)} mins",
+                    "value": duration,
+                },
+            }
+            if not walking:
+                element["duration_in_traffic"] = {
+                    "text": f"{max(1, round(duration * congestion) // 60)} mins",
+                    "value": round(duration * congestion),
+                }
+            elements.append(element)
+        rows.append({"elements": elements})
+
+    return {"status": "OK", "rows": rows}
+
+
+def synth_nearby_search(params: Dict[str, str]) -> Dict[str, Any]:
+    center = _parse_point(params.get("location", f"{CITY_CENTER[0]},{CITY_CENTER[1]}"))
+    radius = float(params.get("radius", 500))
+    kind = params.get("type") or params.get("keyword", "place").split("|")[0]
+    rng = _rng("nearby", params.get("location"), radius, kind)
+
+    results = []
+    for i in range(rng.randint(0, 5)):
+        # Offsets are in degrees; ~111km per degree of latitude
+        distance = rng.uniform(50, radius)
+        bearing = rng.uniform(0, 2 * math.pi)
+        lat = center[0] + distance * math.cos(bearing) / 111000
+        lng = center[1] + distance * math.sin(bearing) / (
+            111000 * math.cos(math.radians(center[0]))
+        )
+        place_id = hashlib.sha1(f"{lat:.5f},{lng:.5f},{kind}".encode()).hexdigest()[:20]
+        results.append(
+            {
+                "name": f"{kind.replace('_', ' ').title()} {i + 1}",
+                "vicinity": "Bengaluru",
+                "place_id": f"FAKE_PLACE_{place_id}",
+                "rating": round(rng.uniform(3.0, 5.0), 1),
+                "user_ratings_total": rng.randint(0, 500),
+                "geometry": {"location": {"lat": lat, "lng": lng}},
+                "opening_hours": {"open_now": rng.random() > 0.2},
+            }
+        )
+
+    return {"status": "OK" if results else "ZERO_RESULTS", "results": results}
+
+
+def synth_directions(params: Dict[str, str]) -> Dict[str, Any]:
+    origin = _parse_point(params.get("origin", "0,0"))
+    destination = _parse_point(params.get("destination", "0,0"))
+    distance = max(1, round(_distance_m(origin, destination) * 1.3))
+    duration = max(1, round(distance / 1.3))
+    half = {"text": f"{distance // 2} m", "value": distance // 2}
+
+    return {
+        "status": "OK",
+        "routes": [
+            {
+                "overview_polyline": {"points": ""},
+                "legs": [
+                    {
+                        "distance": {"text": f"{distance} m", "value": distance},
+                        "duration": {
+                            "text": f"{max(1, duration // 60)} mins",
+                            "value": duration,
+                        },
+                        "steps": [
+                            {
+                                "html_instructions": "Head <b>north</b>",
+                                "distance": half,
+                                "duration": {"text": "1 min", "value": duration // 2},
+                            },
+                            {
+                                "html_instructions": "Turn <b>right</b><div>Destination will be on the left</div>",
+                                "distance": half,
+                                "duration": {"text": "1 min", "value": duration // 2},
+                            },
+                        ],
+                    }
+                ],
+            }
+        ],
+    }
+
+
+SYNTHESIZERS = {
+    "geocode": synth_geocode,
+    "snapToRoads": synth_snap_to_roads,
+    "distancematrix": synth_distance_matrix,
+    "nearbysearch": synth_nearby_search,
+    "directions": synth_directions,
+}
+
+
+def quota_error(endpoint: str) -> Tuple[int, Dict[str, Any]]:
+    """Mimic the quota error format of each API"""
+    if endpoint == "snapToRoads":
+        return 429, {
+            "error": {
+                "code": 429,
+                "message": "Quota exceeded",
+                "status": "RESOURCE_EXHAUSTED",
+            }
+        }
+    return 200, {"status": "OVER_QUERY_LIMIT", "results": []}
+
+
+def create_app(
+    fixture_dir: str = DEFAULT_FIXTURE_DIR,
+    latency_ms: float = 0,
+    jitter_ms: float = 0,
+    error_rate: float = 0,
+    strict: bool = False,
+) -> web.Application:
+    """
+    Build the fake Maps application.
+
+    Args:
+        fixture_dir: Directory of recorded fixtures (see maps_client.record_fixture)
+        latency_ms: Mean latency added to every response
+        jitter_ms: Maximum random deviation from latency_ms
+        error_rate: Fraction of requests answered with a quota error
+        strict: Answer unrecorded requests with NOT_FOUND instead of synthesizing them
+    """
+    stats = {"requests": 0, "replayed": 0, "synthesized": 0, "errors": 0}
+
+    async def handle(request: web.Request) -> web.Response:
+        endpoint = fixture_endpoint(request.path)
+        params = dict(request.query)
+        stats["requests"] += 1
+
+        delay = latency_ms + random.uniform(-jitter_ms, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            http_status, body = quota_error(endpoint)
+            return web.json_response(body, status=http_status)
+
+        path = fixture_path(fixture_dir, request.path, params)
+        if os.path.exists(path):
+            with open(path) as f:
+                fixture = json.load(f)
+            stats["replayed"] += 1
+            return web.json_response(fixture["body"], status=fixture["http_status"])
+
+        if strict or endpoint not in SYNTHESIZERS:
+            return web.json_response(
+                {
+                    "status": "NOT_FOUND",
+                    "error_message": f"No fixture for {request.path_qs}",
+                },
+                status=404,
+            )
+
+        stats["synthesized"] += 1
+        return web.json_response(SYNTHESIZERS[endpoint](params))
+
+    async def handle_stats(request: web.Request) -> web.Response:
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/maps/api/geocode/json", handle)
+    app.router.add_get("/maps/api/distancematrix/json", handle)
+    app.router.add_get("/maps/api/place/nearbysearch/json", handle)
+    app.router.add_get("/maps/api/directions/json", handle)
+    app.router.add_get("/v1/snapToRoads", handle)
+    app.router.add_get("/stats", handle_stats)
+    return app
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Local Google Maps stand-in server")
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Host to run the server on"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8099, help="Port to run the server on"
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=str,
+        default=DEFAULT_FIXTURE_DIR,
+        help="Directory of recorded fixtures (written by MAPS_RECORD_DIR)",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=0, help="Mean latency added to responses"
+    )
+    parser.add_argument(
+        "--jitter-ms", type=float, default=0, help="Maximum deviation from --latency-ms"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests answered with a quota error",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Return 404 for unrecorded requests instead of synthesizing them",
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.info(
+        f"Serving fake Maps APIs on {args.host}:{args.port} from {args.fixtures}"
+    )
+    web.run_app(
+        create_app(
+            args.fixtures, args.latency_ms, args.jitter_ms, args.error_rate, args.strict
+        ),
+        host=args.host,
+        port=args.port,
+    )
@@ -0,0 +1,131 @@
+import math
+from typing import Any, Dict, Iterable, Sequence
+
+import numpy as np
+
+# Mean Earth radius in metres
+EARTH_RADIUS_M = 6371000
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the Haversine distance between two points in meters.
+
+    Scalar version for a single pair; use haversine() for arrays.
+    """
+    # Convert latitude and longitude from degrees to radians
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    lon1_rad = math.radians(lon1)
+    lon2_rad = math.radians(lon2)
+
+    # Differences in coordinates
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    # Haversine formula
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_M * c
+
+
+def haversine(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Haversine distance in metres between arrays of points.
+
+    Arguments are scalars or arrays in degrees and broadcast against each
+    other, so one point against many, or many pairs, are single calls.
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlng = np.radians(lng2) - np.radians(lng1)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    # Rounding can push a a hair past 1 for antipodal points
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def coordinates(points: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """(N, 2) array of [lat, lng] from dicts with 'lat' and 'lng' keys"""
+    return np.array(
+        [(point["lat"], point["lng"]) for point in points], dtype=float
+    ).reshape(-1, 2)
+
+
+def place_coordinates(places: Iterable[Dict[str, Any]]) -> np.ndarray:
+    """(N, 2) array of [lat, lng] from Places results (geometry.location)"""
+    return np.array(
+        [
+            (place["geometry"]["location"]["lat"], place["geometry"]["location"]["lng"])
+            for place in places
+        ],
+        dtype=float,
+    ).reshape(-1, 2)
+
+
+def distances_from(lat: float, lng: float, points: np.ndarray) -> np.ndarray:
+    """Distance in metres from one point to each row of an (N, 2) array"""
+    return haversine(lat, lng, points[:, 0], points[:, 1])
+
+
+def unit_vectors(points: np.ndarray) -> np.ndarray:
+    """(N, 3) unit vectors on the sphere for an (N, 2) array of [lat, lng]"""
+    lat = np.radians(points[:, 0])
+    lng = np.radians(points[:, 1])
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=1)
+
+
+def distance_matrix(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """
+    All-pairs distances in metres.
+
+    Computed from the chord between unit vectors, so the N x M part is one
+    matrix product plus an arcsin instead of the full haversine; it agrees
+    with haversine() to within a millimetre at city scale.
+
+    Args:
+        origins: (N, 2) array of [lat, lng]
+        destinations: (M, 2) array of [lat, lng]
+
+    Returns:
+        (N, M) array where [i, j] is the distance from origin i to destination j
+    """
+    chord = unit_vectors(origins) @ unit_vectors(destinations).T
+    # Squared chord length 2 - 2cos(c), then the central angle 2 arcsin(chord / 2)
+    np.multiply(chord, -2.0, out=chord)
+    np.add(chord, 2.0, out=chord)
+    np.maximum(chord, 0.0, out=chord)
+    np.sqrt(chord, out=chord)
+    np.multiply(chord, 0.5, out=chord)
+    np.minimum(chord, 1.0, out=chord)
+    np.arcsin(chord, out=chord)
+    np.multiply(chord, 2 * EARTH_RADIUS_M, out=chord)
+    return chord
+
+
+def top_k(values: Sequence[float], k: int) -> np.ndarray:
+    """
+    Indices of the k smallest values, smallest first.
+
+    Uses argpartition, so only the selected k values are fully sorted. Ties
+    are broken by index, as a stable sort of the whole array would.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=int)
+    if k < n:
+        # Partition on the k-th value, then keep everything tied with it so
+        # the stable sort below sees every candidate for the last slots
+        kth = values[np.argpartition(values, k - 1)[k - 1]]
+        candidates = np.flatnonzero(values <= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(values[candidates], kind="stable")
+    return candidates[order[:k]]
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Default location of the on-disk cache (next to the model file)
+DEFAULT_CACHE_PATH = os.environ.get(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "geocode_cache.sqlite3"),
+)
+# Positive results: assembly names and addresses practically never move
+DEFAULT_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+# Negative results (ZERO_RESULTS) are retried sooner in case the data is fixed upstream
+DEFAULT_NEGATIVE_TTL = int(os.environ.get("GEOCODE_NEGATIVE_TTL", 6 * 3600))
+# Number of entries kept in the in-process LRU tier
+DEFAULT_MAX_ENTRIES = int(os.environ.get("GEOCODE_CACHE_SIZE", 4096))
+# Geohash precision for reverse geocoding: 7 chars is a ~153m x 153m cell, 8 is ~38m x 19m
+REVERSE_GEOCODE_PRECISION = int(os.environ.get("REVERSE_GEOCODE_PRECISION", 7))
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(
+    lat: float, lng: float, precision: int = REVERSE_GEOCODE_PRECISION
+) -> str:
+    """
+    Encode a coordinate as a geohash string.
+
+    Args:
+        lat: Latitude in degrees
+        lng: Longitude in degrees
+        precision: Number of base32 characters (cell size shrinks ~32x every 2 chars)
+
+    Returns:
+        Geohash of the cell containing the point
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        # Bits alternate between longitude and latitude, starting with longitude
+        value_range, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits = bits << 1
+            value_range[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+
+class GeocodeCache:
+    """
+    Two-tier TTL cache for geocoding results.
+
+    Lookups go to an in-process LRU first and fall back to a SQLite table on
+    disk, so warm keys survive restarts and are shared between workers on the
+    same host. A stored value of None is a cached negative result.
+    """
+
+    def __init__(
+        self,
+        table: str = "geocode",
+        db_path: Optional[str] = DEFAULT_CACHE_PATH,
+        ttl: int = DEFAULT_TTL,
+        negative_ttl: int = DEFAULT_NEGATIVE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            table: SQLite table holding this cache's entries
+            db_path: Path of the SQLite file, or None to keep the cache in memory only
+            ttl: Lifetime of positive entries in seconds
+            negative_ttl: Lifetime of negative entries in seconds
+            max_entries: Maximum number of entries in the in-process LRU
+        """
+        self.table = table
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "expired": 0,
+        }
+
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+                )
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE expires_at < ?", (time.time(),)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening geocode cache at {db_path}: {str(e)}")
+                self._conn = None
+
+    @staticmethod
+    def normalize_key(key: str) -> str:
+        """Normalize a lookup key so trivially different spellings share an entry"""
+        return " ".join(str(key).split()).casefold()
+
+    def get(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up a key in the memory tier, then the disk tier.
+
+        Returns:
+            Tuple of (found, value). value is None for cached negative results.
+        """
+        key = self.normalize_key(key)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= now:
+                    self._memory.move_to_end(key)
+                    self._record_hit("memory_hits", value)
+                    return True, value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Error reading geocode cache: {str(e)}")
+                    row = None
+
+                if row is not None:
+                    raw_value, expires_at = row
+                    if expires_at >= now:
+                        value = json.loads(raw_value)
+                        self._remember(key, expires_at, value)
+                        self._record_hit("disk_hits", value)
+                        return True, value
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return False, None
+
+    def set(self, key: str, value: Optional[Dict[str, Any]], ttl: Optional[int] = None):
+        """Store a value (or None for a negative result) in both tiers"""
+        key = self.normalize_key(key)
+        if ttl is None:
+            ttl = self.ttl if value is not None else self.negative_ttl
+        expires_at = time.time() + ttl
+
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["writes"] += 1
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                        "VALUES (?, ?, ?)",
+                        (key, json.dumps(value), expires_at),
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing geocode cache: {str(e)}")
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.table}")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        """Insert into the LRU tier and evict the oldest entries over capacity"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _record_hit(self, tier: str, value: Any):
+        self._stats[tier] += 1
+        if value is None:
+            self._stats["negative_hits"] += 1
+
+
+# Shared cache for forward geocoding (location name -> coordinates)
+geocode_cache = GeocodeCache(table="geocode")
+# Shared cache for reverse geocoding (geohash cell -> parsed address fields)
+reverse_geocode_cache = GeocodeCache(table="reverse_geocode")
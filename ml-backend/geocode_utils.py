@@ -4,6 +4,9 @@ import asyncio
 import aiohttp
 from typing import List, Dict, Any
 
+from geocode_cache import geocode_cache, geohash_encode, reverse_geocode_cache
+from maps_client import MAPS_BASE_URL, fetch_json
+
 # Set up logger
 logger = logging.getLogger(__name__)
 
@@ -27,6 +30,72 @@ async def close_session():
         _session = None
 
 
+def parse_reverse_geocode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts address fields and a readable location name from a reverse geocoding result.
+
+    Args:
+        result: First entry of the "results" list in a Geocoding API response
+
+    Returns:
+        Dictionary with formatted_address, location and any available
+        street, city, state, postal_code and country fields
+    """
+    # Add full formatted address
+    fields = {"formatted_address": result.get("formatted_address", "")}
+
+    # Extract address components for more granular location information
+    components = {}
+    for component in result.get("address_components") or []:
+        for component_type in component["types"]:
+            components[component_type] = component["long_name"]
+
+    # Add useful location components if available
+    if "route" in components:
+        fields["street"] = components["route"]
+    if "locality" in components:
+        fields["city"] = components["locality"]
+    if "administrative_area_level_1" in components:
+        fields["state"] = components["administrative_area_level_1"]
+    if "postal_code" in components:
+        fields["postal_code"] = components["postal_code"]
+    if "country" in components:
+        fields["country"] = components["country"]
+
+    # Create a readable location name based on available components
+    location_parts = []
+
+    if "point_of_interest" in components:
+        location_parts.append(components["point_of_interest"])
+    elif "establishment" in components:
+        location_parts.append(components["establishment"])
+    elif "route" in components:
+        if "street_number" in components:
+            location_parts.append(
+                f"{components['street_number']} {components['route']}"
+            )
+        else:
+            location_parts.append(components["route"])
+
+    if "sublocality" in components and "sublocality_level_1" not in components:
+        location_parts.append(components["sublocality"])
+    elif "sublocality_level_1" in components:
+        location_parts.append(components["sublocality_level_1"])
+
+    if "locality" in components and not location_parts:
+        # Only add city if no more specific location was found
+        location_parts.append(components["locality"])
+
+    # Join the parts to create a readable location name
+    if location_parts:
+        fields["location"] = ", ".join(location_parts)
+    else:
+        # Fallback to formatted address if no components were found
+        fields["location"] = fields["formatted_address"]
+
+    return fields
+
+
 async def async_locations_to_coordinates(
     location_strings: List[str],
 ) -> List[Dict[str, Any]]:
@@ -40,34 +109,43 @@ async def async_locations_to_coordinates(
         List of dictionaries with location string, lat, and lng fields
     """
     api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-    logger.info("api",api_key)
     session = await get_session()
     
     async def process_location(location_str):
+        # Serve repeated names from the shared geocode cache
+        found, cached = geocode_cache.get(location_str)
+        if found:
+            return {"location": location_str, **(cached or {})}
+
         try:
             # Call Google Maps Geocoding API
-            geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={location_str}&key={api_key}"
-            async with session.get(geocode_url) as response:
-                geocode_data = await response.json()
-                print(geocode_data)
-                
-                if geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                    # Get coordinates
-                    location = geocode_data["results"][0]["geometry"]["location"]
-                    # Create a new object with coordinates
-                    new_obj = {"location": location_str}
-                    new_obj["lat"] = location["lat"]
-                    new_obj["lng"] = location["lng"]
-                    new_obj["formatted_address"] = geocode_data["results"][0].get(
-                        "formatted_address", location_str
-                    )
-                    return new_obj
-                else:
-                    # If geocoding failed, log warning
-                    logger.warning(
-                        f"Failed to geocode location '{location_str}': {geocode_data.get('status')}"
-                    )
-                    return {"location": location_str}
+            geocode_url = f"{MAPS_BASE_URL}/maps/api/geocode/json?address={location_str}&key={api_key}"
+            geocode_data = await fetch_json(session, geocode_url)
+            logger.debug(f"Geocoding {location_str}: {geocode_data.get('status')}")
+
+            if geocode_data.get("status") == "OK" and geocode_data.get("results"):
+                # Get coordinates
+                location = geocode_data["results"][0]["geometry"]["location"]
+                # Create a new object with coordinates
+                new_obj = {"location": location_str}
+                new_obj["lat"] = location["lat"]
+                new_obj["lng"] = location["lng"]
+                new_obj["formatted_address"] = geocode_data["results"][0].get(
+                    "formatted_address", location_str
+                )
+                geocode_cache.set(
+                    location_str,
+                    {k: v for k, v in new_obj.items() if k != "location"},
+                )
+                return new_obj
+            else:
+                if geocode_data.get("status") == "ZERO_RESULTS":
+                    geocode_cache.set(location_str, None)
+                # If geocoding failed, log warning
+                logger.warning(
+                    f"Failed to geocode location '{location_str}': {geocode_data.get('status')}"
+                )
+                return {"location": location_str}
         except Exception as e:
             logger.error(f"Error geocoding location '{location_str}': {str(e)}")
             return {"location": location_str}
@@ -96,7 +174,6 @@ async def async_coordinates_to_locations(
         List of dictionaries with added location and address component fields
     """
     api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-    logger.info("api",api_key)
     session = await get_session()
     
     async def process_coordinate(obj):
@@ -110,81 +187,33 @@ async def async_coordinates_to_locations(
         lat = obj[lat_key]
         lng = obj[lng_key]
 
+        # Points in the same geohash cell share one reverse geocode result
+        cell = geohash_encode(lat, lng)
+        found, cached = reverse_geocode_cache.get(cell)
+        if found:
+            return {**obj, **cached} if cached else obj
+
         try:
             # Call Google Maps Reverse Geocoding API
-            geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
-            async with session.get(geocode_url) as response:
-                geocode_data = await response.json()
-
-                if geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                    # Create a new object with all original data
-                    new_obj = obj.copy()
-
-                    # Add full formatted address
-                    new_obj["formatted_address"] = geocode_data["results"][0].get(
-                        "formatted_address", ""
-                    )
-
-                    # Extract address components for more granular location information
-                    components = {}
-                    if geocode_data["results"][0].get("address_components"):
-                        for component in geocode_data["results"][0]["address_components"]:
-                            for component_type in component["types"]:
-                                components[component_type] = component["long_name"]
-
-                    # Add useful location components if available
-                    if "route" in components:
-                        new_obj["street"] = components["route"]
-                    if "locality" in components:
-                        new_obj["city"] = components["locality"]
-                    if "administrative_area_level_1" in components:
-                        new_obj["state"] = components["administrative_area_level_1"]
-                    if "postal_code" in components:
-                        new_obj["postal_code"] = components["postal_code"]
-                    if "country" in components:
-                        new_obj["country"] = components["country"]
-
-                    # Create a readable location name based on available components
-                    location_parts = []
-
-                    if "point_of_interest" in components:
-                        location_parts.append(components["point_of_interest"])
-                    elif "establishment" in components:
-                        location_parts.append(components["establishment"])
-                    elif "route" in components:
-                        if "street_number" in components:
-                            location_parts.append(
-                                f"{components['street_number']} {components['route']}"
-                            )
-                        else:
-                            location_parts.append(components["route"])
-
-                    if (
-                        "sublocality" in components
-                        and "sublocality_level_1" not in components
-                    ):
-                        location_parts.append(components["sublocality"])
-                    elif "sublocality_level_1" in components:
-                        location_parts.append(components["sublocality_level_1"])
-
-                    if "locality" in components and not location_parts:
-                        # Only add city if no more specific location was found
-                        location_parts.append(components["locality"])
-
-                    # Join the parts to create a readable location name
-                    if location_parts:
-                        new_obj["location"] = ", ".join(location_parts)
-                    else:
-                        # Fallback to formatted address if no components were found
-                        new_obj["location"] = new_obj["formatted_address"]
-
-                    return new_obj
-                else:
-                    # If reverse geocoding failed, keep original object but log warning
-                    logger.warning(
-                        f"Failed to reverse geocode coordinates ({lat}, {lng}): {geocode_data.get('status')}"
-                    )
-                    return obj
+            geocode_url = f"{MAPS_BASE_URL}/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
+            geocode_data = await fetch_json(session, geocode_url)
+
+            if geocode_data.get("status") == "OK" and geocode_data.get("results"):
+                fields = parse_reverse_geocode_result(geocode_data["results"][0])
+                reverse_geocode_cache.set(cell, fields)
+
+                # Create a new object with all original data plus the address fields
+                new_obj = obj.copy()
+                new_obj.update(fields)
+                return new_obj
+            else:
+                if geocode_data.get("status") == "ZERO_RESULTS":
+                    reverse_geocode_cache.set(cell, None)
+                # If reverse geocoding failed, keep original object but log warning
+                logger.warning(
+                    f"Failed to reverse geocode coordinates ({lat}, {lng}): {geocode_data.get('status')}"
+                )
+                return obj
         except Exception as e:
             logger.error(
                 f"Error reverse geocoding coordinates ({lat}, {lng}): {str(e)}"
@@ -0,0 +1,126 @@
+import os
+import math
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Hotspots closer than this many metres are merged (0 disables clustering)
+CLUSTER_RADIUS = float(os.environ.get("HOTSPOT_CLUSTER_RADIUS", 150))
+# "dbscan" chains neighbours within the radius, "grid" merges per radius-sized cell
+CLUSTER_METHOD = os.environ.get("HOTSPOT_CLUSTER_METHOD", "dbscan")
+
+METERS_PER_DEGREE = 111320
+
+
+def _cell_of(
+    lat: float, lng: float, radius: float, lng_scale: float
+) -> Tuple[int, int]:
+    """Grid cell of a point, with cells radius metres on a side"""
+    return (
+        math.floor(lat * METERS_PER_DEGREE / radius),
+        math.floor(lng * METERS_PER_DEGREE * lng_scale / radius),
+    )
+
+
+def _distance_m(a: Dict[str, Any], b: Dict[str, Any], lng_scale: float) -> float:
+    """Equirectangular distance; accurate to well under 1% at cluster radii"""
+    dlat = (a["lat"] - b["lat"]) * METERS_PER_DEGREE
+    dlng = (a["lng"] - b["lng"]) * METERS_PER_DEGREE * lng_scale
+    return math.hypot(dlat, dlng)
+
+
+def _components(
+    hotspots: List[Dict[str, Any]], radius: float, lng_scale: float
+) -> List[List[int]]:
+    """DBSCAN with min_samples=1: connected components of the radius graph"""
+    cells = defaultdict(list)
+    for index, hotspot in enumerate(hotspots):
+        cells[_cell_of(hotspot["lat"], hotspot["lng"], radius, lng_scale)].append(index)
+
+    parent = list(range(len(hotspots)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # Neighbours within the radius can only be in the same or an adjacent cell
+    for (row, col), members in cells.items():
+        for drow in (-1, 0, 1):
+            for dcol in (-1, 0, 1):
+                for j in cells.get((row + drow, col + dcol), ()):
+                    for i in members:
+                        if (
+                            i < j
+                            and _distance_m(hotspots[i], hotspots[j], lng_scale)
+                            <= radius
+                        ):
+                            parent[find(i)] = find(j)
+
+    groups = defaultdict(list)
+    for index in range(len(hotspots)):
+        groups[find(index)].append(index)
+    return list(groups.values())
+
+
+def cluster_hotspots(
+    hotspots: List[Dict[str, Any]],
+    radius: float = CLUSTER_RADIUS,
+    method: str = CLUSTER_METHOD,
+) -> List[Dict[str, Any]]:
+    """
+    Merge traffic hotspots that sit on the same junction or road stretch.
+
+    Each cluster is represented by its most congested member, so the
+    representative stays on a snapped road point with a valid place_id. The
+    representative keeps the peak congestion_factor and gains
+    'mean_congestion_factor' and 'member_count'.
+
+    Args:
+        hotspots: Dicts with at least 'lat', 'lng' and 'congestion_factor'
+        radius: Merge distance in metres (0 or less returns the input unchanged)
+        method: "dbscan" or "grid"
+
+    Returns:
+        One hotspot per cluster, in input order of the representatives
+    """
+    if radius <= 0 or not hotspots:
+        return list(hotspots)
+
+    mean_lat = sum(hotspot["lat"] for hotspot in hotspots) / len(hotspots)
+    lng_scale = math.cos(math.radians(mean_lat))
+
+    if method == "grid":
+        cells = defaultdict(list)
+        for index, hotspot in enumerate(hotspots):
+            cells[_cell_of(hotspot["lat"], hotspot["lng"], radius, lng_scale)].append(
+                index
+            )
+        groups = list(cells.values())
+    else:
+        groups = _components(hotspots, radius, lng_scale)
+
+    clusters = []
+    for members in groups:
+        representative = max(
+            members, key=lambda i: hotspots[i].get("congestion_factor", 0)
+        )
+        factors = [hotspots[i].get("congestion_factor", 0) for i in members]
+        clusters.append(
+            (
+                representative,
+                {
+                    **hotspots[representative],
+                    "mean_congestion_factor": sum(factors) / len(factors),
+                    "member_count": len(members),
+                },
+            )
+        )
+
+    clusters.sort(key=lambda item: item[0])
+    logger.debug(f"Clustered {len(hotspots)} hotspots into {len(clusters)}")
+    return [cluster for _, cluster in clusters]
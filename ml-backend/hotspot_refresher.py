@@ -0,0 +1,261 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Seconds between scheduled refreshes of each snapshot
+REFRESH_INTERVAL = float(os.environ.get("HOTSPOT_REFRESH_INTERVAL", 300))
+# Snapshots older than this are never served without refreshing them first
+MAX_STALENESS = float(os.environ.get("HOTSPOT_MAX_STALENESS", 900))
+# Grid size refreshed by the scheduler even before anyone asks for it
+DEFAULT_SAMPLE_POINTS = int(os.environ.get("HOTSPOT_SAMPLE_POINTS", 60))
+# Grid sizes nobody asked for within this many seconds stop being refreshed
+IDLE_TIMEOUT = float(os.environ.get("HOTSPOT_IDLE_TIMEOUT", 3600))
+# Grid sizes clients may ask for; other values snap to the nearest one, so
+# arbitrary sample_points cannot each start their own scans and probe sets
+SAMPLE_POINT_SIZES = sorted(
+    int(size)
+    for size in os.environ.get("HOTSPOT_SAMPLE_SIZES", "30,60,120").split(",")
+    if size.strip()
+)
+# Grid sizes kept (and refreshed) at once; further sizes get the default grid
+MAX_SNAPSHOTS = int(os.environ.get("HOTSPOT_MAX_SNAPSHOTS", 3))
+
+
+def snap_sample_points(sample_points: int, sizes: List[int]) -> int:
+    """The allowed grid size closest to sample_points (the smaller one on ties)"""
+    return min(sizes, key=lambda size: (abs(size - sample_points), size))
+
+
+class HotspotRefresher:
+    """
+    Stale-while-revalidate snapshots of the traffic hotspot scan.
+
+    A snapshot is kept per grid size. Reads return the latest snapshot
+    immediately; once it is older than refresh_interval a refresh starts in
+    the background. A snapshot older than max_staleness (or a missing one)
+    is replaced by the fallback's answer while the refresh runs, and only
+    makes the caller wait when there is no fallback answer. A scheduler task on
+    the shared event loop refreshes every recently used grid size on the same
+    interval, so reads normally never wait at all.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+        fallback: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+        refresh_interval: float = REFRESH_INTERVAL,
+        max_staleness: float = MAX_STALENESS,
+        default_sample_points: int = DEFAULT_SAMPLE_POINTS,
+        idle_timeout: float = IDLE_TIMEOUT,
+        sample_point_sizes: Optional[List[int]] = None,
+        max_snapshots: int = MAX_SNAPSHOTS,
+    ):
+        self.fetch = fetch
+        self.fallback = fallback
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max(max_staleness, refresh_interval)
+        self.default_sample_points = default_sample_points
+        self.idle_timeout = idle_timeout
+        self.sample_point_sizes = sorted(
+            set(sample_point_sizes or SAMPLE_POINT_SIZES) | {default_sample_points}
+        )
+        self.max_snapshots = max(1, max_snapshots)
+        # sample_points -> {"hotspots": [...], "updated_at": epoch seconds}
+        self._snapshots: Dict[int, Dict[str, Any]] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+        self._last_read: Dict[int, float] = {}
+        self._scheduler: Optional[asyncio.Task] = None
+        self._stats = {
+            "reads": 0,
+            "stale_reads": 0,
+            "fallback_reads": 0,
+            "waits": 0,
+            "refreshes": 0,
+            "snapped_reads": 0,
+            "capped_reads": 0,
+        }
+
+    def _refresh(self, sample_points: int) -> asyncio.Task:
+        """Start a refresh for one grid size unless one is already running"""
+        task = self._refreshing.get(sample_points)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._do_refresh(sample_points))
+            self._refreshing[sample_points] = task
+        return task
+
+    async def _do_refresh(self, sample_points: int):
+        started = time.time()
+        try:
+            hotspots = await self.fetch(sample_points)
+            self._snapshots[sample_points] = {
+                "hotspots": hotspots,
+                "updated_at": time.time(),
+                "source": "live",
+            }
+            self._stats["refreshes"] += 1
+            logger.info(
+                f"Refreshed {len(hotspots)} traffic hotspots for sample_points="
+                f"{sample_points} in {time.time() - started:.1f}s"
+            )
+        except Exception as e:
+            logger.error(f"Error refreshing traffic hotspots: {str(e)}")
+        finally:
+            self._refreshing.pop(sample_points, None)
+
+    def _metadata(self, snapshot: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if snapshot is None:
+            return {
+                "updated_at": None,
+                "age_seconds": None,
+                "max_staleness_seconds": self.max_staleness,
+                "stale": True,
+                "source": None,
+            }
+        age = time.time() - snapshot["updated_at"]
+        return {
+            "updated_at": snapshot["updated_at"],
+            "age_seconds": round(age, 1),
+            "max_staleness_seconds": self.max_staleness,
+            "stale": age > self.refresh_interval,
+            "source": snapshot["source"],
+        }
+
+    def _active_sizes(self, now: float) -> set:
+        """Grid sizes read within the idle timeout, plus the default"""
+        sizes = {self.default_sample_points}
+        sizes.update(
+            size
+            for size, last_read in self._last_read.items()
+            if now - last_read <= self.idle_timeout
+        )
+        return sizes
+
+    def resolve_sample_points(self, sample_points: Optional[int] = None) -> int:
+        """
+        Grid size actually served for a requested sample_points.
+
+        Requests snap to the nearest allowed size, and a size that is not
+        already live is only added while fewer than max_snapshots are.
+        """
+        if not sample_points:
+            return self.default_sample_points
+        size = snap_sample_points(sample_points, self.sample_point_sizes)
+        if size != sample_points:
+            self._stats["snapped_reads"] += 1
+        active = self._active_sizes(time.time())
+        if size not in active and len(active) >= self.max_snapshots:
+            self._stats["capped_reads"] += 1
+            return self.default_sample_points
+        return size
+
+    async def get(self, sample_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Return the latest snapshot for a grid size.
+
+        Returns:
+            Dict with 'hotspots' plus 'updated_at', 'age_seconds',
+            'max_staleness_seconds' and 'stale' describing the snapshot, and
+            the 'sample_points' of the grid actually served
+        """
+        sample_points = self.resolve_sample_points(sample_points)
+        self._last_read[sample_points] = time.time()
+        self._stats["reads"] += 1
+
+        snapshot = self._snapshots.get(sample_points)
+        age = time.time() - snapshot["updated_at"] if snapshot else None
+
+        if snapshot is None or age > self.max_staleness:
+            expected = self.fallback() if self.fallback else None
+            if expected:
+                # Answer from the fallback now and refresh in the background
+                self._stats["fallback_reads"] += 1
+                self._refresh(sample_points)
+                return {
+                    "hotspots": expected,
+                    "sample_points": sample_points,
+                    **self._metadata(
+                        {
+                            "hotspots": expected,
+                            "updated_at": time.time(),
+                            "source": "priors",
+                        }
+                    ),
+                    "stale": True,
+                }
+
+            # Nothing servable yet; wait for the (possibly shared) refresh
+            self._stats["waits"] += 1
+            await asyncio.shield(self._refresh(sample_points))
+            # Keep the old snapshot if the refresh failed
+            snapshot = self._snapshots.get(sample_points, snapshot)
+        elif age > self.refresh_interval:
+            # Serve what we have and revalidate in the background
+            self._stats["stale_reads"] += 1
+            self._refresh(sample_points)
+
+        return {
+            # Callers get their own list so they can extend it freely
+            "hotspots": list(snapshot["hotspots"]) if snapshot else [],
+            "sample_points": sample_points,
+            **self._metadata(snapshot),
+        }
+
+    async def _run(self):
+        """Refresh every recently read grid size on a fixed interval"""
+        while True:
+            now = time.time()
+            sizes = self._active_sizes(now)
+            for size in sizes:
+                snapshot = self._snapshots.get(size)
+                if snapshot is None or now - snapshot["updated_at"] >= (
+                    self.refresh_interval
+                ):
+                    self._refresh(size)
+
+            # Drop snapshots nobody reads any more
+            for size in list(self._snapshots):
+                if size not in sizes:
+                    del self._snapshots[size]
+                    self._last_read.pop(size, None)
+
+            await asyncio.sleep(min(self.refresh_interval, 60))
+
+    async def start(self):
+        """Start the scheduler on the running event loop (idempotent)"""
+        if self._scheduler is not None and not self._scheduler.done():
+            return
+        self._scheduler = asyncio.ensure_future(self._run())
+        logger.info(
+            f"Refreshing traffic hotspots every {self.refresh_interval:.0f}s "
+            f"(max staleness {self.max_staleness:.0f}s)"
+        )
+
+    async def stop(self):
+        """Cancel the scheduler and any refresh in progress"""
+        tasks = list(self._refreshing.values())
+        if self._scheduler is not None:
+            tasks.append(self._scheduler)
+            self._scheduler = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot ages and read counters"""
+        return {
+            **self._stats,
+            "refresh_interval_seconds": self.refresh_interval,
+            "max_staleness_seconds": self.max_staleness,
+            "snapshots": {
+                str(size): {
+                    "hotspots": len(snapshot["hotspots"]),
+                    **self._metadata(snapshot),
+                }
+                for size, snapshot in list(self._snapshots.items())
+            },
+        }
@@ -0,0 +1,178 @@
+"""
+Columnar ingest cache for the training workbook.
+
+The first load of a workbook parses every sheet once and writes it to
+Parquet under a directory named after the workbook's SHA-256. Later loads of
+the same workbook skip Excel and read only the requested columns from
+Parquet, which is multi-threaded and far lighter on memory.
+
+Convert ahead of training with:
+    python ingest_cache.py namma_yatri_data.xlsx
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import argparse
+import tempfile
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet caching is optional; Excel is read directly
+    pa = pq = None
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Directory holding one subdirectory of Parquet files per workbook hash
+DEFAULT_CACHE_DIR = os.environ.get(
+    "INGEST_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_cache"),
+)
+# Bytes read at a time while hashing the workbook
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def workbook_hash(path: str) -> str:
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sheet_path(directory: str, sheet: str) -> str:
+    return os.path.join(directory, f"{sheet}.parquet")
+
+
+def read_excel_sheets(
+    excel_path: str, columns: Dict[str, Optional[List[str]]]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Read sheets straight from Excel, opening the workbook once.
+
+    Args:
+        excel_path: Path of the workbook
+        columns: Sheet name -> columns to keep (names missing from the sheet
+            are ignored), or None for every column
+    """
+    frames = pd.read_excel(excel_path, sheet_name=list(columns))
+    return {
+        sheet: (
+            frame
+            if columns[sheet] is None
+            else frame[[c for c in frame.columns if c in columns[sheet]]]
+        )
+        for sheet, frame in frames.items()
+    }
+
+
+def convert_workbook(
+    excel_path: str, sheets: List[str], cache_dir: str = DEFAULT_CACHE_DIR
+) -> str:
+    """
+    Write every listed sheet of a workbook to Parquet.
+
+    The files are written to a temporary directory and renamed into place,
+    so a concurrent or interrupted conversion never leaves a partial cache.
+
+    Returns:
+        Directory holding <sheet>.parquet for each sheet
+    """
+    directory = os.path.join(cache_dir, workbook_hash(excel_path))
+    if all(os.path.exists(sheet_path(directory, sheet)) for sheet in sheets):
+        return directory
+
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".converting-", dir=cache_dir)
+    try:
+        frames = pd.read_excel(excel_path, sheet_name=sheets)
+        for sheet, frame in frames.items():
+            pq.write_table(
+                pa.Table.from_pandas(frame, preserve_index=False),
+                sheet_path(staging, sheet),
+            )
+        if os.path.isdir(directory):
+            # An older conversion with fewer sheets; replace it
+            shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+    except OSError:
+        # Another process finished the same conversion first
+        if not all(os.path.exists(sheet_path(directory, s)) for s in sheets):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    logger.info(f"Converted {len(sheets)} sheets of {excel_path} to {directory}")
+    return directory
+
+
+def load_sheets(
+    excel_path: str,
+    columns: Dict[str, Optional[List[str]]],
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Load sheets of a workbook through the Parquet cache.
+
+    Args:
+        excel_path: Path of the workbook
+        columns: Sheet name -> columns to read (names missing from the sheet
+            are ignored), or None for every column
+        cache_dir: Cache directory, or None/empty to always read Excel
+
+    Returns:
+        Sheet name -> DataFrame with the requested columns
+    """
+    if not cache_dir or pq is None:
+        if cache_dir:
+            logger.warning("pyarrow is not installed, reading Excel directly")
+        return read_excel_sheets(excel_path, columns)
+
+    try:
+        directory = convert_workbook(excel_path, list(columns), cache_dir)
+    except Exception as e:
+        logger.error(f"Error converting {excel_path} to Parquet: {e}")
+        return read_excel_sheets(excel_path, columns)
+
+    frames = {}
+    for sheet, wanted in columns.items():
+        path = sheet_path(directory, sheet)
+        names = pq.read_schema(path).names
+        frames[sheet] = pq.read_table(
+            path,
+            columns=names if wanted is None else [c for c in names if c in wanted],
+        ).to_pandas()
+    return frames
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convert workbook sheets to the Parquet ingest cache"
+    )
+    parser.add_argument("excel_path", help="Path of the workbook")
+    parser.add_argument(
+        "--sheets",
+        nargs="+",
+        default=["Trips", "Trip_Details", "Duration", "Assembly"],
+        help="Sheets to convert",
+    )
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    args = parse_args()
+    if pq is None:
+        raise SystemExit("pyarrow is required to build the ingest cache")
+    print(convert_workbook(args.excel_path, args.sheets, args.cache_dir))
@@ -0,0 +1,402 @@
+import os
+import json
+import time
+import random
+import hashlib
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Base URLs of the Google APIs; point both at fake_maps_server.py to test offline
+MAPS_BASE_URL = os.environ.get(
+    "GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com"
+).rstrip("/")
+ROADS_BASE_URL = os.environ.get(
+    "GOOGLE_ROADS_BASE_URL", "https://roads.googleapis.com"
+).rstrip("/")
+# When set, every live response is saved here in the fake server's fixture format
+RECORD_DIR = os.environ.get("MAPS_RECORD_DIR")
+
+
+class SingleFlight:
+    """
+    Collapses identical in-flight requests onto one shared future.
+
+    The first caller for a key (the leader) starts the request; callers that
+    arrive while it is still running await the leader's result instead of
+    issuing their own. The shared future is a concurrent.futures.Future so
+    callers on other event loops or threads can wait on it as well.
+
+    The request runs as a task detached from the leader, and every caller
+    waits through asyncio.shield, so a cancelled caller (e.g. a stream that
+    stopped early) only stops waiting; the request still completes for
+    everyone else coalesced onto it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        # Strong references to running requests; the loop only keeps weak ones
+        self._tasks = set()
+        self._stats = {"requests": 0, "executed": 0, "coalesced": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func() unless an identical request is already in flight.
+
+        Args:
+            key: Identity of the request (e.g. the full URL)
+            func: Coroutine function performing the request
+
+        Returns:
+            The result of func(), shared by every caller with the same key
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = concurrent.futures.Future()
+                self._inflight[key] = future
+                self._stats["executed"] += 1
+                is_leader = True
+            else:
+                self._stats["coalesced"] += 1
+                is_leader = False
+
+        if is_leader:
+            task = asyncio.ensure_future(func())
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._settle(key, future, done))
+
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def _settle(self, key: str, future: concurrent.futures.Future, task: asyncio.Task):
+        """Hand a finished request's outcome to every caller waiting on it"""
+        self._tasks.discard(task)
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+        if task.cancelled():
+            # Only happens when the loop itself shuts down; report a normal
+            # error so callers' fallbacks still handle it
+            future.set_exception(RuntimeError("Request cancelled by loop shutdown"))
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counters and the fraction of requests collapsed"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._inflight)
+
+        stats["collapse_ratio"] = (
+            round(stats["coalesced"] / stats["requests"], 4)
+            if stats["requests"]
+            else 0.0
+        )
+        return stats
+
+
+# Shared by every outbound Google Maps call in the process
+single_flight = SingleFlight()
+
+
+# Default (max concurrent requests, requests per second) per Google product,
+# kept below the documented per-project QPS limits
+DEFAULT_LIMITS = {
+    "geocode": (10, 40.0),
+    "roads": (5, 40.0),
+    "places": (10, 40.0),
+    "distancematrix": (10, 10.0),
+    "directions": (10, 40.0),
+    "other": (10, 20.0),
+}
+# Retries on OVER_QUERY_LIMIT / HTTP 429 with exponential backoff and full jitter
+MAX_QUOTA_RETRIES = int(os.environ.get("MAPS_MAX_QUOTA_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("MAPS_BACKOFF_BASE", 0.5))
+BACKOFF_CAP = float(os.environ.get("MAPS_BACKOFF_CAP", 8.0))
+
+
+class AsyncSemaphore:
+    """
+    Counting semaphore usable from coroutines on any event loop.
+
+    asyncio.Semaphore is bound to a single loop; this one keeps its state
+    behind a threading lock and wakes waiters on their own loop.
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    async def acquire(self):
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # release() already handed this waiter the permit
+                    granted = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._value += 1
+                    return
+                loop, future = self._waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_grant_permit, future)
+                return
+            except RuntimeError:
+                # The waiter's loop is closed; pass the permit to the next one
+                continue
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _grant_permit(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """Reservation-based token bucket shared across threads and event loops"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class OutboundLimiter:
+    """
+    Process-wide limiter for Google Maps APIs.
+
+    Each API gets its own concurrency semaphore and token bucket, and quota
+    errors are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]] = None):
+        limits = dict(limits or DEFAULT_LIMITS)
+        for api, (concurrency, qps) in list(limits.items()):
+            # Allow MAPS_<API>_CONCURRENCY / MAPS_<API>_QPS overrides
+            prefix = f"MAPS_{api.upper()}"
+            limits[api] = (
+                int(os.environ.get(f"{prefix}_CONCURRENCY", concurrency)),
+                float(os.environ.get(f"{prefix}_QPS", qps)),
+            )
+
+        self.limits = limits
+        self._semaphores = {
+            api: AsyncSemaphore(concurrency) for api, (concurrency, _) in limits.items()
+        }
+        self._buckets = {api: TokenBucket(qps) for api, (_, qps) in limits.items()}
+        self._lock = threading.Lock()
+        self._stats = {
+            api: {
+                "requests": 0,
+                "retries": 0,
+                "quota_errors": 0,
+                "throttled_seconds": 0.0,
+            }
+            for api in limits
+        }
+
+    @staticmethod
+    def api_for_url(url: str) -> str:
+        """Classify an outbound URL by Google product"""
+        if "snapToRoads" in url or "roads.googleapis.com" in url:
+            return "roads"
+        for api, marker in (
+            ("geocode", "/geocode/"),
+            ("places", "/place/"),
+            ("distancematrix", "/distancematrix/"),
+            ("directions", "/directions/"),
+        ):
+            if marker in url:
+                return api
+        return "other"
+
+    async def request(self, api: str, func: Callable[[], Awaitable[Tuple[int, Any]]]):
+        """
+        Run func() within the API's concurrency and rate limits.
+
+        Args:
+            api: Key into the limits table (see api_for_url)
+            func: Coroutine function returning (http_status, decoded_json)
+
+        Returns:
+            The decoded JSON of the last attempt
+        """
+        semaphore = self._semaphores.get(api, self._semaphores["other"])
+        bucket = self._buckets.get(api, self._buckets["other"])
+        stats = self._stats.get(api, self._stats["other"])
+
+        attempt = 0
+        while True:
+            await semaphore.acquire()
+            try:
+                waited = await bucket.acquire()
+                http_status, data = await func()
+            finally:
+                semaphore.release()
+
+            quota_error = is_quota_error(http_status, data)
+            with self._lock:
+                stats["requests"] += 1
+                stats["throttled_seconds"] += waited
+                if quota_error:
+                    stats["quota_errors"] += 1
+
+            if not quota_error or attempt >= MAX_QUOTA_RETRIES:
+                return data
+
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+            logger.warning(
+                f"Quota error from {api} API, retrying in {delay:.2f}s (attempt {attempt + 1})"
+            )
+            with self._lock:
+                stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-API request, retry and throttling counters"""
+        with self._lock:
+            stats = {api: dict(values) for api, values in self._stats.items()}
+
+        for api, values in stats.items():
+            concurrency, qps = self.limits[api]
+            values["throttled_seconds"] = round(values["throttled_seconds"], 3)
+            values["concurrency_limit"] = concurrency
+            values["qps_limit"] = qps
+            values["waiting"] = self._semaphores[api].waiting
+        return stats
+
+
+def is_quota_error(http_status: int, data: Any) -> bool:
+    """Detect quota exhaustion in both the Maps (status) and Roads (error) formats"""
+    if http_status == 429:
+        return True
+    if not isinstance(data, dict):
+        return False
+    if data.get("status") == "OVER_QUERY_LIMIT":
+        return True
+    error = data.get("error")
+    return isinstance(error, dict) and error.get("status") == "RESOURCE_EXHAUSTED"
+
+
+# Shared by every endpoint so one request cannot burst past the project quota
+limiter = OutboundLimiter()
+
+
+async def fetch_json(session, url: str) -> Dict[str, Any]:
+    """
+    GET a Google Maps API URL and decode the JSON body.
+
+    Identical requests already in flight share one response, so the returned
+    dict must be treated as read-only. Requests are throttled by the shared
+    limiter and retried on quota errors.
+    """
+
+    async def _attempt():
+        async with session.get(url) as response:
+            data = await response.json(content_type=None)
+            if RECORD_DIR:
+                record_fixture(RECORD_DIR, url, response.status, data)
+            return response.status, data
+
+    async def _request():
+        return await limiter.request(limiter.api_for_url(url), _attempt)
+
+    return await single_flight.do(url, _request)
+
+
+def fixture_endpoint(path: str) -> str:
+    """Name a Maps API path by its last meaningful segment, e.g. geocode or snapToRoads"""
+    segments = [segment for segment in path.split("/") if segment and segment != "json"]
+    return segments[-1] if segments else "root"
+
+
+def fixture_key(path: str, params: Dict[str, str]) -> str:
+    """Stable fixture id for a request, ignoring the API key and parameter order"""
+    canonical = "&".join(
+        f"{name}={value}" for name, value in sorted(params.items()) if name != "key"
+    )
+    return hashlib.sha1(f"{path}?{canonical}".encode()).hexdigest()[:16]
+
+
+def fixture_path(fixture_dir: str, path: str, params: Dict[str, str]) -> str:
+    """Location of the fixture file for a request"""
+    return os.path.join(
+        fixture_dir, fixture_endpoint(path), f"{fixture_key(path, params)}.json"
+    )
+
+
+def record_fixture(fixture_dir: str, url: str, http_status: int, data: Any):
+    """Save a live response so fake_maps_server.py can replay it"""
+    parts = urlsplit(url)
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+    path = fixture_path(fixture_dir, parts.path, params)
+    fixture = {
+        "path": parts.path,
+        "params": {name: value for name, value in params.items() if name != "key"},
+        "http_status": http_status,
+        "body": data,
+    }
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(fixture, f, indent=2)
+    except OSError as e:
+        logger.error(f"Error recording fixture to {path}: {str(e)}")
@@ -2,10 +2,13 @@
 import pandas as pd
 from datetime import datetime
 import joblib
+import json
 import os
 import sys
 import logging
 
+from ingest_cache import DEFAULT_CACHE_DIR, load_sheets
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,14 +16,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def load_data(excel_path):
-    """Load the Our Traveller data from Excel file"""
+# Columns each sheet contributes to training; Duration and Assembly use
+# either capitalisation of their headers (see preprocess_data)
+TRAINING_COLUMNS = {
+    'Trips': ['tripid', 'loc_from', 'loc_to', 'duration'],
+    'Trip_Details': ['tripid', 'end_ride'],
+    'Duration': ['id', 'ID', 'duration', 'Duration'],
+    'Assembly': ['ID', 'id', 'Assembly', 'assembly'],
+}
+
+def load_data(excel_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load the Our Traveller data from Excel file.
+
+    Sheets go through the Parquet ingest cache keyed by the workbook's hash,
+    so only the first run on a workbook parses Excel. Pass cache_dir=None
+    to read Excel directly.
+    """
     try:
-        # Load all worksheets
-        trips_df = pd.read_excel(excel_path, sheet_name='Trips')
-        trip_details_df = pd.read_excel(excel_path, sheet_name='Trip_Details')
-        duration_df = pd.read_excel(excel_path, sheet_name='Duration')
-        assembly_df = pd.read_excel(excel_path, sheet_name='Assembly')
+        # Load the training columns of all worksheets
+        sheets = load_sheets(excel_path, TRAINING_COLUMNS, cache_dir)
+        trips_df = sheets['Trips']
+        trip_details_df = sheets['Trip_Details']
+        duration_df = sheets['Duration']
+        assembly_df = sheets['Assembly']
         
         logger.info(f"Successfully loaded data from {excel_path}")
         logger.info(f"- Trips: {trips_df.shape[0]} rows")
@@ -32,9 +51,8 @@ def load_data(excel_path):
         logger.error(f"Error loading data: {e}")
         raise
 
-def preprocess_data(trips_df, trip_details_df, duration_df, assembly_df):
-    """Preprocess and merge the data"""
-    # Create mappings
+def build_mappings(duration_df, assembly_df):
+    """Duration id -> time of day and assembly id -> name mappings"""
     duration_id_col = 'id' if 'id' in duration_df.columns else 'ID'
     duration_name_col = 'duration' if 'duration' in duration_df.columns else 'Duration'
     
@@ -45,6 +63,13 @@ def preprocess_data(trips_df, trip_details_df, duration_df, assembly_df):
     
     assembly_map = dict(zip(assembly_df[assembly_id_col], assembly_df[assembly_name_col]))
     
+    return duration_map, assembly_map
+
+def preprocess_data(trips_df, trip_details_df, duration_df, assembly_df):
+    """Preprocess and merge the data"""
+    # Create mappings
+    duration_map, assembly_map = build_mappings(duration_df, assembly_df)
+    
     # Filter completed trips
     # In Trip_Details, end_ride=1 means the ride was completed
     completed_trip_ids = trip_details_df[trip_details_df['end_ride'] == 1]['tripid'].unique()
@@ -70,6 +95,16 @@ def analyze_location_patterns(completed_trips):
     # Analyze destination locations
     dest_counts = completed_trips.groupby(['hour_start', 'to_location']).size().reset_index(name='dest_count')
     
+    return rank_location_activity(origin_counts, dest_counts)
+
+def rank_location_activity(origin_counts, dest_counts):
+    """
+    Top locations per hour and overall from per-hour trip counts.
+
+    Args:
+        origin_counts: hour_start, from_location, origin_count rows sorted by hour and location
+        dest_counts: hour_start, to_location, dest_count rows sorted by hour and location
+    """
     # Rename columns for merging
     origin_counts = origin_counts.rename(columns={'from_location': 'location'})
     dest_counts = dest_counts.rename(columns={'to_location': 'location'})
@@ -195,6 +230,53 @@ def get_recommended_locations(time_input, top_locations_by_hour, time_block_loca
         'top_recommendation': hourly_recommendations[0] if hourly_recommendations else None
     }
 
+def resolve_assembly_coordinates(assembly_map, fallback_path="assembly_coordinates.json", refresh=False):
+    """
+    Resolve every assembly name to lat/lng and formatted_address once at training time.
+
+    Names already in the fallback file are taken from it; with refresh=True
+    (and GOOGLE_MAPS_API_KEY set) every name is geocoded again.
+    """
+    names = sorted({name for name in assembly_map.values() if isinstance(name, str)})
+
+    # Start from the offline fallback file so builds without an API key still get coordinates
+    assembly_coordinates = {}
+    if fallback_path and os.path.exists(fallback_path):
+        try:
+            with open(fallback_path) as f:
+                assembly_coordinates = json.load(f)
+            logger.info(f"Loaded {len(assembly_coordinates)} assembly coordinates from {fallback_path}")
+        except Exception as e:
+            logger.error(f"Error reading assembly coordinates from {fallback_path}: {e}")
+
+    missing = [name for name in names if refresh or name not in assembly_coordinates]
+    if missing and os.environ.get("GOOGLE_MAPS_API_KEY"):
+        from geocode_utils import locations_to_coordinates
+
+        for name, result in zip(missing, locations_to_coordinates(missing)):
+            if 'lat' in result and 'lng' in result:
+                assembly_coordinates[name] = {
+                    'lat': result['lat'],
+                    'lng': result['lng'],
+                    'formatted_address': result.get('formatted_address', name),
+                }
+    elif missing:
+        logger.warning("GOOGLE_MAPS_API_KEY not set, skipping assembly geocoding")
+
+    unresolved = [name for name in names if name not in assembly_coordinates]
+    if unresolved:
+        logger.warning(f"Could not resolve coordinates for {len(unresolved)} assemblies: {unresolved}")
+
+    # Keep the fallback file up to date for future offline builds
+    if fallback_path and assembly_coordinates:
+        try:
+            with open(fallback_path, 'w') as f:
+                json.dump(assembly_coordinates, f, indent=2, sort_keys=True)
+        except Exception as e:
+            logger.error(f"Error writing assembly coordinates to {fallback_path}: {e}")
+
+    return {name: assembly_coordinates[name] for name in names if name in assembly_coordinates}
+
 def save_model(model_data, filepath="namma_yatri_location_model.pkl"):
     """Save the model data to a pickle file"""
     try:
@@ -0,0 +1,356 @@
+import os
+import json
+import math
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from async_runtime import io_loop
+from geo_distance import calculate_distance
+from geocode_cache import geohash_encode
+from maps_client import MAPS_BASE_URL, fetch_json
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# SQLite file holding the catalogue (empty string: memory only)
+DEFAULT_CATALOGUE_PATH = os.environ.get(
+    "PARKING_CATALOGUE_PATH",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "parking_catalogue.sqlite3"
+    ),
+)
+# Geohash length of the catalogue cells: 6 is ~1.2km x 0.6km
+CELL_PRECISION = int(os.environ.get("PARKING_CELL_PRECISION", 6))
+# Cells are searched again once their data is older than this (seconds)
+CELL_TTL = int(os.environ.get("PARKING_CELL_TTL", 7 * 24 * 3600))
+# Nearby Search returns at most 20 places per page and 3 pages per search;
+# dense cells are read page by page up to this many pages
+MAX_PAGES = max(1, min(int(os.environ.get("PARKING_MAX_PAGES", 3)), 3))
+# A next_page_token only becomes valid a short while after it is issued
+# (seconds); until then Places answers INVALID_REQUEST
+PAGE_DELAY = float(os.environ.get("PARKING_PAGE_DELAY", 2.0))
+# Attempts per follow-up page while its token is not yet valid
+PAGE_ATTEMPTS = 3
+
+METERS_PER_DEGREE = 111320
+# Place fields kept in the catalogue; everything the parking pipeline reads
+PLACE_FIELDS = (
+    "name",
+    "vicinity",
+    "place_id",
+    "rating",
+    "user_ratings_total",
+    "geometry",
+    "opening_hours",
+)
+
+
+def cell_size(precision: int = CELL_PRECISION) -> Tuple[float, float]:
+    """Height and width of a geohash cell in degrees"""
+    lat_bits = (5 * precision) // 2
+    lng_bits = 5 * precision - lat_bits
+    return 180 / 2**lat_bits, 360 / 2**lng_bits
+
+
+def cells_in_radius(
+    lat: float, lng: float, radius: float, precision: int = CELL_PRECISION
+) -> List[Tuple[str, float, float]]:
+    """
+    Geohash cells overlapping the bounding box of a circle.
+
+    Returns:
+        (geohash, center_lat, center_lng) for each cell
+    """
+    height, width = cell_size(precision)
+    dlat = radius / METERS_PER_DEGREE
+    dlng = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+
+    cells = []
+    row = math.floor((lat - dlat + 90) / height)
+    while row * height - 90 <= lat + dlat:
+        col = math.floor((lng - dlng + 180) / width)
+        while col * width - 180 <= lng + dlng:
+            center_lat = (row + 0.5) * height - 90
+            center_lng = (col + 0.5) * width - 180
+            cells.append(
+                (
+                    geohash_encode(center_lat, center_lng, precision),
+                    center_lat,
+                    center_lng,
+                )
+            )
+            col += 1
+        row += 1
+    return cells
+
+
+def cell_search_radius(center_lat: float, precision: int = CELL_PRECISION) -> int:
+    """Radius in metres of a search circle that covers a whole cell"""
+    height, width = cell_size(precision)
+    half_height = height * METERS_PER_DEGREE / 2
+    half_width = width * METERS_PER_DEGREE * math.cos(math.radians(center_lat)) / 2
+    return math.ceil(math.hypot(half_height, half_width))
+
+
+class ParkingCatalogue:
+    """
+    Persistent catalogue of places returned by Places Nearby Search.
+
+    Searches are made per geohash cell (a circle covering the whole cell)
+    and remembered per query, e.g. "type=parking" or "type=shopping_mall".
+    A radius query is answered from the places of every cell it overlaps;
+    Places is only called for cells that were never searched with that query
+    or whose data is older than the cell TTL.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = DEFAULT_CATALOGUE_PATH,
+        precision: int = CELL_PRECISION,
+        ttl: int = CELL_TTL,
+        max_pages: int = MAX_PAGES,
+        page_delay: float = PAGE_DELAY,
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, or None/empty to keep the catalogue in memory only
+            precision: Geohash length of the catalogue cells
+            ttl: Lifetime of a cell's search results in seconds
+            max_pages: Nearby Search pages read per cell
+            page_delay: Seconds to wait before requesting a follow-up page
+        """
+        self.db_path = db_path
+        self.precision = precision
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self.page_delay = page_delay
+
+        self._lock = threading.Lock()
+        self._conn = None
+        # place_id -> stored place fields
+        self._places: Dict[str, Dict[str, Any]] = {}
+        # (query, cell) -> (fetched_at, place_ids found by that cell's search)
+        self._cells: Dict[Tuple[str, str], Tuple[float, List[str]]] = {}
+        self._stats = {
+            "cell_hits": 0,
+            "cell_fetches": 0,
+            "page_fetches": 0,
+            "truncated_cells": 0,
+            "fetch_errors": 0,
+        }
+
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS places ("
+                    "place_id TEXT PRIMARY KEY, data TEXT)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cells (query TEXT, cell TEXT, "
+                    "fetched_at REAL, place_ids TEXT, PRIMARY KEY (query, cell))"
+                )
+                self._conn.commit()
+                self._load()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening parking catalogue at {db_path}: {str(e)}")
+                self._conn = None
+
+    def _load(self):
+        for place_id, data in self._conn.execute("SELECT place_id, data FROM places"):
+            self._places[place_id] = json.loads(data)
+        for query, cell, fetched_at, place_ids in self._conn.execute(
+            "SELECT query, cell, fetched_at, place_ids FROM cells"
+        ):
+            self._cells[(query, cell)] = (fetched_at, json.loads(place_ids))
+
+        if self._cells:
+            logger.info(
+                f"Loaded {len(self._places)} places in {len(self._cells)} "
+                f"parking catalogue cells"
+            )
+
+    def _store(self, query: str, cell: str, places: List[Dict[str, Any]]):
+        """Remember one cell's search results in memory and on disk"""
+        fetched_at = time.time()
+        records = [
+            {field: place[field] for field in PLACE_FIELDS if field in place}
+            for place in places
+            if place.get("place_id")
+        ]
+        place_ids = [record["place_id"] for record in records]
+
+        with self._lock:
+            for record in records:
+                self._places[record["place_id"]] = record
+            self._cells[(query, cell)] = (fetched_at, place_ids)
+
+            if self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO places (place_id, data) VALUES (?, ?)",
+                        [(r["place_id"], json.dumps(r)) for r in records],
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO cells (query, cell, fetched_at, place_ids) "
+                        "VALUES (?, ?, ?, ?)",
+                        (query, cell, fetched_at, json.dumps(place_ids)),
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing parking catalogue: {str(e)}")
+
+    async def _fetch_page(self, url: str, cell: str) -> Dict[str, Any]:
+        """One Nearby Search page, or {"status": "UNKNOWN_ERROR"} if the call fails"""
+        try:
+            return await fetch_json(io_loop.session, url)
+        except Exception as e:
+            logger.error(f"Error searching parking catalogue cell {cell}: {str(e)}")
+            return {"status": "UNKNOWN_ERROR"}
+
+    async def _fetch_cell(
+        self, query: str, cell: str, center_lat: float, center_lng: float
+    ) -> Optional[str]:
+        """
+        Search one cell with Places Nearby Search and store the results.
+
+        A dense cell fills the 20-place first page and returns a
+        next_page_token; the following pages are read too, up to max_pages,
+        so the cell is not stored with only the first 20 places.
+
+        Returns:
+            None on success, otherwise the failing Places status
+        """
+        api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+        nearby_url = (
+            f"{MAPS_BASE_URL}/maps/api/place/nearbysearch/json?"
+            f"location={center_lat},{center_lng}"
+            f"&radius={cell_search_radius(center_lat, self.precision)}"
+            f"&{query}&key={api_key}"
+        )
+
+        nearby_data = await self._fetch_page(nearby_url, cell)
+        status = nearby_data.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            # Quota or request errors are not cached; the cell is retried next time
+            self._stats["fetch_errors"] += 1
+            return status
+
+        places = list(nearby_data.get("results", []))
+        token = nearby_data.get("next_page_token")
+        pages = 1
+        while token and pages < self.max_pages:
+            page_url = (
+                f"{MAPS_BASE_URL}/maps/api/place/nearbysearch/json?"
+                f"pagetoken={token}&key={api_key}"
+            )
+            for _ in range(PAGE_ATTEMPTS):
+                await asyncio.sleep(self.page_delay)
+                page_data = await self._fetch_page(page_url, cell)
+                if page_data.get("status") != "INVALID_REQUEST":
+                    break
+            if page_data.get("status") != "OK":
+                # Caching the first pages alone would hide the rest of the cell
+                # until the TTL expires; search it again on the next query instead
+                self._stats["fetch_errors"] += 1
+                return page_data.get("status")
+
+            self._stats["page_fetches"] += 1
+            places.extend(page_data.get("results", []))
+            token = page_data.get("next_page_token")
+            pages += 1
+
+        if token:
+            # Places has more than max_pages pages for this cell; keep what we have
+            self._stats["truncated_cells"] += 1
+            logger.warning(
+                f"Parking catalogue cell {cell} has more than "
+                f"{len(places)} places for {query}"
+            )
+
+        self._stats["cell_fetches"] += 1
+        self._store(query, cell, places)
+        return None
+
+    async def nearby(
+        self, lat: float, lng: float, radius: float, query: str
+    ) -> Dict[str, Any]:
+        """
+        Places within radius metres of a point, answered from the catalogue.
+
+        Args:
+            lat: Latitude of the search center
+            lng: Longitude of the search center
+            radius: Search radius in metres
+            query: Places Nearby Search filter, e.g. "type=parking&keyword=parking"
+
+        Returns:
+            A Nearby Search style response ({"status", "results"}) with results
+            sorted by distance from the center
+        """
+        now = time.time()
+        cells = cells_in_radius(lat, lng, radius, self.precision)
+
+        missing = []
+        for cell, center_lat, center_lng in cells:
+            entry = self._cells.get((query, cell))
+            if entry is not None and now - entry[0] < self.ttl:
+                self._stats["cell_hits"] += 1
+            else:
+                missing.append((cell, center_lat, center_lng))
+
+        errors = []
+        if missing:
+            errors = [
+                status
+                for status in await asyncio.gather(
+                    *(self._fetch_cell(query, *cell) for cell in missing)
+                )
+                if status
+            ]
+
+        places = []
+        seen = set()
+        for cell, _, _ in cells:
+            entry = self._cells.get((query, cell))
+            if entry is None:
+                continue
+            for place_id in entry[1]:
+                place = self._places.get(place_id)
+                if place is None or place_id in seen:
+                    continue
+                seen.add(place_id)
+                places.append(place)
+
+        # A radius query covers a handful of cells, at most a few dozen
+        # places, where a scalar loop beats the numpy call overhead
+        results = []
+        for place in places:
+            location = place["geometry"]["location"]
+            distance = calculate_distance(lat, lng, location["lat"], location["lng"])
+            if distance <= radius:
+                results.append((distance, place))
+        results.sort(key=lambda item: item[0])
+        results = [place for _, place in results]
+
+        if results:
+            status = "OK"
+        else:
+            status = errors[0] if errors else "ZERO_RESULTS"
+        return {"status": status, "results": results}
+
+    def stats(self) -> Dict[str, Any]:
+        """Catalogue size and cell hit/fetch counters"""
+        return {
+            **self._stats,
+            "places": len(self._places),
+            "cells": len(self._cells),
+        }
+
+
+# Process-wide catalogue shared by every parking search
+parking_catalogue = ParkingCatalogue()
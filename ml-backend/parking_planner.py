@@ -0,0 +1,459 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo_distance import (
+    coordinates,
+    distance_matrix,
+    haversine,
+    place_coordinates,
+    top_k,
+)
+from parking_catalogue import parking_catalogue
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Official parking search, then the broader keyword search for hotspots it missed
+PARKING_QUERY = "type=parking&keyword=parking|garage|lot"
+KEYWORD_QUERY = "keyword=parking"
+# Types of places that typically have parking lots
+ALTERNATIVE_PLACE_TYPES = [
+    "shopping_mall",
+    "supermarket",
+    "grocery_or_supermarket",
+    "department_store",
+    "store",
+    "gas_station",
+]
+# Hotspots closer than this fraction of the search radius share one search
+OVERLAP_FRACTION = float(os.environ.get("PARKING_OVERLAP_FRACTION", 0.5))
+# Parking closer than this to a hotspot is inside the congestion, not at its edge
+EDGE_MIN_DISTANCE = 200
+# Extra radius given to the alternative (unofficial) parking search
+ALTERNATIVE_EXTRA_RADIUS = 200
+# Hotspots given the alternative place-type searches (six per hotspot); the
+# highest priority ones that still have no edge location
+ALTERNATIVE_HOTSPOTS = int(os.environ.get("PARKING_ALTERNATIVE_HOTSPOTS", 3))
+
+_stats = {
+    "plans": 0,
+    "hotspots_requested": 0,
+    "hotspots_searched": 0,
+    "duplicate_places": 0,
+    "alternative_searches": 0,
+    "alternatives_skipped": 0,
+}
+
+
+def rank_parking_spots(results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Flatten per-hotspot parking results, drop duplicate place_ids and sort
+    edge locations first, then by distance from the hotspot.
+    """
+    all_parking_locations = []
+
+    # Flatten results and filter out duplicates based on place_id
+    seen_place_ids = set()
+    for hotspot_results in results:
+        for spot in hotspot_results:
+            place_id = spot.get("place_id")
+            if place_id and place_id not in seen_place_ids:
+                seen_place_ids.add(place_id)
+                all_parking_locations.append(spot)
+
+    if not all_parking_locations:
+        return []
+
+    # Sort by edge location and distance (lexsort is stable, like list.sort)
+    count = len(all_parking_locations)
+    not_edge = np.fromiter(
+        (not spot.get("is_edge_location") for spot in all_parking_locations),
+        dtype=bool,
+        count=count,
+    )
+    distance = np.fromiter(
+        (spot.get("distance_from_hotspot", 1000) for spot in all_parking_locations),
+        dtype=float,
+        count=count,
+    )
+    order = np.lexsort((distance, not_edge))
+
+    return [all_parking_locations[i] for i in order]
+
+
+def merge_overlapping_hotspots(
+    hotspots: List[Dict[str, Any]],
+    radius: float,
+    overlap_fraction: float = OVERLAP_FRACTION,
+) -> List[Dict[str, Any]]:
+    """
+    Drop hotspots whose search circle mostly repeats an earlier one.
+
+    Hotspots are kept in input order, so earlier (higher priority) hotspots
+    represent their neighbours. Hotspots without coordinates are dropped.
+    """
+    limit = radius * overlap_fraction
+    hotspots = [h for h in hotspots if "lat" in h and "lng" in h]
+    if limit <= 0 or len(hotspots) < 2:
+        return hotspots
+
+    # Hotspot lists are at most a few hundred long, so the full matrix is cheap
+    points = coordinates(hotspots)
+    close = (distance_matrix(points, points) <= limit).tolist()
+    kept = []
+    for i, row in enumerate(close):
+        if not any(row[j] for j in kept):
+            kept.append(i)
+    return [hotspots[i] for i in kept]
+
+
+def hotspot_reference(hotspot: Dict[str, Any]) -> Dict[str, Any]:
+    """The 'nearby_hotspot' field attached to every parking spot"""
+    return {
+        "name": hotspot.get("location", "Unknown location"),
+        "lat": hotspot["lat"],
+        "lng": hotspot["lng"],
+    }
+
+
+class ParkingQueryPlan:
+    """
+    All parking searches needed for one request.
+
+    Hotspots whose radii mostly overlap are merged before anything is
+    searched. The stages are the official parking search for every hotspot,
+    the keyword search for hotspots where that found nothing, and the
+    alternative place-type searches for the leading hotspots that still have
+    no edge location. Each stage runs all
+    of its searches at once, and a stage only runs while fewer than
+    min_edge_spots edge locations have been found. Places are deduplicated
+    by place_id across all hotspots and query types.
+    """
+
+    def __init__(
+        self,
+        hotspots: List[Dict[str, Any]],
+        radius: int = 300,
+        max_results: int = 3,
+        min_edge_spots: int = 3,
+        alternative_radius: Optional[int] = None,
+        overlap_fraction: float = OVERLAP_FRACTION,
+        alternative_hotspots: int = ALTERNATIVE_HOTSPOTS,
+    ):
+        """
+        Args:
+            hotspots: Dicts with 'lat' and 'lng', highest priority first
+            radius: Parking search radius in metres around each hotspot
+            max_results: Maximum parking spots taken per hotspot and stage
+            min_edge_spots: Edge locations after which the plan stops searching
+            alternative_radius: Alternative search radius (default: radius + 200m)
+            overlap_fraction: Hotspots closer than this fraction of radius are merged
+            alternative_hotspots: Maximum hotspots given the alternative searches
+        """
+        self.radius = radius
+        self.max_results = max_results
+        self.min_edge_spots = min_edge_spots
+        self.alternative_radius = (
+            alternative_radius or radius + ALTERNATIVE_EXTRA_RADIUS
+        )
+        self.hotspots = merge_overlapping_hotspots(hotspots, radius, overlap_fraction)
+        self.alternative_hotspots = alternative_hotspots
+
+        self.seen_place_ids = set()
+        self.edge_spots = 0
+        # (lat, lng) of hotspots that have at least one edge location
+        self.covered = set()
+        # Hotspots where the official parking search found nothing
+        self.unmatched = []
+
+        _stats["plans"] += 1
+        _stats["hotspots_requested"] += len(hotspots)
+        _stats["hotspots_searched"] += len(self.hotspots)
+
+    @property
+    def satisfied(self) -> bool:
+        """Whether enough edge locations have been found to stop searching"""
+        return self.edge_spots >= self.min_edge_spots
+
+    def _count_edge(self, hotspot: Dict[str, Any]):
+        self.edge_spots += 1
+        self.covered.add((hotspot["lat"], hotspot["lng"]))
+
+    def alternative_targets(self) -> List[Dict[str, Any]]:
+        """
+        Hotspots for the alternative stage: the highest priority ones without
+        an edge location yet, at most alternative_hotspots of them.
+        """
+        uncovered = [
+            hotspot
+            for hotspot in self.hotspots
+            if (hotspot["lat"], hotspot["lng"]) not in self.covered
+        ]
+        targets = uncovered[: max(0, self.alternative_hotspots)]
+        _stats["alternatives_skipped"] += len(self.hotspots) - len(targets)
+        return targets
+
+    def _claim(self, place_id: str) -> bool:
+        """Reserve a place_id for this request; False if it was already taken"""
+        if not place_id:
+            return True
+        if place_id in self.seen_place_ids:
+            _stats["duplicate_places"] += 1
+            return False
+        self.seen_place_ids.add(place_id)
+        return True
+
+    async def parking_places(
+        self, hotspot: Dict[str, Any], query: str = PARKING_QUERY
+    ) -> List[Dict[str, Any]]:
+        """Places from one parking search around a hotspot"""
+        try:
+            nearby_data = await parking_catalogue.nearby(
+                hotspot["lat"], hotspot["lng"], self.radius, query
+            )
+        except Exception as e:
+            logger.error(
+                f"Error finding parking near {hotspot.get('location', 'unknown')}: {str(e)}"
+            )
+            return []
+
+        if nearby_data.get("status") != "OK":
+            if nearby_data.get("status") != "ZERO_RESULTS":
+                logger.warning(
+                    f"Failed to find parking near {hotspot.get('location', 'Unknown location')}: "
+                    f"{nearby_data.get('status')}"
+                )
+            if query == PARKING_QUERY:
+                self.unmatched.append(hotspot)
+            return []
+        return nearby_data.get("results", [])
+
+    async def alternative_places(
+        self, hotspot: Dict[str, Any]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """(place_type, place) for every alternative place type, searched in parallel"""
+
+        async def search_places(place_type):
+            try:
+                nearby_data = await parking_catalogue.nearby(
+                    hotspot["lat"],
+                    hotspot["lng"],
+                    self.alternative_radius,
+                    f"type={place_type}",
+                )
+            except Exception as e:
+                logger.error(
+                    f"Error searching for {place_type} near "
+                    f"({hotspot['lat']}, {hotspot['lng']}): {str(e)}"
+                )
+                return []
+            if nearby_data.get("status") != "OK":
+                return []
+            return [(place_type, place) for place in nearby_data.get("results", [])]
+
+        _stats["alternative_searches"] += 1
+        results = await asyncio.gather(
+            *(search_places(place_type) for place_type in ALTERNATIVE_PLACE_TYPES)
+        )
+        return [item for type_results in results for item in type_results]
+
+    def measure(
+        self,
+        hotspots: List[Dict[str, Any]],
+        place_lists: List[List[Dict[str, Any]]],
+    ) -> List[np.ndarray]:
+        """
+        Distances for a whole stage of search results, computed in one batch.
+
+        Returns:
+            Per hotspot, the distance of each of its places to that hotspot
+        """
+        counts = [len(places) for places in place_lists]
+        flat = [place for places in place_lists for place in places]
+        if not flat:
+            return [np.empty(0) for _ in place_lists]
+
+        points = place_coordinates(flat)
+        origins = np.repeat(coordinates(hotspots), counts, axis=0)
+        distances = haversine(origins[:, 0], origins[:, 1], points[:, 0], points[:, 1])
+        return np.split(distances, np.cumsum(counts)[:-1])
+
+    def parking_spots(
+        self,
+        hotspot: Dict[str, Any],
+        places: List[Dict[str, Any]],
+        distances: np.ndarray,
+    ) -> List[Dict[str, Any]]:
+        """
+        Turn one hotspot's parking search results into new parking spots.
+
+        A spot is an edge location when it is 200m to radius from its hotspot.
+        """
+        is_edge = (EDGE_MIN_DISTANCE <= distances) & (distances <= self.radius)
+        distances = distances.tolist()
+        is_edge = is_edge.tolist()
+
+        parking_spots = []
+        for place, distance, edge in zip(places, distances, is_edge):
+            if len(parking_spots) >= self.max_results:
+                break
+            if not self._claim(place.get("place_id", "")):
+                continue
+
+            parking_spot = {
+                "lat": place["geometry"]["location"]["lat"],
+                "lng": place["geometry"]["location"]["lng"],
+                "name": place.get("name", "Parking Area"),
+                "vicinity": place.get("vicinity", ""),
+                "place_id": place.get("place_id", ""),
+                "rating": place.get("rating", 0),
+                "user_ratings_total": place.get("user_ratings_total", 0),
+                "distance_from_hotspot": round(distance),
+                "is_edge_location": edge,
+                "nearby_hotspot": hotspot_reference(hotspot),
+            }
+            if "opening_hours" in place:
+                parking_spot["open_now"] = place["opening_hours"].get("open_now", False)
+
+            if edge:
+                self._count_edge(hotspot)
+            parking_spots.append(parking_spot)
+        return parking_spots
+
+    def alternative_spots(
+        self,
+        hotspot: Dict[str, Any],
+        places: List[Tuple[str, Dict[str, Any]]],
+        distances: np.ndarray,
+    ) -> List[Dict[str, Any]]:
+        """
+        Turn one hotspot's alternative search results into new spots, nearest first.
+
+        Alternatives reach out to the alternative radius, but only those that
+        meet the same edge test as parking spots count towards min_edge_spots.
+        """
+        # Not too close, but still within walking distance
+        in_ring = np.flatnonzero(
+            (EDGE_MIN_DISTANCE <= distances) & (distances <= self.alternative_radius)
+        )
+        is_edge = (EDGE_MIN_DISTANCE <= distances) & (distances <= self.radius)
+        # Enough of the nearest to fill max_results even if every place
+        # already taken by this request is among them
+        closest = in_ring[
+            top_k(distances[in_ring], self.max_results + len(self.seen_place_ids))
+        ]
+
+        spots = []
+        for i in closest.tolist():
+            if self.satisfied or len(spots) >= self.max_results:
+                break
+            place_type, place = places[i]
+            if not self._claim(place.get("place_id", "")):
+                continue
+            spots.append(
+                {
+                    "lat": place["geometry"]["location"]["lat"],
+                    "lng": place["geometry"]["location"]["lng"],
+                    "name": place.get("name", "Unknown"),
+                    "vicinity": place.get("vicinity", ""),
+                    "place_id": place.get("place_id", ""),
+                    "type": place_type,
+                    "distance_from_hotspot": round(float(distances[i])),
+                    "likely_has_parking": True,
+                    "is_unofficial": True,
+                    "is_edge_location": bool(is_edge[i]),
+                    "nearby_hotspot": hotspot_reference(hotspot),
+                }
+            )
+            if is_edge[i]:
+                self._count_edge(hotspot)
+        return spots
+
+    def stage_spots(
+        self,
+        hotspots: List[Dict[str, Any]],
+        place_lists: List[List[Dict[str, Any]]],
+    ) -> List[List[Dict[str, Any]]]:
+        """New parking spots for each hotspot of a parking search stage"""
+        return [
+            self.parking_spots(hotspot, places, distances)
+            for hotspot, places, distances in zip(
+                hotspots, place_lists, self.measure(hotspots, place_lists)
+            )
+        ]
+
+    def stage_alternatives(
+        self,
+        hotspots: List[Dict[str, Any]],
+        place_lists: List[List[Tuple[str, Dict[str, Any]]]],
+    ) -> List[List[Dict[str, Any]]]:
+        """New alternative spots for each hotspot of the alternative stage"""
+        measured = self.measure(
+            hotspots, [[place for _, place in places] for places in place_lists]
+        )
+        return [
+            self.alternative_spots(hotspot, places, distances)
+            for hotspot, places, distances in zip(hotspots, place_lists, measured)
+        ]
+
+    async def parking_for(
+        self, hotspot: Dict[str, Any], query: str = PARKING_QUERY
+    ) -> List[Dict[str, Any]]:
+        """Search one hotspot and return its new parking spots"""
+        places = await self.parking_places(hotspot, query)
+        return self.stage_spots([hotspot], [places])[0]
+
+    async def alternatives_for(self, hotspot: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Search one hotspot and return its new alternative parking spots"""
+        if self.satisfied:
+            _stats["alternatives_skipped"] += 1
+            return []
+        places = await self.alternative_places(hotspot)
+        return self.stage_alternatives([hotspot], [places])[0]
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """
+        Execute the whole plan.
+
+        Searches in each stage run concurrently. Distances for a stage are
+        computed in one batch once all of its searches are back, and results
+        are assembled in hotspot order so the response does not depend on
+        completion order.
+
+        Returns:
+            Parking spots (edge locations first, then by distance), followed
+            by alternative spots grouped by hotspot
+        """
+        official = await asyncio.gather(
+            *(self.parking_places(hotspot) for hotspot in self.hotspots)
+        )
+        results = self.stage_spots(self.hotspots, official)
+
+        if self.unmatched and not self.satisfied:
+            unmatched = self.unmatched
+            keyword = await asyncio.gather(
+                *(self.parking_places(hotspot, KEYWORD_QUERY) for hotspot in unmatched)
+            )
+            results.extend(self.stage_spots(unmatched, keyword))
+        parking_spots = rank_parking_spots(results)
+
+        if self.satisfied or not self.hotspots:
+            _stats["alternatives_skipped"] += len(self.hotspots)
+            return parking_spots
+
+        targets = self.alternative_targets()
+        alternatives = await asyncio.gather(
+            *(self.alternative_places(hotspot) for hotspot in targets)
+        )
+        for spots in self.stage_alternatives(targets, alternatives):
+            parking_spots.extend(spots)
+        return parking_spots
+
+
+def stats() -> Dict[str, Any]:
+    """Planner counters across all requests"""
+    return dict(_stats)
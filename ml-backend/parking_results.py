@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import hashlib
+import secrets
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# SQLite file holding ranked results, shared by workers on the same host
+# (empty string: memory only)
+DEFAULT_RESULTS_PATH = os.environ.get(
+    "PARKING_RESULTS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "parking_results.sqlite3"),
+)
+# Cursors and spot ids stop resolving once their result is older than this (seconds)
+RESULT_TTL = int(os.environ.get("PARKING_RESULT_TTL", 30 * 60))
+# Number of results kept in the in-process tier
+MAX_RESULTS = int(os.environ.get("PARKING_RESULT_CACHE_SIZE", 256))
+
+# Decimals of the hotspot coordinates in a spot id: 5 is ~1m
+SPOT_ID_PRECISION = 5
+
+
+def spot_id(spot: Dict[str, Any]) -> str:
+    """
+    Stable id of a parking spot: the same place walked to the same hotspot
+    gets the same id in every response.
+    """
+    hotspot = spot.get("nearby_hotspot", {})
+    place = spot.get("place_id") or f"{spot['lat']},{spot['lng']}"
+    key = (
+        f"{place}@{hotspot.get('lat', 0):.{SPOT_ID_PRECISION}f},"
+        f"{hotspot.get('lng', 0):.{SPOT_ID_PRECISION}f}"
+    )
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def encode_cursor(result_id: str, offset: int) -> str:
+    """Opaque cursor of the page starting at offset within a stored result"""
+    return f"{result_id}.{offset}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Result id and offset of a cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    result_id, _, offset = str(cursor).partition(".")
+    if not result_id or not offset.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return result_id, int(offset)
+
+
+class ParkingResultStore:
+    """
+    Ranked parking results kept for cursor pagination and walking details.
+
+    A response ranks every spot once and stores the whole list; later pages
+    are slices of that list, so paging never repeats the parking search.
+    Spots are also stored by their stable id, which the walking details
+    endpoint resolves to the walking leg of the spot.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = DEFAULT_RESULTS_PATH,
+        ttl: int = RESULT_TTL,
+        max_results: int = MAX_RESULTS,
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, or None/empty to keep results in memory only
+            ttl: Lifetime of a stored result in seconds
+            max_results: Maximum number of results in the in-process tier
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_results = max_results
+
+        self._lock = threading.Lock()
+        self._conn = None
+        # result_id -> (created_at, ranked spots)
+        self._results: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = (
+            OrderedDict()
+        )
+        # spot_id -> (created_at, spot)
+        self._spots: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._stats = {"saved": 0, "page_hits": 0, "spot_hits": 0, "misses": 0}
+
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "result_id TEXT PRIMARY KEY, created_at REAL, spots TEXT)"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS spots ("
+                    "spot_id TEXT PRIMARY KEY, created_at REAL, data TEXT)"
+                )
+                self._purge()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening parking results at {db_path}: {str(e)}")
+                self._conn = None
+
+    def _purge(self):
+        """Drop expired rows from disk; called with the lock held or at startup"""
+        cutoff = time.time() - self.ttl
+        self._conn.execute("DELETE FROM results WHERE created_at < ?", (cutoff,))
+        self._conn.execute("DELETE FROM spots WHERE created_at < ?", (cutoff,))
+        self._conn.commit()
+
+    def _fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl
+
+    def register(self, parking_spots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Store spots by their stable id so their walking details can be fetched.
+
+        Returns:
+            Copies of the spots with 'spot_id' added
+        """
+        created_at = time.time()
+        spots = [{**spot, "spot_id": spot_id(spot)} for spot in parking_spots]
+
+        with self._lock:
+            for spot in spots:
+                self._spots[spot["spot_id"]] = (created_at, spot)
+            # Drop expired spots from memory as new ones arrive
+            if len(self._spots) > self.max_results * 50:
+                self._spots = {
+                    key: entry
+                    for key, entry in self._spots.items()
+                    if self._fresh(entry[0])
+                }
+
+            if self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO spots (spot_id, created_at, data) "
+                        "VALUES (?, ?, ?)",
+                        [(s["spot_id"], created_at, json.dumps(s)) for s in spots],
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing parking spots: {str(e)}")
+        return spots
+
+    def save(
+        self, parking_spots: List[Dict[str, Any]]
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Store a ranked list of spots for pagination.
+
+        Returns:
+            (result id, copies of the spots with 'spot_id' added)
+        """
+        spots = self.register(parking_spots)
+        result_id = secrets.token_hex(8)
+        created_at = time.time()
+
+        with self._lock:
+            self._results[result_id] = (created_at, spots)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            self._stats["saved"] += 1
+
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT INTO results (result_id, created_at, spots) "
+                        "VALUES (?, ?, ?)",
+                        (result_id, created_at, json.dumps(spots)),
+                    )
+                    if self._stats["saved"] % 100 == 0:
+                        self._purge()
+                    else:
+                        self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing parking results: {str(e)}")
+        return result_id, spots
+
+    def _lookup(self, table: str, column: str, memory: Dict, key: str) -> Any:
+        """Fresh entry from the memory tier, then from disk (another worker's)"""
+        with self._lock:
+            entry = memory.get(key)
+            if entry is None and self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        f"SELECT created_at, {column} FROM {table} "
+                        f"WHERE {table[:-1]}_id = ?",
+                        (key,),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Error reading parking {table}: {str(e)}")
+                    row = None
+                if row is not None:
+                    entry = (row[0], json.loads(row[1]))
+        if entry is None or not self._fresh(entry[0]):
+            self._stats["misses"] += 1
+            return None
+        return entry[1]
+
+    def page(
+        self, result_id: str, offset: int, size: int
+    ) -> Optional[Tuple[List[Dict[str, Any]], Optional[str], int]]:
+        """
+        One page of a stored result.
+
+        Returns:
+            (spots on the page, cursor of the next page or None, total spots),
+            or None if the result is unknown or expired
+        """
+        spots = self._lookup("results", "spots", self._results, result_id)
+        if spots is None:
+            return None
+        self._stats["page_hits"] += 1
+
+        size = max(0, size)
+        end = offset + size
+        next_cursor = encode_cursor(result_id, end) if end < len(spots) else None
+        return spots[offset:end], next_cursor, len(spots)
+
+    def spot(self, spot_id: str) -> Optional[Dict[str, Any]]:
+        """A stored spot by its stable id, or None if unknown or expired"""
+        spot = self._lookup("spots", "data", self._spots, spot_id)
+        if spot is not None:
+            self._stats["spot_hits"] += 1
+        return spot
+
+    def stats(self) -> Dict[str, Any]:
+        """Stored result counts and page/spot lookup counters"""
+        return {
+            **self._stats,
+            "results": len(self._results),
+            "spots": len(self._spots),
+        }
+
+
+# Process-wide store shared by every parking endpoint
+parking_results = ParkingResultStore()
@@ -1,22 +1,41 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import AsyncGenerator, List, Dict, Any, Optional, Tuple
 import os
+import json
 import argparse
 import logging
 import asyncio
-import aiohttp
-import math
 import time
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 
 # Import functions from the provided script
 from namma_yatri_recommender import (
     get_recommended_locations,
     load_model,
 )
+from adaptive_sampling import SAMPLING_MODE, async_adaptive_scan
+from async_runtime import io_loop
+from congestion_history import congestion_history
+from geocode_cache import geocode_cache, geohash_encode, reverse_geocode_cache
+from geocode_utils import parse_reverse_geocode_result
+from hotspot_clustering import cluster_hotspots
+from hotspot_refresher import HotspotRefresher
+from traffic_probes import async_measure_congestion, probe_store
+from parking_catalogue import parking_catalogue
+from parking_results import decode_cursor, parking_results
+from stage_timings import StageTimer, stage_timings
+from parking_planner import KEYWORD_QUERY, ParkingQueryPlan
+import parking_planner
+from walking_estimator import PARKING_TOP_K, walking_estimator
+from walking_legs import DIRECTIONS_LIMIT as WALKING_DIRECTIONS_LIMIT, walking_legs
+from maps_client import (
+    MAPS_BASE_URL,
+    fetch_json,
+    limiter,
+    single_flight,
+)
 
 # Set up logging
 logging.basicConfig(
@@ -30,25 +49,8 @@ CORS(app)
 
 # Global model data
 model_data = None
-# Thread pool for running async code
-thread_pool = ThreadPoolExecutor(max_workers=10)
-# Session for async HTTP requests
-async_session = None
-
-
-def start_async_session():
-    """Initialize the async HTTP session"""
-    global async_session
-    if async_session is None:
-        async_session = aiohttp.ClientSession()
-
-
-async def close_async_session():
-    """Close the async HTTP session"""
-    global async_session
-    if async_session:
-        await async_session.close()
-        async_session = None
+# Model loaded on startup unless overridden with --model
+DEFAULT_MODEL_PATH = os.environ.get("MODEL_PATH", "namma_yatri_location_model.pkl")
 
 
 @app.route("/health", methods=["GET"])
@@ -57,6 +59,32 @@ def health_check():
     return jsonify({"status": "healthy", "model_loaded": model_data is not None})
 
 
+def collect_stats() -> Dict[str, Any]:
+    """Gather cache, request coalescing and rate limiter counters"""
+    return {
+        "status": "success",
+        "geocode_cache": geocode_cache.stats(),
+        "reverse_geocode_cache": reverse_geocode_cache.stats(),
+        "maps_requests": single_flight.stats(),
+        "maps_limiter": limiter.stats(),
+        "traffic_hotspots": hotspot_refresher.stats(),
+        "traffic_probes": probe_store.stats(),
+        "congestion_history": congestion_history.stats(),
+        "parking_catalogue": parking_catalogue.stats(),
+        "parking_planner": parking_planner.stats(),
+        "parking_results": parking_results.stats(),
+        "stage_timings": stage_timings.stats(),
+        "walking_legs": walking_legs.stats(),
+        "walking_estimator": walking_estimator.stats(),
+    }
+
+
+@app.route("/api/stats", methods=["GET"])
+def get_stats_api():
+    """API endpoint exposing cache, request coalescing and rate limiter counters"""
+    return jsonify(collect_stats())
+
+
 async def async_locations_to_coordinates(
     location_strings: List[str],
 ) -> List[Dict[str, Any]]:
@@ -67,29 +95,40 @@ async def async_locations_to_coordinates(
     result = []
 
     async def geocode_location(location_str):
+        # Serve repeated names from the geocode cache (including cached misses)
+        found, cached = geocode_cache.get(location_str)
+        if found:
+            return {"location": location_str, **(cached or {})}
+
         try:
             # Call Google Maps Geocoding API
-            geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={location_str}&key={api_key}"
-            async with async_session.get(geocode_url) as response:
-                geocode_data = await response.json()
-
-                if geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                    # Get coordinates
-                    location = geocode_data["results"][0]["geometry"]["location"]
-                    # Create a new object with location data plus coordinates
-                    new_obj = {"location": location_str}
-                    new_obj["lat"] = location["lat"]
-                    new_obj["lng"] = location["lng"]
-                    new_obj["formatted_address"] = geocode_data["results"][0].get(
-                        "formatted_address", location_str
-                    )
-                    return new_obj
-                else:
-                    # If geocoding failed, return basic object
-                    logger.warning(
-                        f"Failed to geocode location '{location_str}': {geocode_data.get('status')}"
-                    )
-                    return {"location": location_str}
+            geocode_url = f"{MAPS_BASE_URL}/maps/api/geocode/json?address={location_str}&key={api_key}"
+            geocode_data = await fetch_json(io_loop.session, geocode_url)
+
+            if geocode_data.get("status") == "OK" and geocode_data.get("results"):
+                # Get coordinates
+                location = geocode_data["results"][0]["geometry"]["location"]
+                # Create a new object with location data plus coordinates
+                new_obj = {"location": location_str}
+                new_obj["lat"] = location["lat"]
+                new_obj["lng"] = location["lng"]
+                new_obj["formatted_address"] = geocode_data["results"][0].get(
+                    "formatted_address", location_str
+                )
+                geocode_cache.set(
+                    location_str,
+                    {k: v for k, v in new_obj.items() if k != "location"},
+                )
+                return new_obj
+            else:
+                if geocode_data.get("status") == "ZERO_RESULTS":
+                    # Remember names Google cannot resolve; quota errors are not cached
+                    geocode_cache.set(location_str, None)
+                # If geocoding failed, return basic object
+                logger.warning(
+                    f"Failed to geocode location '{location_str}': {geocode_data.get('status')}"
+                )
+                return {"location": location_str}
         except Exception as e:
             logger.error(f"Error geocoding location '{location_str}': {str(e)}")
             return {"location": location_str}
@@ -102,6 +141,27 @@ async def async_locations_to_coordinates(
     return result
 
 
+async def async_attach_assembly_coordinates(
+    location_strings: List[str],
+) -> List[Dict[str, Any]]:
+    """
+    Attaches coordinates resolved at training time to location names.
+    Only names missing from the model are geocoded live.
+    """
+    known = (model_data or {}).get("assembly_coordinates", {})
+    unknown = list(dict.fromkeys(loc for loc in location_strings if loc not in known))
+
+    geocoded = {}
+    if unknown:
+        for obj in await async_locations_to_coordinates(unknown):
+            geocoded[obj["location"]] = obj
+
+    return [
+        {"location": loc, **known[loc]} if loc in known else dict(geocoded[loc])
+        for loc in location_strings
+    ]
+
+
 async def async_coordinates_to_locations(
     coordinate_objects: List[Dict[str, Any]],
     lat_key: str = "lat",
@@ -123,83 +183,33 @@ async def async_coordinates_to_locations(
         lat = obj[lat_key]
         lng = obj[lng_key]
 
+        # Points in the same geohash cell share one reverse geocode result
+        cell = geohash_encode(lat, lng)
+        found, cached = reverse_geocode_cache.get(cell)
+        if found:
+            return {**obj, **cached} if cached else obj
+
         try:
             # Call Google Maps Reverse Geocoding API
-            geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
-            async with async_session.get(geocode_url) as response:
-                geocode_data = await response.json()
-
-                if geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                    # Create a new object with all original data
-                    new_obj = obj.copy()
-
-                    # Add full formatted address
-                    new_obj["formatted_address"] = geocode_data["results"][0].get(
-                        "formatted_address", ""
-                    )
-
-                    # Extract address components for more granular location information
-                    components = {}
-                    if geocode_data["results"][0].get("address_components"):
-                        for component in geocode_data["results"][0][
-                            "address_components"
-                        ]:
-                            for component_type in component["types"]:
-                                components[component_type] = component["long_name"]
-
-                    # Add useful location components if available
-                    if "route" in components:
-                        new_obj["street"] = components["route"]
-                    if "locality" in components:
-                        new_obj["city"] = components["locality"]
-                    if "administrative_area_level_1" in components:
-                        new_obj["state"] = components["administrative_area_level_1"]
-                    if "postal_code" in components:
-                        new_obj["postal_code"] = components["postal_code"]
-                    if "country" in components:
-                        new_obj["country"] = components["country"]
-
-                    # Create a readable location name based on available components
-                    location_parts = []
-
-                    if "point_of_interest" in components:
-                        location_parts.append(components["point_of_interest"])
-                    elif "establishment" in components:
-                        location_parts.append(components["establishment"])
-                    elif "route" in components:
-                        if "street_number" in components:
-                            location_parts.append(
-                                f"{components['street_number']} {components['route']}"
-                            )
-                        else:
-                            location_parts.append(components["route"])
-
-                    if (
-                        "sublocality" in components
-                        and "sublocality_level_1" not in components
-                    ):
-                        location_parts.append(components["sublocality"])
-                    elif "sublocality_level_1" in components:
-                        location_parts.append(components["sublocality_level_1"])
-
-                    if "locality" in components and not location_parts:
-                        # Only add city if no more specific location was found
-                        location_parts.append(components["locality"])
-
-                    # Join the parts to create a readable location name
-                    if location_parts:
-                        new_obj["location"] = ", ".join(location_parts)
-                    else:
-                        # Fallback to formatted address if no components were found
-                        new_obj["location"] = new_obj["formatted_address"]
-
-                    return new_obj
-                else:
-                    # If reverse geocoding failed, keep original object but log warning
-                    logger.warning(
-                        f"Failed to reverse geocode coordinates ({lat}, {lng}): {geocode_data.get('status')}"
-                    )
-                    return obj
+            geocode_url = f"{MAPS_BASE_URL}/maps/api/geocode/json?latlng={lat},{lng}&key={api_key}"
+            geocode_data = await fetch_json(io_loop.session, geocode_url)
+
+            if geocode_data.get("status") == "OK" and geocode_data.get("results"):
+                fields = parse_reverse_geocode_result(geocode_data["results"][0])
+                reverse_geocode_cache.set(cell, fields)
+
+                # Create a new object with all original data plus the address fields
+                new_obj = obj.copy()
+                new_obj.update(fields)
+                return new_obj
+            else:
+                if geocode_data.get("status") == "ZERO_RESULTS":
+                    reverse_geocode_cache.set(cell, None)
+                # If reverse geocoding failed, keep original object but log warning
+                logger.warning(
+                    f"Failed to reverse geocode coordinates ({lat}, {lng}): {geocode_data.get('status')}"
+                )
+                return obj
         except Exception as e:
             logger.error(
                 f"Error reverse geocoding coordinates ({lat}, {lng}): {str(e)}"
@@ -217,9 +227,7 @@ async def async_coordinates_to_locations(
 # Synchronous wrapper functions for the async functions
 def locations_to_coordinates(location_strings: List[str]) -> List[Dict[str, Any]]:
     """Synchronous wrapper for async_locations_to_coordinates"""
-    loop = asyncio.new_event_loop()
-    result = loop.run_until_complete(async_locations_to_coordinates(location_strings))
-    return result
+    return io_loop.run(async_locations_to_coordinates(location_strings))
 
 
 def coordinates_to_locations(
@@ -228,179 +236,146 @@ def coordinates_to_locations(
     lng_key: str = "lng",
 ) -> List[Dict[str, Any]]:
     """Synchronous wrapper for async_coordinates_to_locations"""
-    loop = asyncio.new_event_loop()
-    result = loop.run_until_complete(
+    return io_loop.run(
         async_coordinates_to_locations(coordinate_objects, lat_key, lng_key)
     )
-    return result
 
 
 async def async_get_traffic_hotspots_google(
     sample_points: int = 60,
+    sampling: str = SAMPLING_MODE,
 ) -> List[Dict[str, Any]]:
     """
     Asynchronous version - Gets traffic data using Google Maps Roads API with traffic model.
+
+    sampling is "grid" for the uniform sample_points grid or "adaptive" for
+    quadtree refinement of congested cells within the same request budget.
     """
-    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
     city = "Bangalore"
 
     try:
-        # Get city center coordinates
-        geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json?address={city}&key={api_key}"
-        async with async_session.get(geocode_url) as response:
-            geocode_data = await response.json()
-
-            if geocode_data.get("status") != "OK" or not geocode_data.get("results"):
-                logger.error(f"Failed to geocode city: {city}")
-                return []
-
-            # Get city center coordinates
-            location = geocode_data["results"][0]["geometry"]["location"]
-            city_lat = location["lat"]
-            city_lng = location["lng"]
-
-            # Create a grid of points around the city center
-            grid_size = int(
-                sample_points**0.5
-            )  # square root to make a roughly square grid
-            lat_span = 0.1  # approximately 11km
-            lng_span = 0.1
-
-            points = []
-            for i in range(grid_size):
-                for j in range(grid_size):
-                    lat = city_lat + (i - grid_size / 2) * lat_span / grid_size
-                    lng = city_lng + (j - grid_size / 2) * lng_span / grid_size
-                    points.append(f"{lat},{lng}")
-
-            # Split points into batches (API limit is 100)
-            all_traffic_points = []
-            batch_size = 100
-
-            async def process_batch(batch_points):
-                batch_results = []
-                paths = "|".join(batch_points)
-                roads_url = f"https://roads.googleapis.com/v1/snapToRoads?path={paths}&interpolate=true&key={api_key}"
-
-                async with async_session.get(roads_url) as response:
-                    roads_data = await response.json()
-
-                    if "snappedPoints" not in roads_data:
-                        return []
-
-                    # Create tasks for parallel processing of each point
-                    point_tasks = []
-                    for point in roads_data["snappedPoints"]:
-                        lat = point["location"]["latitude"]
-                        lng = point["location"]["longitude"]
-                        place_id = point.get("placeId")
-
-                        # Create a task to get traffic data for this point
-                        point_tasks.append(
-                            get_point_traffic(lat, lng, place_id, api_key)
-                        )
-
-                    # Execute all point tasks in parallel
-                    point_results = await asyncio.gather(*point_tasks)
-
-                    # Filter out None results and add valid ones to batch results
-                    batch_results.extend([r for r in point_results if r is not None])
-
-                return batch_results
-
-            async def get_point_traffic(lat, lng, place_id, api_key):
-                # Use the Distance Matrix API to get traffic info
-                traffic_url = (
-                    f"https://maps.googleapis.com/maps/api/distancematrix/json?"
-                    f"origins={lat},{lng}&destinations={lat+0.001},{lng+0.001}"
-                    f"&departure_time=now&traffic_model=best_guess&key={api_key}"
+        if sampling == "adaptive":
+            measured = await async_adaptive_scan(city, sample_points)
+        else:
+            # Snapped road probes are static; only congestion is measured per scan.
+            # Historically congested probes go first so they win the rate limiter.
+            probes = congestion_history.order_probes(
+                await probe_store.get(city, sample_points)
+            )
+
+            # Measure congestion at all probes with batched Distance Matrix calls
+            congestion_factors = await async_measure_congestion(probes)
+            measured = list(zip(probes, congestion_factors))
+
+        # Keep every measurement, congested or not, for the hour-of-week priors
+        congestion_history.record(measured)
+
+        if not any(factor is not None for _, factor in measured):
+            # Quota exhausted or upstream down; serve what history expects instead
+            logger.warning("No live congestion measurements, using priors")
+            return expected_hotspots_now()
+
+        all_traffic_points = []
+        for probe, congestion_factor in measured:
+            # Only add points with significant congestion (30% longer with traffic)
+            if congestion_factor is not None and congestion_factor > 1.3:
+                all_traffic_points.append(
+                    {
+                        "lat": probe["lat"],
+                        "lng": probe["lng"],
+                        "place_id": probe["place_id"],
+                        "congestion_factor": congestion_factor,
+                        "congestion_percent": round((congestion_factor - 1) * 100),
+                        "name": f"Traffic Hotspot ({round((congestion_factor - 1) * 100)}% delay)",
+                    }
                 )
 
-                async with async_session.get(traffic_url) as response:
-                    traffic_data = await response.json()
-
-                    if (
-                        traffic_data.get("status") == "OK"
-                        and traffic_data.get("rows")
-                        and traffic_data["rows"][0].get("elements")
-                    ):
-                        element = traffic_data["rows"][0]["elements"][0]
-
-                        if element.get("status") == "OK":
-                            # Calculate congestion by comparing duration in traffic vs. duration without traffic
-                            duration = element.get("duration", {}).get("value", 0)
-                            duration_in_traffic = element.get(
-                                "duration_in_traffic", {}
-                            ).get("value", 0)
-
-                            if duration > 0 and duration_in_traffic > 0:
-                                congestion_factor = duration_in_traffic / duration
-
-                                # Only add points with significant congestion
-                                if congestion_factor > 1.3:  # 30% longer with traffic
-                                    return {
-                                        "lat": lat,
-                                        "lng": lng,
-                                        "place_id": place_id,
-                                        "congestion_factor": congestion_factor,
-                                        "congestion_percent": round(
-                                            (congestion_factor - 1) * 100
-                                        ),
-                                        "name": f"Traffic Hotspot ({round((congestion_factor - 1) * 100)}% delay)",
-                                    }
-                return None
-
-            # Create batch processing tasks
-            batch_tasks = []
-            for i in range(0, len(points), batch_size):
-                batch_points = points[i : i + batch_size]
-                batch_tasks.append(process_batch(batch_points))
-
-            # Execute batches with some concurrency control (5 batches at a time)
-            for i in range(0, len(batch_tasks), 5):
-                batch_group = batch_tasks[i : i + 5]
-                batch_results = await asyncio.gather(*batch_group)
-                for results in batch_results:
-                    all_traffic_points.extend(results)
-
-            # Add location information to traffic points
-            all_traffic_points = await async_coordinates_to_locations(
-                all_traffic_points
-            )
+        # Merge near-duplicate points before any per-hotspot enrichment
+        all_traffic_points = cluster_hotspots(all_traffic_points)
 
-            # Sort by congestion factor and return
-            return sorted(
-                all_traffic_points,
-                key=lambda x: x.get("congestion_factor", 0),
-                reverse=True,
-            )
+        # Add location information to traffic points
+        all_traffic_points = await async_coordinates_to_locations(all_traffic_points)
+
+        # Sort by congestion factor and return
+        return sorted(
+            all_traffic_points,
+            key=lambda x: x.get("congestion_factor", 0),
+            reverse=True,
+        )
 
     except Exception as e:
         logger.error(f"Error fetching traffic data: {e}")
         return []
 
 
-def run_in_thread(func, *args, **kwargs):
-    """Run an async function in a separate thread"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+def expected_hotspots_now() -> List[Dict[str, Any]]:
+    """
+    Hotspots expected at this hour of the week from recorded history.
+
+    Never calls Google: addresses are attached only where the reverse
+    geocode cache already has them.
+    """
+    hotspots = congestion_history.expected_hotspots()
+    for hotspot in hotspots:
+        found, cached = reverse_geocode_cache.get(
+            geohash_encode(hotspot["lat"], hotspot["lng"])
+        )
+        if found and cached:
+            hotspot.update(cached)
+    return hotspots
+
+
+# Endpoints read hotspot snapshots refreshed in the background; until the
+# first scan finishes they are answered from the congestion priors
+hotspot_refresher = HotspotRefresher(
+    async_get_traffic_hotspots_google, fallback=expected_hotspots_now
+)
+
+
+def snapshot_metadata(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """Age and staleness bound of a hotspot snapshot, without the hotspots"""
+    return {k: v for k, v in snapshot.items() if k != "hotspots"}
+
+
+# Error returned by model-backed endpoints before a model is loaded
+MODEL_NOT_LOADED = (
+    {
+        "status": "error",
+        "message": "Model not loaded. Please load or train a model first.",
+    },
+    400,
+)
 
-    async def _run_with_session():
-        """Create session, run function, and close session"""
-        global async_session
-        if async_session is None:
-            async_session = aiohttp.ClientSession()
-        try:
-            return await func(*args, **kwargs)
-        finally:
-            if async_session is not None:
-                await async_session.close()
-                async_session = None
 
+def parse_limit(value: Optional[str]) -> int:
+    """
+    Page size from a 'limit' query parameter (default: PARKING_TOP_K).
+
+    Raises:
+        ValueError: If the value is not a non-negative integer
+    """
+    if value is None:
+        return PARKING_TOP_K
     try:
-        return loop.run_until_complete(_run_with_session())
-    finally:
-        loop.close()
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"Invalid limit: {value}") from None
+    if limit < 0:
+        raise ValueError(f"Invalid limit: {value} (must be 0 or more)")
+    return limit
+
+
+def bad_request(e: ValueError) -> Tuple[Dict[str, Any], int]:
+    """Error body and status code for an invalid query parameter"""
+    return {"status": "error", "message": str(e)}, 400
+
+
+async def async_traffic_hotspots_response(
+    sample_points: int = 60,
+) -> Tuple[Any, int]:
+    """Build the /api/traffic-hotspots response body and status code"""
+    snapshot = await hotspot_refresher.get(sample_points)
+    return snapshot["hotspots"], 200
 
 
 @app.route("/api/traffic-hotspots", methods=["GET"])
@@ -408,607 +383,469 @@ def get_traffic_hotspots_api():
     """API endpoint to get traffic hotspots"""
     try:
         sample_points = int(request.args.get("sample_points", 60))
-        # Run the async function in a thread
-        future = thread_pool.submit(
-            run_in_thread, async_get_traffic_hotspots_google, sample_points
-        )
-        return jsonify(future.result())
+        # Run the async function on the shared event loop
+        body, status = io_loop.run(async_traffic_hotspots_response(sample_points))
+        return jsonify(body), status
     except Exception as e:
         logger.error(f"Error getting traffic hotspots: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
 
-@app.route("/api/get-recommendations", methods=["GET"])
-def api_get_recommendations():
-    """API endpoint to get location recommendations based on time"""
-    try:
-        # Check if model is loaded
-        global model_data
-        if not model_data:
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": "Model not loaded. Please load or train a model first.",
-                    }
-                ),
-                400,
-            )
+async def async_recommendations_response(
+    time_input: str = None, top_n: int = 5
+) -> Tuple[Dict[str, Any], int]:
+    """Build the /api/get-recommendations response body and status code"""
+    # Check if model is loaded
+    if not model_data:
+        return MODEL_NOT_LOADED
+
+    # Get recommendations
+    recommendations = get_recommended_locations(
+        time_input,
+        model_data["top_locations_by_hour"],
+        model_data["time_block_locations"],
+        model_data["duration_map"],
+        top_n,
+    )
 
-        # Get time parameter
-        time_input = request.args.get("time", None)
-        top_n = int(request.args.get("top_n", 5))
+    # Run all operations in parallel and wait for all to complete
+    hourly_task = async_attach_assembly_coordinates(
+        recommendations["hourly_recommendations"]
+    )
+    block_task = async_attach_assembly_coordinates(
+        recommendations["block_recommendations"]
+    )
+    traffic_task = hotspot_refresher.get()
 
-        # Get recommendations
-        recommendations = get_recommended_locations(
-            time_input,
-            model_data["top_locations_by_hour"],
-            model_data["time_block_locations"],
-            model_data["duration_map"],
-            top_n,
-        )
+    hourly_with_coords, block_with_coords, traffic_snapshot = await asyncio.gather(
+        hourly_task, block_task, traffic_task
+    )
+    traffic_hotspots = traffic_snapshot["hotspots"]
 
-        # Create a single function to run all async operations
-        async def run_all_async_operations():
-            # Run all operations in parallel and wait for all to complete
-            hourly_task = async_locations_to_coordinates(
-                recommendations["hourly_recommendations"]
-            )
-            block_task = async_locations_to_coordinates(
-                recommendations["block_recommendations"]
-            )
-            top_task = async_locations_to_coordinates(
-                [recommendations["top_recommendation"]]
-            )
-            traffic_task = async_get_traffic_hotspots_google()
+    # The top recommendation is the first hourly one; reuse its coordinates
+    top_with_coords = (
+        [dict(hourly_with_coords[0])]
+        if hourly_with_coords
+        else [{"location": recommendations["top_recommendation"]}]
+    )
 
-            # Wait for all tasks to complete
-            hourly_result, block_result, top_result, traffic_result = (
-                await asyncio.gather(hourly_task, block_task, top_task, traffic_task)
-            )
+    # Format response
+    response = {
+        "status": "success",
+        "time_input": time_input or datetime.now().strftime("%H:%M"),
+        "hour": recommendations["hour"],
+        "time_of_day": recommendations["time_of_day"],
+        "time_block": recommendations["time_block"],
+        "hourly_recommendations": hourly_with_coords,
+        "block_recommendations": block_with_coords,
+        "top_recommendation": top_with_coords,
+        "live_traffic_hotspots": traffic_hotspots,
+        "live_traffic_snapshot": snapshot_metadata(traffic_snapshot),
+    }
 
-            return hourly_result, block_result, top_result, traffic_result
+    return response, 200
 
-        # Run all operations in a thread to avoid blocking
-        future = thread_pool.submit(run_in_thread, run_all_async_operations)
-        hourly_with_coords, block_with_coords, top_with_coords, traffic_hotspots = (
-            future.result()
-        )
 
-        # Format response
-        response = {
-            "status": "success",
-            "time_input": time_input or datetime.now().strftime("%H:%M"),
-            "hour": recommendations["hour"],
-            "time_of_day": recommendations["time_of_day"],
-            "time_block": recommendations["time_block"],
-            "hourly_recommendations": hourly_with_coords,
-            "block_recommendations": block_with_coords,
-            "top_recommendation": top_with_coords,
-            "live_traffic_hotspots": traffic_hotspots,
-        }
+@app.route("/api/get-recommendations", methods=["GET"])
+def api_get_recommendations():
+    """API endpoint to get location recommendations based on time"""
+    try:
+        # Get time parameter
+        time_input = request.args.get("time", None)
+        top_n = int(request.args.get("top_n", 5))
 
-        return jsonify(response)
+        # Run all operations on the shared event loop
+        body, status = io_loop.run(async_recommendations_response(time_input, top_n))
+        return jsonify(body), status
 
     except Exception as e:
         logger.error(f"Error getting recommendations: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
 
-async def async_find_parking_near_hotspots(
-    hotspots: list, radius: int = 800, max_results: int = 3
-) -> list:
-    """
-    Find parking locations near traffic hotspots.
-
-    Args:
-        hotspots: List of dict objects containing at least 'lat' and 'lng' keys
-        radius: Search radius in meters around the hotspot (default: 300m)
-        max_results: Maximum number of parking spots to return per hotspot (default: 3)
+async def async_model_hotspots(top_n: int = 5) -> List[Dict[str, Any]]:
+    """Current hourly and time block recommendations with coordinates"""
+    if not model_data:
+        return []
 
-    Returns:
-        List of potential parking locations with coordinates and metadata
-    """
-    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-    all_parking_locations = []
+    recommendations = get_recommended_locations(
+        None,  # Use current time
+        model_data["top_locations_by_hour"],
+        model_data["time_block_locations"],
+        model_data["duration_map"],
+        top_n,
+    )
+    hourly_with_coords, block_with_coords = await asyncio.gather(
+        async_attach_assembly_coordinates(recommendations["hourly_recommendations"]),
+        async_attach_assembly_coordinates(recommendations["block_recommendations"]),
+    )
+    return hourly_with_coords + block_with_coords
 
-    async def find_parking_for_hotspot(hotspot):
-        """Find parking near a specific hotspot"""
-        try:
-            # Get hotspot coordinates
-            lat = hotspot["lat"]
-            lng = hotspot["lng"]
-            hotspot_name = hotspot.get("location", "Unknown location")
-
-            # Search for parking lots, garages, or street parking near the hotspot
-            nearby_url = (
-                f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-                f"location={lat},{lng}&radius={radius}"
-                f"&type=parking&keyword=parking|garage|lot"
-                f"&key={api_key}"
-            )
 
-            async with async_session.get(nearby_url) as response:
-                nearby_data = await response.json()
-
-                if nearby_data.get("status") != "OK":
-                    logger.warning(
-                        f"Failed to find parking near {hotspot_name}: {nearby_data.get('status')}"
-                    )
-                    return []
-
-                parking_spots = []
-
-                # Process each parking result
-                for place in nearby_data.get("results", [])[:max_results]:
-                    # Calculate distance from hotspot to parking
-                    place_lat = place["geometry"]["location"]["lat"]
-                    place_lng = place["geometry"]["location"]["lng"]
-
-                    # Use Haversine formula to calculate ground distance
-                    distance = calculate_distance(lat, lng, place_lat, place_lng)
-
-                    # Determine if this is at the edge of the hotspot (we want outside/edge locations)
-                    # Edge is defined as 200-300m from center for this implementation
-                    is_edge = 200 <= distance <= radius
-
-                    parking_spot = {
-                        "lat": place_lat,
-                        "lng": place_lng,
-                        "name": place.get("name", "Parking Area"),
-                        "vicinity": place.get("vicinity", ""),
-                        "place_id": place.get("place_id", ""),
-                        "rating": place.get("rating", 0),
-                        "user_ratings_total": place.get("user_ratings_total", 0),
-                        "distance_from_hotspot": round(distance),
-                        "is_edge_location": is_edge,
-                        "nearby_hotspot": {
-                            "name": hotspot_name,
-                            "lat": lat,
-                            "lng": lng,
-                        },
-                    }
+async def async_find_parking_response(
+    lat: str = None,
+    lng: str = None,
+    location: str = None,
+    radius: int = 300,
+    max_results: int = 3,
+    limit: int = PARKING_TOP_K,
+) -> Tuple[Dict[str, Any], int]:
+    """
+    Build the /api/find-parking response body and status code.
 
-                    # Add additional data if available
-                    if "opening_hours" in place:
-                        parking_spot["open_now"] = place["opening_hours"].get(
-                            "open_now", False
-                        )
-
-                    parking_spots.append(parking_spot)
-
-                # If no parking spots found, try alternative approach with different search terms
-                if not parking_spots:
-                    alternative_url = (
-                        f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-                        f"location={lat},{lng}&radius={radius}"
-                        f"&keyword=parking"
-                        f"&key={api_key}"
-                    )
-
-                    async with async_session.get(alternative_url) as alt_response:
-                        alt_data = await alt_response.json()
-
-                        if alt_data.get("status") == "OK":
-                            for place in alt_data.get("results", [])[:max_results]:
-                                place_lat = place["geometry"]["location"]["lat"]
-                                place_lng = place["geometry"]["location"]["lng"]
-                                distance = calculate_distance(
-                                    lat, lng, place_lat, place_lng
-                                )
-                                is_edge = 200 <= distance <= radius
-
-                                parking_spot = {
-                                    "lat": place_lat,
-                                    "lng": place_lng,
-                                    "name": place.get("name", "Parking Area"),
-                                    "vicinity": place.get("vicinity", ""),
-                                    "place_id": place.get("place_id", ""),
-                                    "distance_from_hotspot": round(distance),
-                                    "is_edge_location": is_edge,
-                                    "nearby_hotspot": {
-                                        "name": hotspot_name,
-                                        "lat": lat,
-                                        "lng": lng,
-                                    },
-                                }
-                                parking_spots.append(parking_spot)
-
-                return parking_spots
+    Stages run as a dependency graph on the shared loop: hotspots (geocode,
+    or traffic hotspots and model recommendations side by side), then the
+    parking plan, then walking times for the first page. Each stage's time
+    is returned under 'timings_ms' and aggregated in /api/stats.
+    """
+    timer = StageTimer("find_parking")
+
+    # Case 1: Use provided lat/lng
+    if lat and lng:
+        hotspots = [
+            {
+                "lat": float(lat),
+                "lng": float(lng),
+                "location": location or "Specified location",
+            }
+        ]
+
+    # Case 2: Use provided location name
+    elif location:
+        # Convert location to coordinates
+        location_coords = await timer.run(
+            "geocode", async_attach_assembly_coordinates([location])
+        )
+        if (
+            location_coords
+            and "lat" in location_coords[0]
+            and "lng" in location_coords[0]
+        ):
+            hotspots = location_coords
+        else:
+            return {
+                "status": "error",
+                "message": f"Could not geocode location: {location}",
+            }, 400
 
-        except Exception as e:
-            logger.error(
-                f"Error finding parking near {hotspot.get('location', 'unknown')}: {str(e)}"
-            )
-            return []
-
-    # Process all hotspots in parallel
-    tasks = [find_parking_for_hotspot(hotspot) for hotspot in hotspots]
-    results = await asyncio.gather(*tasks)
-
-    # Flatten results and filter out duplicates based on place_id
-    seen_place_ids = set()
-    for hotspot_results in results:
-        for spot in hotspot_results:
-            place_id = spot.get("place_id")
-            if place_id and place_id not in seen_place_ids:
-                seen_place_ids.add(place_id)
-                all_parking_locations.append(spot)
-
-    # Sort by edge location and distance
-    all_parking_locations.sort(
-        key=lambda x: (
-            not x.get("is_edge_location"),
-            x.get("distance_from_hotspot", 1000),
+    # Case 3: Traffic hotspots plus the model's current recommendations
+    else:
+        # Neither depends on the other, so both run at the same time
+        traffic_snapshot, recommended = await asyncio.gather(
+            timer.run("traffic_hotspots", hotspot_refresher.get()),
+            timer.run("recommendations", async_model_hotspots()),
         )
+        if not traffic_snapshot["hotspots"] and not model_data:
+            return {
+                "status": "error",
+                "message": "No hotspots available and model not loaded",
+            }, 400
+
+        # A new list: the snapshot's hotspots are shared with other requests
+        hotspots = traffic_snapshot["hotspots"] + recommended
+
+    # Official parking near every hotspot, then alternative places that
+    # might have parking if too few edge locations were found
+    parking_spots = await timer.run(
+        "parking",
+        ParkingQueryPlan(hotspots, radius, max_results, min_edge_spots=3).run(),
     )
 
-    return all_parking_locations
+    parking_page = await timer.run(
+        "walking", async_first_parking_page(parking_spots, limit)
+    )
 
+    return {
+        "status": "success",
+        **parking_page,
+        "hotspots": hotspots,
+        "timings_ms": timer.finish(),
+    }, 200
 
-def calculate_distance(lat1, lon1, lat2, lon2):
+
+@app.route("/api/find-parking", methods=["GET"])
+def find_parking_spots_api():
     """
-    Calculate the Haversine distance between two points in meters.
+    API endpoint to find parking spots near hotspots or specific locations.
+
+    Query parameters:
+    - lat: Latitude (optional)
+    - lng: Longitude (optional)
+    - location: Location name (optional, used if lat/lng not provided)
+    - radius: Search radius in meters (default: 300)
+    - max_results: Maximum number of parking spots to return per hotspot (default: 3)
+    - limit: Parking spots per page (default: 10); further pages come from
+      /api/parking-spots with the returned next_cursor
     """
-    # Earth's radius in meters
-    R = 6371000
-
-    # Convert latitude and longitude from degrees to radians
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    lon1_rad = math.radians(lon1)
-    lon2_rad = math.radians(lon2)
-
-    # Differences in coordinates
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-
-    # Haversine formula
-    a = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
+    try:
+        # Get parameters
+        lat = request.args.get("lat")
+        lng = request.args.get("lng")
+        location = request.args.get("location")
+        radius = int(request.args.get("radius", 300))
+        max_results = int(request.args.get("max_results", 3))
+        try:
+            limit = parse_limit(request.args.get("limit"))
+        except ValueError as e:
+            body, status = bad_request(e)
+            return jsonify(body), status
+
+        # Run the whole lookup on the shared event loop
+        body, status = io_loop.run(
+            async_find_parking_response(lat, lng, location, radius, max_results, limit)
+        )
+        return jsonify(body), status
 
-    return distance
+    except Exception as e:
+        logger.error(f"Error finding parking spots: {str(e)}", exc_info=True)
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
 
-async def async_find_alternative_parking_areas(
-    lat: float, lng: float, radius: int = 500
+async def async_add_walking_directions(
+    parking_spots: list, detailed: int = WALKING_DIRECTIONS_LIMIT
 ) -> list:
     """
-    Find alternative parking areas when no official parking is available.
-    This looks for businesses or locations that typically have parking lots.
+    Add walking directions from parking spots to their corresponding hotspots.
+
+    Walking distance and duration for every spot come from the walking leg
+    cache, which fills its gaps with batched Distance Matrix mode=walking
+    requests. Only the first `detailed` spots, the ones shown first, get
+    full Directions with polyline and steps.
 
     Args:
-        lat: Latitude of hotspot
-        lng: Longitude of hotspot
-        radius: Search radius in meters
+        parking_spots: List of parking spot objects with nearby_hotspot information
+        detailed: Number of leading spots that get full step-by-step directions
 
     Returns:
-        List of potential unofficial parking locations
+        Enhanced list of parking spots with walking directions
     """
-    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-
-    # Types of places that typically have parking lots
-    place_types = [
-        "shopping_mall",
-        "supermarket",
-        "grocery_or_supermarket",
-        "department_store",
-        "store",
-        "gas_station",
+    # Skip spots without nearby hotspot information
+    with_hotspot = [spot for spot in parking_spots if "nearby_hotspot" in spot]
+    legs = [
+        (
+            (spot["lat"], spot["lng"]),
+            (spot["nearby_hotspot"]["lat"], spot["nearby_hotspot"]["lng"]),
+        )
+        for spot in with_hotspot
     ]
 
-    all_places = []
-
-    async def search_places(place_type):
+    async def route_for(leg):
         try:
-            nearby_url = (
-                f"https://maps.googleapis.com/maps/api/place/nearbysearch/json?"
-                f"location={lat},{lng}&radius={radius}"
-                f"&type={place_type}"
-                f"&key={api_key}"
-            )
+            return await walking_legs.route(*leg)
+        except Exception as e:
+            logger.error(f"Error adding walking directions for spot: {str(e)}")
+            return None
 
-            async with async_session.get(nearby_url) as response:
-                nearby_data = await response.json()
-
-                if nearby_data.get("status") != "OK":
-                    return []
-
-                places = []
-                for place in nearby_data.get("results", []):
-                    place_lat = place["geometry"]["location"]["lat"]
-                    place_lng = place["geometry"]["location"]["lng"]
-
-                    # Calculate distance from hotspot
-                    distance = calculate_distance(lat, lng, place_lat, place_lng)
-
-                    # We want places that are not too close but still within walking distance
-                    if 200 <= distance <= radius:
-                        places.append(
-                            {
-                                "lat": place_lat,
-                                "lng": place_lng,
-                                "name": place.get("name", "Unknown"),
-                                "vicinity": place.get("vicinity", ""),
-                                "place_id": place.get("place_id", ""),
-                                "type": place_type,
-                                "distance_from_hotspot": round(distance),
-                                "likely_has_parking": True,
-                                "is_unofficial": True,
-                            }
-                        )
-
-                return places
+    detailed = max(0, detailed)
+    try:
+        # Directions for the leading spots, one matrix batch for the rest
+        routes, summaries = await asyncio.gather(
+            asyncio.gather(*(route_for(leg) for leg in legs[:detailed])),
+            walking_legs.summaries(legs[detailed:]),
+        )
+        # Spots whose Directions failed still get a walking time
+        failed = [index for index, route in enumerate(routes) if route is None]
+        if failed:
+            fallback = await walking_legs.summaries([legs[i] for i in failed])
+            routes = list(routes)
+            for index, summary in zip(failed, fallback):
+                routes[index] = summary
+    except Exception as e:
+        logger.error(f"Error adding walking directions: {str(e)}")
+        return parking_spots
 
-        except Exception as e:
-            logger.error(
-                f"Error searching for {place_type} near ({lat}, {lng}): {str(e)}"
-            )
-            return []
+    walking = {
+        id(spot): walking_info
+        for spot, walking_info in zip(with_hotspot, list(routes) + summaries)
+        if walking_info
+    }
 
-    # Search for all place types in parallel
-    tasks = [search_places(place_type) for place_type in place_types]
-    results = await asyncio.gather(*tasks)
+    enhanced_spots = []
+    for spot in parking_spots:
+        walking_info = walking.get(id(spot))
+        if walking_info:
+            # Create a copy of the spot with additional information
+            spot = {**spot, "walking_info": walking_info}
+        enhanced_spots.append(spot)
+    return enhanced_spots
 
-    # Flatten and filter results
-    seen_place_ids = set()
-    for type_results in results:
-        for place in type_results:
-            place_id = place.get("place_id")
-            if place_id and place_id not in seen_place_ids:
-                seen_place_ids.add(place_id)
-                all_places.append(place)
 
-    # Sort by distance
-    all_places.sort(key=lambda x: x.get("distance_from_hotspot", 1000))
+async def async_parking_page_fields(
+    page: List[Dict[str, Any]], next_cursor: str, total: int, detailed: int = 0
+) -> Dict[str, Any]:
+    """
+    Response fields of one page of parking spots.
 
-    return all_places
+    Spots on the page get walking distance and duration; polyline and steps
+    come from the walking details endpoint for the spots a user opens, except
+    for the first `detailed` spots.
+    """
+    return {
+        "parking_spots": await async_add_walking_directions(page, detailed),
+        "next_cursor": next_cursor,
+        "total_parking_spots": total,
+    }
+
+
+async def async_first_parking_page(
+    parking_spots: List[Dict[str, Any]], limit: int = PARKING_TOP_K
+) -> Dict[str, Any]:
+    """Rank every spot by estimated walking time, store the ranking and return its first page"""
+    ranked = walking_estimator.rank(parking_spots, None)
+    result_id, _ = parking_results.save(ranked)
+    page, next_cursor, total = parking_results.page(result_id, 0, limit)
+    return await async_parking_page_fields(
+        page, next_cursor, total, WALKING_DIRECTIONS_LIMIT
+    )
 
 
-@app.route("/api/find-parking", methods=["GET"])
-def find_parking_spots_api():
+async def async_parking_spots_page_response(
+    cursor: str = None, limit: int = PARKING_TOP_K
+) -> Tuple[Dict[str, Any], int]:
+    """Build the /api/parking-spots response body and status code"""
+    try:
+        result_id, offset = decode_cursor(cursor)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    stored = parking_results.page(result_id, offset, limit)
+    if stored is None:
+        return {
+            "status": "error",
+            "message": "Cursor expired; search for parking again",
+        }, 404
+
+    return {"status": "success", **await async_parking_page_fields(*stored)}, 200
+
+
+@app.route("/api/parking-spots", methods=["GET"])
+def parking_spots_page_api():
     """
-    API endpoint to find parking spots near hotspots or specific locations.
+    API endpoint for further pages of a parking response.
 
     Query parameters:
-    - lat: Latitude (optional)
-    - lng: Longitude (optional)
-    - location: Location name (optional, used if lat/lng not provided)
-    - radius: Search radius in meters (default: 300)
-    - max_results: Maximum number of parking spots to return per hotspot (default: 3)
+    - cursor: next_cursor of the previous page (required)
+    - limit: Parking spots per page (default: 10)
     """
     try:
-        # Get parameters
-        lat = request.args.get("lat")
-        lng = request.args.get("lng")
-        location = request.args.get("location")
-        radius = int(request.args.get("radius", 300))
-        max_results = int(request.args.get("max_results", 3))
+        cursor = request.args.get("cursor")
+        try:
+            limit = parse_limit(request.args.get("limit"))
+        except ValueError as e:
+            body, status = bad_request(e)
+            return jsonify(body), status
 
-        # Initialize with empty list
-        hotspots = []
-
-        # Case 1: Use provided lat/lng
-        if lat and lng:
-            hotspots = [
-                {
-                    "lat": float(lat),
-                    "lng": float(lng),
-                    "location": location or "Specified location",
-                }
-            ]
-
-        # Case 2: Use provided location name
-        elif location:
-            # Convert location to coordinates
-            location_coords = run_in_thread(async_locations_to_coordinates, [location])
-            if (
-                location_coords
-                and "lat" in location_coords[0]
-                and "lng" in location_coords[0]
-            ):
-                hotspots = location_coords
-            else:
-                return (
-                    jsonify(
-                        {
-                            "status": "error",
-                            "message": f"Could not geocode location: {location}",
-                        }
-                    ),
-                    400,
-                )
+        body, status = io_loop.run(async_parking_spots_page_response(cursor, limit))
+        return jsonify(body), status
 
-        # Case 3: Use traffic hotspots
-        else:
-            # Get traffic hotspots
-            traffic_hotspots = run_in_thread(async_get_traffic_hotspots_google)
-
-            # Use top recommendations if no traffic hotspots
-            if not traffic_hotspots:
-                # Get recommendations using the default model
-                if model_data:
-                    recommendations = get_recommended_locations(
-                        None,  # Use current time
-                        model_data["top_locations_by_hour"],
-                        model_data["time_block_locations"],
-                        model_data["duration_map"],
-                        5,  # Get top 5
-                    )
-
-                    # Convert locations to coordinates
-                    hourly_with_coords = run_in_thread(
-                        async_locations_to_coordinates,
-                        recommendations["hourly_recommendations"],
-                    )
-                    block_with_coords = run_in_thread(
-                        async_locations_to_coordinates,
-                        recommendations["block_recommendations"],
-                    )
-
-                    # Combine all recommendations
-                    hotspots = hourly_with_coords + block_with_coords
-                else:
-                    return (
-                        jsonify(
-                            {
-                                "status": "error",
-                                "message": "No hotspots available and model not loaded",
-                            }
-                        ),
-                        400,
-                    )
-            else:
-                hotspots = traffic_hotspots
-                if model_data:
-                    recommendations = get_recommended_locations(
-                        None,  # Use current time
-                        model_data["top_locations_by_hour"],
-                        model_data["time_block_locations"],
-                        model_data["duration_map"],
-                        5,  # Get top 5
-                    )
-
-                    # Convert locations to coordinates
-                    hourly_with_coords = run_in_thread(
-                        async_locations_to_coordinates,
-                        recommendations["hourly_recommendations"],
-                    )
-                    block_with_coords = run_in_thread(
-                        async_locations_to_coordinates,
-                        recommendations["block_recommendations"],
-                    )
-                    hotspots.append(hourly_with_coords + block_with_coords)
-
-        # Find parking spots near all hotspots
-        parking_spots = run_in_thread(
-            async_find_parking_near_hotspots, hotspots, radius, max_results
-        )
+    except Exception as e:
+        logger.error(f"Error paging parking spots: {str(e)}", exc_info=True)
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
-        # If not enough parking spots found, look for alternative places that might have parking
-        if len(parking_spots) < 3 and hotspots:
-            # For each hotspot, find alternative parking areas
-            for hotspot in hotspots[
-                :3
-            ]:  # Limit to top 3 hotspots to avoid too many API calls
-                alternative_spots = run_in_thread(
-                    async_find_alternative_parking_areas,
-                    hotspot["lat"],
-                    hotspot["lng"],
-                    radius + 200,  # Slightly larger radius for alternatives
-                )
 
-                # Add alternative spots to results
-                for spot in alternative_spots:
-                    # Add nearby hotspot information
-                    spot["nearby_hotspot"] = {
-                        "name": hotspot.get("location", "Unknown location"),
-                        "lat": hotspot["lat"],
-                        "lng": hotspot["lng"],
-                    }
-                    parking_spots.append(spot)
+async def async_walking_details_response(spot_id: str) -> Tuple[Dict[str, Any], int]:
+    """Build the /api/parking-spots/<spot_id>/walking response body and status code"""
+    spot = parking_results.spot(spot_id)
+    if spot is None:
+        return {
+            "status": "error",
+            "message": f"Unknown or expired parking spot: {spot_id}",
+        }, 404
 
-        # Add walking directions for each parking spot
-        enhanced_spots = run_in_thread(async_add_walking_directions, parking_spots)
+    # Full Directions for this one spot, from the walking leg cache when possible
+    enhanced = await async_add_walking_directions([spot], detailed=1)
+    walking_info = enhanced[0].get("walking_info")
+    if not walking_info:
+        return {
+            "status": "error",
+            "message": "Walking directions are not available for this spot",
+        }, 502
 
-        # Return results
-        return jsonify(
-            {"status": "success", "parking_spots": enhanced_spots, "hotspots": hotspots}
-        )
+    return {"status": "success", "spot_id": spot_id, "walking_info": walking_info}, 200
+
+
+@app.route("/api/parking-spots/<spot_id>/walking", methods=["GET"])
+def walking_details_api(spot_id):
+    """API endpoint with walking directions (polyline and steps) for one parking spot"""
+    try:
+        body, status = io_loop.run(async_walking_details_response(spot_id))
+        return jsonify(body), status
 
     except Exception as e:
-        logger.error(f"Error finding parking spots: {str(e)}", exc_info=True)
+        logger.error(f"Error getting walking directions: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
 
-async def async_add_walking_directions(parking_spots: list) -> list:
-    """
-    Add walking directions from parking spots to their corresponding hotsp  ots.
+async def async_recommendations_with_parking_response(
+    time_input: str = None,
+    top_n: int = 5,
+    radius: int = 300,
+    limit: int = PARKING_TOP_K,
+) -> Tuple[Dict[str, Any], int]:
+    """Build the /api/get-recommendations-with-parking response body and status code"""
+    # Check if model is loaded
+    if not model_data:
+        return MODEL_NOT_LOADED
+
+    # Get recommendations
+    recommendations = get_recommended_locations(
+        time_input,
+        model_data["top_locations_by_hour"],
+        model_data["time_block_locations"],
+        model_data["duration_map"],
+        top_n,
+    )
 
-    Args:
-        parking_spots: List of parking spot objects with nearby_hotspot information
+    # Run all operations in parallel and wait for all to complete
+    hourly_task = async_attach_assembly_coordinates(
+        recommendations["hourly_recommendations"]
+    )
+    block_task = async_attach_assembly_coordinates(
+        recommendations["block_recommendations"]
+    )
+    traffic_task = hotspot_refresher.get()
 
-    Returns:
-        Enhanced list of parking spots with walking directions
-    """
-    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
-    enhanced_spots = []
+    hourly_with_coords, block_with_coords, traffic_snapshot = await asyncio.gather(
+        hourly_task, block_task, traffic_task
+    )
+    traffic_hotspots = traffic_snapshot["hotspots"]
 
-    async def add_directions(spot):
-        try:
-            # Skip if no nearby hotspot information
-            if "nearby_hotspot" not in spot:
-                return spot
-
-            # Get coordinates
-            origin_lat = spot["lat"]
-            origin_lng = spot["lng"]
-            dest_lat = spot["nearby_hotspot"]["lat"]
-            dest_lng = spot["nearby_hotspot"]["lng"]
-
-            # Get walking directions
-            directions_url = (
-                f"https://maps.googleapis.com/maps/api/directions/json?"
-                f"origin={origin_lat},{origin_lng}&destination={dest_lat},{dest_lng}"
-                f"&mode=walking&key={api_key}"
-            )
+    # The top recommendation is the first hourly one; reuse its coordinates
+    top_with_coords = (
+        [dict(hourly_with_coords[0])]
+        if hourly_with_coords
+        else [{"location": recommendations["top_recommendation"]}]
+    )
+
+    # Create a list of all potential hotspots
+    all_hotspots = (
+        hourly_with_coords + block_with_coords + top_with_coords + traffic_hotspots
+    )
 
-            async with async_session.get(directions_url) as response:
-                directions_data = await response.json()
-
-                if directions_data.get("status") != "OK":
-                    return spot
-
-                # Extract useful information
-                route = directions_data["routes"][0]
-                leg = route["legs"][0]
-
-                # Create a copy of the spot with additional information
-                enhanced_spot = spot.copy()
-                enhanced_spot["walking_info"] = {
-                    "distance": leg.get("distance", {}).get("text", "Unknown"),
-                    "distance_meters": leg.get("distance", {}).get("value", 0),
-                    "duration": leg.get("duration", {}).get("text", "Unknown"),
-                    "duration_seconds": leg.get("duration", {}).get("value", 0),
-                    "steps_count": len(leg.get("steps", [])),
-                    "polyline": route.get("overview_polyline", {}).get("points", ""),
-                }
-
-                # Add simplified steps
-                steps = []
-                for i, step in enumerate(
-                    leg.get("steps", [])[:3]
-                ):  # Limit to first 3 steps
-                    steps.append(
-                        {
-                            "instruction": step.get("html_instructions", "")
-                            .replace("<b>", "")
-                            .replace("</b>", "")
-                            .replace("<div>", " ")
-                            .replace("</div>", ""),
-                            "distance": step.get("distance", {}).get("text", ""),
-                            "duration": step.get("duration", {}).get("text", ""),
-                        }
-                    )
-
-                if steps:
-                    enhanced_spot["walking_info"]["steps"] = steps
-
-                return enhanced_spot
+    # Official parking near every hotspot, then alternatives if needed
+    parking_spots = await ParkingQueryPlan(
+        all_hotspots, radius, 3, min_edge_spots=5
+    ).run()
 
-        except Exception as e:
-            logger.error(f"Error adding walking directions for spot: {str(e)}")
-            return spot
+    # First page of the ranked spots; the rest are fetched by cursor
+    parking_page = await async_first_parking_page(parking_spots, limit)
 
-    # Process all spots in parallel
-    tasks = [add_directions(spot) for spot in parking_spots]
-    enhanced_spots = await asyncio.gather(*tasks)
+    # Format response
+    response = {
+        "status": "success",
+        "time_input": time_input or datetime.now().strftime("%H:%M"),
+        "hour": recommendations["hour"],
+        "time_of_day": recommendations["time_of_day"],
+        "time_block": recommendations["time_block"],
+        "hourly_recommendations": hourly_with_coords,
+        "block_recommendations": block_with_coords,
+        "top_recommendation": top_with_coords,
+        "traffic_hotspots": traffic_hotspots,
+        "traffic_snapshot": snapshot_metadata(traffic_snapshot),
+        **parking_page,
+    }
 
-    return enhanced_spots
+    return response, 200
 
 
 # Update /api/get-recommendations to include parking spots
@@ -1016,112 +853,119 @@ async def async_add_walking_directions(parking_spots: list) -> list:
 def api_get_recommendations_with_parking():
     """API endpoint to get location recommendations and nearby parking spots"""
     try:
-        # First get the regular recommendations
-        # Check if model is loaded
-        global model_data
-        if not model_data:
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": "Model not loaded. Please load or train a model first.",
-                    }
-                ),
-                400,
-            )
-
         # Get time parameter
         time_input = request.args.get("time", None)
         top_n = int(request.args.get("top_n", 5))
         radius = int(request.args.get("radius", 300))
+        try:
+            limit = parse_limit(request.args.get("limit"))
+        except ValueError as e:
+            body, status = bad_request(e)
+            return jsonify(body), status
+
+        # Run all operations on the shared event loop
+        body, status = io_loop.run(
+            async_recommendations_with_parking_response(
+                time_input, top_n, radius, limit
+            )
+        )
+        return jsonify(body), status
 
-        # Get recommendations
-        recommendations = get_recommended_locations(
-            time_input,
-            model_data["top_locations_by_hour"],
-            model_data["time_block_locations"],
-            model_data["duration_map"],
-            top_n,
+    except Exception as e:
+        logger.error(
+            f"Error getting recommendations with parking: {str(e)}", exc_info=True
         )
+        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
 
-        # Create a single function to run all async operations
-        async def run_all_async_operations():
-            # Run all operations in parallel and wait for all to complete
-            hourly_task = async_locations_to_coordinates(
-                recommendations["hourly_recommendations"]
-            )
-            block_task = async_locations_to_coordinates(
-                recommendations["block_recommendations"]
-            )
-            top_task = async_locations_to_coordinates(
-                [recommendations["top_recommendation"]]
-            )
-            traffic_task = async_get_traffic_hotspots_google()
 
-            # Wait for all tasks to complete
-            hourly_result, block_result, top_result, traffic_result = (
-                await asyncio.gather(hourly_task, block_task, top_task, traffic_task)
-            )
+# Media types of the streaming endpoints
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+# Keep proxies from buffering streamed responses
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
 
-            # Create a list of all potential hotspots
-            all_hotspots = hourly_result + block_result + top_result + traffic_result
-
-            # Find parking spots near all hotspots
-            parking_task = async_find_parking_near_hotspots(all_hotspots, radius, 3)
-
-            # Execute parking task
-            parking_result = await parking_task
-
-            # If not enough parking spots found, look for alternatives
-            if len(parking_result) < 5 and all_hotspots:
-                # For top 3 hotspots
-                alt_tasks = []
-                for hotspot in all_hotspots[:3]:
-                    alt_tasks.append(
-                        async_find_alternative_parking_areas(
-                            hotspot["lat"], hotspot["lng"], radius + 200
-                        )
-                    )
-
-                # Get alternative parking areas
-                alt_results = await asyncio.gather(*alt_tasks)
-
-                # Add alternative spots to parking results
-                for i, alt_spots in enumerate(alt_results):
-                    if i < len(all_hotspots):
-                        for spot in alt_spots:
-                            spot["nearby_hotspot"] = {
-                                "name": all_hotspots[i].get(
-                                    "location", "Unknown location"
-                                ),
-                                "lat": all_hotspots[i]["lat"],
-                                "lng": all_hotspots[i]["lng"],
-                            }
-                            parking_result.append(spot)
-
-            # Add walking directions
-            parking_with_directions = await async_add_walking_directions(parking_result)
-
-            return (
-                hourly_result,
-                block_result,
-                top_result,
-                traffic_result,
-                parking_with_directions,
-            )
 
-        # Run all operations in a thread to avoid blocking
-        future = thread_pool.submit(run_in_thread, run_all_async_operations)
-        (
-            hourly_with_coords,
-            block_with_coords,
-            top_with_coords,
-            traffic_hotspots,
-            parking_spots,
-        ) = future.result()
-
-        # Format response
-        response = {
+def stream_media_type(fmt: str = None, accept: str = "") -> str:
+    """Pick SSE when asked for explicitly (?format=sse or Accept), NDJSON otherwise"""
+    if fmt == "sse" or (not fmt and SSE_MEDIA_TYPE in (accept or "")):
+        return SSE_MEDIA_TYPE
+    return NDJSON_MEDIA_TYPE
+
+
+def encode_stream_event(event: str, data: Any, media_type: str) -> str:
+    """Serialize one stream event as an NDJSON line or an SSE message"""
+    if media_type == SSE_MEDIA_TYPE:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+async def encode_stream(
+    events: AsyncGenerator[Tuple[str, Any], None], media_type: str
+) -> AsyncGenerator[str, None]:
+    """Encode (event, data) pairs, turning a failure into a final error event"""
+    try:
+        async for event, data in events:
+            yield encode_stream_event(event, data, media_type)
+    except Exception as e:
+        logger.error(f"Error while streaming: {str(e)}", exc_info=True)
+        yield encode_stream_event(
+            "error", {"status": "error", "message": f"Error: {str(e)}"}, media_type
+        )
+
+
+async def async_stream_traffic_hotspots(
+    sample_points: int = 60,
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Stream events for /api/traffic-hotspots/stream:
+    'snapshot' (age and staleness), one 'hotspot' per hotspot, then 'done'.
+    """
+    snapshot = await hotspot_refresher.get(sample_points)
+    yield "snapshot", snapshot_metadata(snapshot)
+    for hotspot in snapshot["hotspots"]:
+        yield "hotspot", hotspot
+    yield "done", {"hotspots": len(snapshot["hotspots"])}
+
+
+async def async_stream_recommendations_with_parking(
+    time_input: str = None,
+    top_n: int = 5,
+    radius: int = 300,
+    limit: int = PARKING_TOP_K,
+) -> AsyncGenerator[Tuple[str, Any], None]:
+    """
+    Stream events for /api/get-recommendations-with-parking/stream.
+
+    Emits 'recommendations' as soon as the model has answered, then the
+    'traffic_snapshot' and one 'hotspot' per traffic hotspot, then one
+    'parking_spot' (with walking time) at a time as each hotspot's
+    parking search completes, and finally 'done'. Spots are deduplicated by
+    place_id across hotspots and ranked by estimated walking time within
+    each search, so ordering follows completion; the stream stops after
+    limit spots.
+    """
+    recommendations = get_recommended_locations(
+        time_input,
+        model_data["top_locations_by_hour"],
+        model_data["time_block_locations"],
+        model_data["duration_map"],
+        top_n,
+    )
+    traffic_task = asyncio.ensure_future(hotspot_refresher.get())
+
+    try:
+        hourly_with_coords, block_with_coords = await asyncio.gather(
+            async_attach_assembly_coordinates(
+                recommendations["hourly_recommendations"]
+            ),
+            async_attach_assembly_coordinates(recommendations["block_recommendations"]),
+        )
+        top_with_coords = (
+            [dict(hourly_with_coords[0])]
+            if hourly_with_coords
+            else [{"location": recommendations["top_recommendation"]}]
+        )
+        yield "recommendations", {
             "status": "success",
             "time_input": time_input or datetime.now().strftime("%H:%M"),
             "hour": recommendations["hour"],
@@ -1130,17 +974,121 @@ def api_get_recommendations_with_parking():
             "hourly_recommendations": hourly_with_coords,
             "block_recommendations": block_with_coords,
             "top_recommendation": top_with_coords,
-            "traffic_hotspots": traffic_hotspots,
-            "parking_spots": parking_spots,
         }
 
-        return jsonify(response)
+        traffic_snapshot = await traffic_task
+        yield "traffic_snapshot", snapshot_metadata(traffic_snapshot)
+        for hotspot in traffic_snapshot["hotspots"]:
+            yield "hotspot", hotspot
+    finally:
+        traffic_task.cancel()
 
-    except Exception as e:
-        logger.error(
-            f"Error getting recommendations with parking: {str(e)}", exc_info=True
-        )
-        return jsonify({"status": "error", "message": f"Error: {str(e)}"}), 500
+    all_hotspots = (
+        hourly_with_coords
+        + block_with_coords
+        + top_with_coords
+        + traffic_snapshot["hotspots"]
+    )
+    plan = ParkingQueryPlan(all_hotspots, radius, 3, min_edge_spots=5)
+    sent = 0
+
+    async def stream_searches(searches, stop_when_satisfied=False):
+        """Yield new spots, with walking directions, as each search completes"""
+        nonlocal sent
+        tasks = [asyncio.ensure_future(search) for search in searches]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                # Shortest estimated walks first, and never more than limit
+                spots = walking_estimator.rank(await next_done, limit - sent)
+                # Stable ids let clients open walking details of streamed spots
+                spots = parking_results.register(spots)
+                # Directions are only fetched for spots that will be sent
+                for spot in await async_add_walking_directions(
+                    spots, max(0, WALKING_DIRECTIONS_LIMIT - sent)
+                ):
+                    sent += 1
+                    yield spot
+                if sent >= limit or (stop_when_satisfied and plan.satisfied):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async for spot in stream_searches(
+        plan.parking_for(hotspot) for hotspot in plan.hotspots
+    ):
+        yield "parking_spot", spot
+
+    if plan.unmatched and not plan.satisfied and sent < limit:
+        async for spot in stream_searches(
+            plan.parking_for(hotspot, KEYWORD_QUERY) for hotspot in plan.unmatched
+        ):
+            yield "parking_spot", spot
+
+    # Same fallback as the non-streaming endpoint
+    if not plan.satisfied and sent < limit:
+        async for spot in stream_searches(
+            (plan.alternatives_for(hotspot) for hotspot in plan.alternative_targets()),
+            stop_when_satisfied=True,
+        ):
+            yield "parking_spot", spot
+
+    yield "done", {"parking_spots": sent, "hotspots": len(plan.hotspots)}
+
+
+@app.route("/api/traffic-hotspots/stream", methods=["GET"])
+def stream_traffic_hotspots_api():
+    """Streaming variant of /api/traffic-hotspots (NDJSON, or SSE with ?format=sse)"""
+    sample_points = int(request.args.get("sample_points", 60))
+    media_type = stream_media_type(
+        request.args.get("format"), request.headers.get("Accept")
+    )
+    events = encode_stream(async_stream_traffic_hotspots(sample_points), media_type)
+    return Response(
+        io_loop.iterate(events), mimetype=media_type, headers=STREAM_HEADERS
+    )
+
+
+@app.route("/api/get-recommendations-with-parking/stream", methods=["GET"])
+def stream_recommendations_with_parking_api():
+    """Streaming variant of /api/get-recommendations-with-parking"""
+    if not model_data:
+        body, status = MODEL_NOT_LOADED
+        return jsonify(body), status
+
+    time_input = request.args.get("time", None)
+    top_n = int(request.args.get("top_n", 5))
+    radius = int(request.args.get("radius", 300))
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError as e:
+        body, status = bad_request(e)
+        return jsonify(body), status
+    media_type = stream_media_type(
+        request.args.get("format"), request.headers.get("Accept")
+    )
+    events = encode_stream(
+        async_stream_recommendations_with_parking(time_input, top_n, radius, limit),
+        media_type,
+    )
+    return Response(
+        io_loop.iterate(events), mimetype=media_type, headers=STREAM_HEADERS
+    )
+
+
+def load_model_on_startup(model_path: str = DEFAULT_MODEL_PATH):
+    """Load the model file into the global model_data if it exists"""
+    global model_data
+    if os.path.exists(model_path):
+        logger.info(f"Loading model from {model_path} on startup")
+        model_data = load_model(model_path)
+
+        if model_data:
+            logger.info("Model loaded successfully")
+        else:
+            logger.warning("Failed to load model on startup")
+    else:
+        logger.warning(f"Model file not found: {model_path}")
 
 
 def parse_args():
@@ -1157,7 +1105,7 @@ def parse_args():
     parser.add_argument(
         "--model",
         type=str,
-        default="namma_yatri_location_model.pkl",
+        default=DEFAULT_MODEL_PATH,
         help="Path to the model file to load on startup",
     )
     parser.add_argument(
@@ -1172,16 +1120,11 @@ if __name__ == "__main__":
     args = parse_args()
 
     # Try to load the model on startup
-    if os.path.exists(args.model):
-        logger.info(f"Loading model from {args.model} on startup")
-        model_data = load_model(args.model)
+    load_model_on_startup(args.model)
+    probe_store.load()
 
-        if model_data:
-            logger.info("Model loaded successfully")
-        else:
-            logger.warning("Failed to load model on startup")
-    else:
-        logger.warning(f"Model file not found: {args.model}")
+    # Keep the traffic hotspot snapshots warm in the background
+    io_loop.run(hotspot_refresher.start())
 
     # Run the Flask app
     logger.info(f"Starting server on {args.host}:{args.port}")
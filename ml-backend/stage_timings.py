@@ -0,0 +1,82 @@
+import time
+import threading
+from typing import Any, Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimings:
+    """
+    Process-wide latency counters per endpoint stage.
+
+    Keeps count, total, last and max milliseconds for every
+    (endpoint, stage) pair recorded by a StageTimer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # endpoint -> stage -> counters
+        self._stages: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    def record(self, endpoint: str, stage: str, ms: float):
+        """Add one stage duration in milliseconds"""
+        with self._lock:
+            counters = self._stages.setdefault(endpoint, {}).setdefault(
+                stage, {"count": 0, "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0}
+            )
+            counters["count"] += 1
+            counters["total_ms"] += ms
+            counters["last_ms"] = ms
+            counters["max_ms"] = max(counters["max_ms"], ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """Mean, last and max milliseconds per endpoint stage"""
+        with self._lock:
+            return {
+                endpoint: {
+                    stage: {
+                        "count": int(c["count"]),
+                        "mean_ms": round(c["total_ms"] / c["count"], 2),
+                        "last_ms": round(c["last_ms"], 2),
+                        "max_ms": round(c["max_ms"], 2),
+                    }
+                    for stage, c in stages.items()
+                }
+                for endpoint, stages in self._stages.items()
+            }
+
+
+# Process-wide counters shared by every timed endpoint
+stage_timings = StageTimings()
+
+
+class StageTimer:
+    """
+    Timings of the stages of one request.
+
+    Stages that run concurrently overlap, so the 'total' recorded by finish()
+    follows the critical path rather than the sum of the stages.
+    """
+
+    def __init__(self, endpoint: str, registry: StageTimings = stage_timings):
+        self.endpoint = endpoint
+        self.registry = registry
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """Await one stage and record how long it took"""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.timings[stage] = round(ms, 2)
+            self.registry.record(self.endpoint, stage, ms)
+
+    def finish(self) -> Dict[str, float]:
+        """Record the end-to-end time and return every stage in milliseconds"""
+        ms = (time.perf_counter() - self._start) * 1000
+        self.timings["total"] = round(ms, 2)
+        self.registry.record(self.endpoint, "total", ms)
+        return dict(self.timings)
@@ -0,0 +1,53 @@
+import os
+import sys
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Keep test runs away from the on-disk caches and the real API
+os.environ["GEOCODE_CACHE_PATH"] = ""
+os.environ["CONGESTION_HISTORY_PATH"] = ""
+os.environ["PARKING_CATALOGUE_PATH"] = ""
+os.environ["WALKING_LEGS_PATH"] = ""
+os.environ["PARKING_RESULTS_PATH"] = ""
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "test")
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def client(request):
+    """Test client of the Flask app, then of the ASGI app"""
+    import server
+
+    if request.param == "flask":
+        return server.app.test_client()
+    starlette_testclient = pytest.importorskip("starlette.testclient")
+    import asgi
+
+    # Not entered as a context manager, so the lifespan (model load) is skipped
+    return starlette_testclient.TestClient(asgi.app)
+
+
+@pytest.fixture
+def fake_maps(monkeypatch):
+    """Answer every Maps call in-process with the fake server's responders"""
+    import server
+    import walking_legs
+    import traffic_probes
+    import parking_catalogue
+    from maps_client import fixture_endpoint
+    from fake_maps_server import SYNTHESIZERS
+
+    calls = []
+
+    async def fetch_json(session, url):
+        parts = urlsplit(url)
+        endpoint = fixture_endpoint(parts.path)
+        calls.append(endpoint)
+        return SYNTHESIZERS[endpoint](dict(parse_qsl(parts.query)))
+
+    for module in (server, traffic_probes, parking_catalogue, walking_legs):
+        monkeypatch.setattr(module, "fetch_json", fetch_json)
+    return calls
@@ -0,0 +1,47 @@
+import os
+import importlib.util
+
+spec = importlib.util.spec_from_file_location(
+    "bench",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks", "bench.py"),
+)
+bench = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench)
+
+BASELINES = {
+    "helper.fast": {"p50_ms": 0.043, "p95_ms": 0.049, "alloc_peak_kb": 19.2},
+    "route.noisy": {"p50_ms": 0.85, "p95_ms": 1.08, "alloc_peak_kb": 105.8},
+}
+
+
+def result(p50_ms, alloc_peak_kb):
+    return {"p50_ms": p50_ms, "alloc_peak_kb": alloc_peak_kb}
+
+
+def test_sub_millisecond_regression_is_caught():
+    results = {"helper.fast": result(0.043 * 40, 19.2)}
+    regressions = bench.compare(results, BASELINES, 0.5)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("helper.fast: p50_ms")
+
+
+def test_slowdown_within_the_spread_is_ignored():
+    # +20% is past the 10% threshold, but within the baseline p95 - p50 of 0.23ms
+    results = {"route.noisy": result(0.85 * 1.2, 105.8)}
+    assert bench.compare(results, BASELINES, 0.1) == []
+
+
+def test_floor_only_applies_where_given():
+    results = {
+        "helper.fast": result(0.5, 19.2),
+        "route.noisy": result(1.8, 105.8),
+    }
+    regressions = bench.compare(results, BASELINES, 0.5, floors={"route.noisy": 1.0})
+    assert [r.split(":")[0] for r in regressions] == ["helper.fast"]
+
+
+def test_allocation_regression_is_caught():
+    results = {"helper.fast": result(0.043, 40.0)}
+    assert bench.compare(results, BASELINES, 0.5) == [
+        "helper.fast: alloc_peak_kb 40.0 vs baseline 19.2 (+108%)"
+    ]
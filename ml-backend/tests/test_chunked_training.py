@@ -0,0 +1,95 @@
+import random
+
+import pandas as pd
+import pytest
+
+from chunked_training import train_chunked
+from ingest_cache import pq
+from namma_yatri_recommender import analyze_location_patterns, preprocess_data
+
+
+def sheets(trip_count=500, completed_share=0.7, seed=7):
+    """Small Trips / Trip_Details / Duration / Assembly frames"""
+    rng = random.Random(seed)
+    duration = pd.DataFrame(
+        {"id": range(1, 25), "duration": [f"{h}-{h + 1}" for h in range(24)]}
+    )
+    assembly = pd.DataFrame(
+        {"ID": range(1, 9), "Assembly": [f"Assembly {i}" for i in range(1, 9)]}
+    )
+    trips = pd.DataFrame(
+        {
+            "tripid": range(trip_count),
+            "loc_from": [rng.randint(1, 8) for _ in range(trip_count)],
+            "loc_to": [rng.randint(1, 8) for _ in range(trip_count)],
+            "duration": [rng.randint(1, 24) for _ in range(trip_count)],
+        }
+    )
+    # Several detail rows per trip, in shuffled order, as in the real sheet
+    details = []
+    for tripid in range(trip_count):
+        completed = rng.random() < completed_share
+        details.append((tripid, 0))
+        if completed:
+            details.append((tripid, 1))
+            details.append((tripid, 1))
+    rng.shuffle(details)
+    trip_details = pd.DataFrame(details, columns=["tripid", "end_ride"])
+    return {
+        "Trips": trips,
+        "Trip_Details": trip_details,
+        "Duration": duration,
+        "Assembly": assembly,
+    }
+
+
+def write(frames, directory, fmt):
+    for name, frame in frames.items():
+        if fmt == "parquet":
+            frame.to_parquet(directory / f"{name}.parquet", index=False)
+        else:
+            frame.to_csv(directory / f"{name}.csv", index=False)
+    return str(directory)
+
+
+@pytest.mark.parametrize(
+    "fmt",
+    [
+        "csv",
+        pytest.param(
+            "parquet",
+            marks=pytest.mark.skipif(pq is None, reason="pyarrow not installed"),
+        ),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [37, 1000])
+def test_chunked_training_matches_in_memory(tmp_path, fmt, chunk_size):
+    frames = sheets()
+    completed, duration_map, assembly_map = preprocess_data(
+        frames["Trips"], frames["Trip_Details"], frames["Duration"], frames["Assembly"]
+    )
+    top_by_hour, totals = analyze_location_patterns(completed)
+
+    result = train_chunked(write(frames, tmp_path, fmt), chunk_size)
+
+    assert result[0] == top_by_hour
+    pd.testing.assert_series_equal(result[1], totals)
+    assert result[2] == duration_map
+    assert result[3] == assembly_map
+
+
+def test_no_completed_trips(tmp_path):
+    frames = sheets(completed_share=0)
+
+    top_by_hour, totals, _, _ = train_chunked(write(frames, tmp_path, "csv"), 37)
+
+    assert top_by_hour == {hour: [] for hour in range(24)}
+    assert totals.empty
+
+
+def test_unknown_duration_id(tmp_path):
+    frames = sheets(completed_share=1)
+    frames["Trips"].loc[5, "duration"] = 99
+
+    with pytest.raises(ValueError, match="unknown duration ids: \\[99\\]"):
+        train_chunked(write(frames, tmp_path, "csv"), 37)
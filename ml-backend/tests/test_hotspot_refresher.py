@@ -0,0 +1,36 @@
+import asyncio
+
+from hotspot_refresher import HotspotRefresher, snap_sample_points
+
+
+def test_sample_points_snap_to_allowed_sizes():
+    sizes = [30, 60, 120]
+    assert snap_sample_points(61, sizes) == 60
+    assert snap_sample_points(1, sizes) == 30
+    assert snap_sample_points(100000, sizes) == 120
+    assert snap_sample_points(45, sizes) == 30
+
+
+def test_arbitrary_sample_points_do_not_create_snapshots():
+    async def scenario():
+        fetched = []
+
+        async def fetch(sample_points):
+            fetched.append(sample_points)
+            return [{"lat": 12.97, "lng": 77.59}]
+
+        refresher = HotspotRefresher(
+            fetch,
+            default_sample_points=60,
+            sample_point_sizes=[30, 60, 120],
+            max_snapshots=2,
+        )
+        served = [
+            (await refresher.get(points))["sample_points"]
+            for points in (61, 59, 7, 999, 60)
+        ]
+        # 999 snaps to 120, but 60 and 30 already fill the two live grids
+        assert served == [60, 60, 30, 60, 60]
+        assert sorted(set(fetched)) == [30, 60]
+
+    asyncio.run(scenario())
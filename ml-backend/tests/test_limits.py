@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import server
+from walking_estimator import walking_estimator
+
+
+def test_parse_limit():
+    assert server.parse_limit(None) == server.PARKING_TOP_K
+    assert server.parse_limit("0") == 0
+    assert server.parse_limit("7") == 7
+    with pytest.raises(ValueError):
+        server.parse_limit("-1")
+    with pytest.raises(ValueError):
+        server.parse_limit("ten")
+
+
+def test_rank_rejects_negative_limit():
+    spots = [{"lat": 12.97, "lng": 77.59}]
+    assert walking_estimator.rank(spots, 0) == []
+    with pytest.raises(ValueError):
+        walking_estimator.rank(spots, -1)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/find-parking?lat=12.97&lng=77.59&limit=-1",
+        "/api/get-recommendations-with-parking?limit=-1",
+        "/api/get-recommendations-with-parking/stream?limit=-1",
+        "/api/parking-spots?cursor=abc.0&limit=-1",
+    ],
+)
+def test_negative_limit_is_a_bad_request(client, path, monkeypatch):
+    # The stream route checks for a model before its parameters
+    monkeypatch.setattr(server, "model_data", {"loaded": True})
+    response = client.get(path)
+    assert response.status_code == 400
+    assert "limit" in json.loads(response.text)["message"]
@@ -0,0 +1,72 @@
+import asyncio
+
+from maps_client import SingleFlight
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        single_flight = SingleFlight()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return {"status": "OK"}
+
+        leader = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await follower == {"status": "OK"}
+        assert leader.cancelled()
+        assert len(calls) == 1
+        assert single_flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def scenario():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 42
+
+        leader = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(single_flight.do("key", fetch))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await leader == 42
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            single_flight.do("key", fetch),
+            single_flight.do("key", fetch),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
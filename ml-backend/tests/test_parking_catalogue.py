@@ -0,0 +1,114 @@
+import asyncio
+
+import parking_catalogue
+from parking_catalogue import ParkingCatalogue, cells_in_radius
+
+LAT, LNG = 12.9716, 77.5946
+
+
+def place(index, lat=LAT, lng=LNG):
+    return {
+        "place_id": f"place-{index}",
+        "name": f"Parking {index}",
+        "geometry": {"location": {"lat": lat, "lng": lng}},
+    }
+
+
+def fake_places(pages, monkeypatch):
+    """Serve the given pages in order: the first search, then each pagetoken"""
+    urls = []
+
+    async def fetch_json(session, url):
+        urls.append(url)
+        if "pagetoken=" not in url:
+            return pages[0]
+        token = url.split("pagetoken=")[1].split("&")[0]
+        return pages[int(token)]
+
+    monkeypatch.setattr(parking_catalogue, "fetch_json", fetch_json)
+    return urls
+
+
+def test_dense_cell_follows_next_page_token(monkeypatch):
+    first = {
+        "status": "OK",
+        "results": [place(i) for i in range(20)],
+        "next_page_token": "1",
+    }
+    second = {"status": "OK", "results": [place(i) for i in range(20, 25)]}
+    urls = fake_places([first, second], monkeypatch)
+
+    catalogue = ParkingCatalogue(db_path=None, page_delay=0)
+    cell, center_lat, center_lng = cells_in_radius(LAT, LNG, 10)[0]
+    status = asyncio.run(
+        catalogue._fetch_cell("type=parking", cell, center_lat, center_lng)
+    )
+
+    assert status is None
+    assert len(urls) == 2
+    assert "pagetoken=1" in urls[1]
+    assert len(catalogue._cells[("type=parking", cell)][1]) == 25
+    assert catalogue.stats()["page_fetches"] == 1
+
+
+def test_page_token_is_retried_until_valid(monkeypatch):
+    first = {
+        "status": "OK",
+        "results": [place(i) for i in range(20)],
+        "next_page_token": "1",
+    }
+    attempts = []
+
+    async def fetch_json(session, url):
+        if "pagetoken=" not in url:
+            return first
+        attempts.append(url)
+        if len(attempts) == 1:
+            return {"status": "INVALID_REQUEST"}
+        return {"status": "OK", "results": [place(20)]}
+
+    monkeypatch.setattr(parking_catalogue, "fetch_json", fetch_json)
+
+    catalogue = ParkingCatalogue(db_path=None, page_delay=0)
+    result = asyncio.run(catalogue.nearby(LAT, LNG, 10, "type=parking"))
+
+    assert len(attempts) == 2
+    assert len(result["results"]) == 21
+
+
+def test_failed_follow_up_page_is_not_cached(monkeypatch):
+    first = {
+        "status": "OK",
+        "results": [place(i) for i in range(20)],
+        "next_page_token": "1",
+    }
+    fake_places([first, {"status": "OVER_QUERY_LIMIT"}], monkeypatch)
+
+    catalogue = ParkingCatalogue(db_path=None, page_delay=0)
+    cell, center_lat, center_lng = cells_in_radius(LAT, LNG, 10)[0]
+    status = asyncio.run(
+        catalogue._fetch_cell("type=parking", cell, center_lat, center_lng)
+    )
+
+    assert status == "OVER_QUERY_LIMIT"
+    assert ("type=parking", cell) not in catalogue._cells
+
+
+def test_pages_stop_at_max_pages(monkeypatch):
+    pages = [
+        {
+            "status": "OK",
+            "results": [place(page * 20 + i) for i in range(20)],
+            "next_page_token": str(page + 1),
+        }
+        for page in range(3)
+    ]
+    urls = fake_places(pages, monkeypatch)
+
+    catalogue = ParkingCatalogue(db_path=None, max_pages=2, page_delay=0)
+    cell, center_lat, center_lng = cells_in_radius(LAT, LNG, 10)[0]
+    asyncio.run(catalogue._fetch_cell("type=parking", cell, center_lat, center_lng))
+
+    assert len(urls) == 2
+    assert len(catalogue._cells[("type=parking", cell)][1]) == 40
+    assert catalogue.stats()["truncated_cells"] == 1
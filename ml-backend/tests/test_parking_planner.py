@@ -0,0 +1,102 @@
+import asyncio
+
+import parking_planner
+from parking_catalogue import METERS_PER_DEGREE
+from parking_planner import ParkingQueryPlan
+
+
+def hotspot(index):
+    # 2km apart, so no two hotspots are merged or near each other's places
+    return {"location": f"Hotspot {index}", "lat": 12.9 + index * 0.02, "lng": 77.6}
+
+
+def place_at(hotspot, metres, place_id):
+    return {
+        "place_id": place_id,
+        "name": place_id,
+        "geometry": {
+            "location": {
+                "lat": hotspot["lat"] + metres / METERS_PER_DEGREE,
+                "lng": hotspot["lng"],
+            }
+        },
+    }
+
+
+class FakeCatalogue:
+    """Answers only alternative searches, with one place per hotspot and type"""
+
+    def __init__(self, metres):
+        self.metres = metres
+        self.searched = set()
+
+    async def nearby(self, lat, lng, radius, query):
+        if not query.startswith("type=") or "parking" in query:
+            return {"status": "ZERO_RESULTS", "results": []}
+        self.searched.add((lat, lng))
+        place_id = f"{query}@{lat}"
+        return {
+            "status": "OK",
+            "results": [place_at({"lat": lat, "lng": lng}, self.metres, place_id)],
+        }
+
+
+def run_plan(monkeypatch, catalogue, hotspots, **kwargs):
+    monkeypatch.setattr(parking_planner, "parking_catalogue", catalogue)
+    plan = ParkingQueryPlan(hotspots, radius=300, max_results=3, **kwargs)
+    return plan, asyncio.run(plan.run())
+
+
+def test_alternative_stage_is_limited_to_leading_hotspots(monkeypatch):
+    catalogue = FakeCatalogue(metres=250)
+    hotspots = [hotspot(i) for i in range(8)]
+
+    run_plan(
+        monkeypatch, catalogue, hotspots, min_edge_spots=100, alternative_hotspots=3
+    )
+
+    assert catalogue.searched == {(h["lat"], h["lng"]) for h in hotspots[:3]}
+
+
+def test_alternatives_outside_the_edge_ring_do_not_count(monkeypatch):
+    # 400m is within the alternative radius (500m) but beyond the 300m radius
+    catalogue = FakeCatalogue(metres=400)
+
+    plan, spots = run_plan(monkeypatch, catalogue, [hotspot(0)], min_edge_spots=1)
+
+    assert spots
+    assert all(spot["is_edge_location"] is False for spot in spots)
+    assert plan.edge_spots == 0
+
+
+def test_alternatives_inside_the_edge_ring_count(monkeypatch):
+    catalogue = FakeCatalogue(metres=250)
+
+    plan, spots = run_plan(monkeypatch, catalogue, [hotspot(0)], min_edge_spots=1)
+
+    assert [spot["is_edge_location"] for spot in spots] == [True]
+    assert plan.satisfied
+
+
+def test_edge_location_only_checks_its_own_hotspot(monkeypatch):
+    own = hotspot(0)
+    # 400m north of its neighbour: not merged, and 150m from the spot
+    other = {
+        "location": "Other",
+        "lat": own["lat"] + 400 / METERS_PER_DEGREE,
+        "lng": own["lng"],
+    }
+    spot = place_at(own, 250, "spot")
+
+    class OfficialCatalogue:
+        async def nearby(self, lat, lng, radius, query):
+            if lat == own["lat"] and query == parking_planner.PARKING_QUERY:
+                return {"status": "OK", "results": [spot]}
+            return {"status": "ZERO_RESULTS", "results": []}
+
+    plan, spots = run_plan(
+        monkeypatch, OfficialCatalogue(), [own, other], min_edge_spots=1
+    )
+
+    assert [s["is_edge_location"] for s in spots] == [True]
+    assert plan.satisfied
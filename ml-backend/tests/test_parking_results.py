@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from parking_results import (
+    ParkingResultStore,
+    decode_cursor,
+    encode_cursor,
+    spot_id,
+)
+
+FIND_PARKING = "/api/find-parking?lat=12.9716&lng=77.5946&limit=2"
+
+
+def spot(place_id, hotspot_lat=12.97):
+    return {
+        "place_id": place_id,
+        "lat": 12.971,
+        "lng": 77.594,
+        "nearby_hotspot": {"name": "Hotspot", "lat": hotspot_lat, "lng": 77.59},
+    }
+
+
+def body(response):
+    return json.loads(response.text)
+
+
+def test_spot_id_is_stable():
+    assert spot_id(spot("a")) == spot_id(dict(spot("a"), name="renamed"))
+    assert spot_id(spot("a")) != spot_id(spot("b"))
+    # The same place walked to another hotspot is another spot
+    assert spot_id(spot("a")) != spot_id(spot("a", hotspot_lat=12.98))
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("abc123", 20)) == ("abc123", 20)
+    for cursor in ("", "abc", "abc.", ".5", "abc.-1", "abc.x"):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_store_pages_to_the_end():
+    store = ParkingResultStore(db_path=None)
+    result_id, saved = store.save([spot(str(i)) for i in range(5)])
+
+    page, cursor, total = store.page(result_id, 0, 2)
+    assert [s["place_id"] for s in page] == ["0", "1"] and total == 5
+    page, cursor, _ = store.page(*decode_cursor(cursor), 2)
+    assert [s["place_id"] for s in page] == ["2", "3"]
+    page, cursor, _ = store.page(*decode_cursor(cursor), 2)
+    assert [s["place_id"] for s in page] == ["4"] and cursor is None
+    assert store.page(result_id, 10, 2) == ([], None, 5)
+
+    assert store.spot(saved[3]["spot_id"])["place_id"] == "3"
+    assert store.page("unknown", 0, 2) is None
+
+
+def test_store_shares_results_through_sqlite(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    result_id, saved = ParkingResultStore(db_path=path).save([spot("a")])
+
+    # Another worker on the same host
+    other = ParkingResultStore(db_path=path)
+    assert other.page(result_id, 0, 10)[0] == saved
+    assert other.spot(saved[0]["spot_id"]) == saved[0]
+
+
+def test_expired_results_stop_resolving():
+    store = ParkingResultStore(db_path=None, ttl=0)
+    result_id, saved = store.save([spot("a")])
+    assert store.page(result_id, 0, 10) is None
+    assert store.spot(saved[0]["spot_id"]) is None
+
+
+def test_paging_through_a_response(client, fake_maps):
+    first = body(client.get(FIND_PARKING))
+    total = first["total_parking_spots"]
+    assert total > 2
+
+    ids = [s["spot_id"] for s in first["parking_spots"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        response = client.get(f"/api/parking-spots?cursor={cursor}&limit=2")
+        assert response.status_code == 200
+        page = body(response)
+        assert page["total_parking_spots"] == total
+        ids.extend(s["spot_id"] for s in page["parking_spots"])
+        cursor = page["next_cursor"]
+    assert len(ids) == len(set(ids)) == total
+
+    # Past the last page: empty, with no further cursor
+    result_id, _ = decode_cursor(first["next_cursor"])
+    past = body(client.get(f"/api/parking-spots?cursor={result_id}.{total + 5}"))
+    assert past["parking_spots"] == [] and past["next_cursor"] is None
+
+    # The same search gives the same spot ids
+    again = body(client.get(FIND_PARKING))
+    assert [s["spot_id"] for s in again["parking_spots"]] == ids[:2]
+
+
+@pytest.mark.parametrize(
+    "cursor, status", [("", 400), ("not-a-cursor", 400), ("0123456789abcdef.0", 404)]
+)
+def test_bad_cursors(client, cursor, status):
+    response = client.get(f"/api/parking-spots?cursor={cursor}")
+    assert response.status_code == status
+    assert body(response)["status"] == "error"
+
+
+def test_walking_details(client, fake_maps):
+    first = body(client.get(FIND_PARKING))
+    spot_id_ = first["parking_spots"][0]["spot_id"]
+
+    response = client.get(f"/api/parking-spots/{spot_id_}/walking")
+    assert response.status_code == 200
+    details = body(response)
+    assert details["spot_id"] == spot_id_
+    assert details["walking_info"]["steps"]
+
+    # A second lookup is served from the walking leg cache
+    calls = len(fake_maps)
+    assert client.get(f"/api/parking-spots/{spot_id_}/walking").status_code == 200
+    assert len(fake_maps) == calls
+
+    response = client.get("/api/parking-spots/0123456789abcdef/walking")
+    assert response.status_code == 404
@@ -0,0 +1,66 @@
+import asyncio
+from urllib.parse import parse_qsl, urlsplit
+
+import traffic_probes
+from traffic_probes import PROBE_BATCH_SIZE, async_measure_congestion
+
+
+def fake_matrix(monkeypatch):
+    """Distance Matrix whose element for (origin, destination) encodes both"""
+    requests = []
+
+    async def fetch_json(session, url):
+        params = dict(parse_qsl(urlsplit(url).query))
+        origins = params["origins"].split("|")
+        destinations = params["destinations"].split("|")
+        requests.append((len(origins), len(destinations)))
+        rows = []
+        for origin in origins:
+            lat = float(origin.split(",")[0])
+            elements = []
+            for destination in destinations:
+                dest_lat = float(destination.split(",")[0])
+                elements.append(
+                    {
+                        "status": "OK",
+                        "duration": {"value": 100},
+                        # Every element of a row differs, so reading the wrong one fails
+                        "duration_in_traffic": {
+                            "value": round(100 + lat * 1000 + dest_lat * 1000)
+                        },
+                    }
+                )
+            rows.append({"elements": elements})
+        return {"status": "OK", "rows": rows}
+
+    monkeypatch.setattr(traffic_probes, "fetch_json", fetch_json)
+    return requests
+
+
+def probes(count):
+    # Probe i's own element has duration_in_traffic 100 + 2i
+    return [
+        {"lat": i / 1000, "lng": 77.5, "dest_lat": i / 1000, "dest_lng": 77.5}
+        for i in range(count)
+    ]
+
+
+def test_default_batches_pack_probes_into_few_requests(monkeypatch):
+    requests = fake_matrix(monkeypatch)
+
+    factors = asyncio.run(async_measure_congestion(probes(60)))
+
+    assert PROBE_BATCH_SIZE == 10
+    assert requests == [(10, 10)] * 6
+    assert factors == [(100 + 2 * i) / 100 for i in range(60)]
+
+
+def test_batched_factors_match_per_probe_requests(monkeypatch):
+    requests = fake_matrix(monkeypatch)
+
+    batched = asyncio.run(async_measure_congestion(probes(23), batch_size=10))
+    single = asyncio.run(async_measure_congestion(probes(23), batch_size=1))
+
+    assert batched == single
+    assert requests[:3] == [(10, 10), (10, 10), (3, 3)]
+    assert len(requests) == 3 + 23
@@ -0,0 +1,107 @@
+import asyncio
+
+import walking_legs
+from walking_legs import pack_legs
+
+
+def billed_and_needed(legs, batches):
+    billed = {
+        (o, d)
+        for origins, destinations in batches
+        for o in origins
+        for d in destinations
+    }
+    return billed, set(legs)
+
+
+def test_pack_legs_bills_only_needed_elements():
+    hotspot_a, hotspot_b = (12.97, 77.59), (12.98, 77.60)
+    legs = [((12.90 + i / 1000, 77.50), hotspot_a) for i in range(5)]
+    legs += [((12.95 + i / 1000, 77.55), hotspot_b) for i in range(5)]
+
+    batches = pack_legs(legs)
+    billed, needed = billed_and_needed(legs, batches)
+
+    assert billed == needed
+    assert sum(len(o) * len(d) for o, d in batches) == len(needed)
+
+
+def test_pack_legs_shares_requests_for_identical_origin_sets():
+    origins = [(12.90 + i / 1000, 77.50) for i in range(10)]
+    hotspots = [(12.97, 77.59 + i / 1000) for i in range(12)]
+    legs = [(origin, hotspot) for hotspot in hotspots for origin in origins]
+
+    batches = pack_legs(legs)
+    billed, needed = billed_and_needed(legs, batches)
+
+    assert billed == needed
+    # 10 origins x 10 destinations fill one request; the last 2 take another
+    assert len(batches) == 2
+    assert all(len(o) * len(d) <= 100 for o, d in batches)
+
+
+def test_pack_legs_splits_large_groups():
+    hotspot = (12.97, 77.59)
+    legs = [((12.90 + i / 1000, 77.50), hotspot) for i in range(60)]
+
+    batches = pack_legs(legs)
+
+    assert [len(origins) for origins, _ in batches] == [25, 25, 10]
+    assert billed_and_needed(legs, batches)[0] == set(legs)
+
+
+def expired_cache(monkeypatch, response):
+    calls = []
+
+    async def fetch_json(session, url):
+        calls.append(url)
+        return response
+
+    monkeypatch.setattr(walking_legs, "fetch_json", fetch_json)
+    cache = walking_legs.WalkingLegCache(db_path=None, ttl=60)
+    leg = ((12.9, 77.5), (12.91, 77.51))
+    summary = {
+        "distance": "1 km",
+        "distance_meters": 1000,
+        "duration": "12 mins",
+        "duration_seconds": 720,
+    }
+    cache._summaries[cache.key(*leg)] = (0, summary)
+    return cache, leg, calls
+
+
+def test_expired_summary_is_refreshed(monkeypatch):
+    response = {
+        "status": "OK",
+        "rows": [
+            {
+                "elements": [
+                    {
+                        "status": "OK",
+                        "distance": {"text": "1.1 km", "value": 1100},
+                        "duration": {"text": "14 mins", "value": 840},
+                    }
+                ]
+            }
+        ],
+    }
+    cache, leg, calls = expired_cache(monkeypatch, response)
+
+    [summary] = asyncio.run(cache.summaries([leg]))
+
+    assert len(calls) == 1
+    assert summary["distance_meters"] == 1100
+    assert "stale" not in summary
+
+
+def test_expired_summary_is_flagged_stale_when_refresh_fails(monkeypatch):
+    cache, leg, calls = expired_cache(monkeypatch, {"status": "OVER_QUERY_LIMIT"})
+
+    [summary] = asyncio.run(cache.summaries([leg]))
+    assert summary["distance_meters"] == 1000
+    assert summary["stale"] is True
+
+    # Still expired, so the next request tries again
+    asyncio.run(cache.summaries([leg]))
+    assert len(calls) == 2
+    assert cache.stats()["stale_served"] == 2
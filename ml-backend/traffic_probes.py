@@ -0,0 +1,439 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from async_runtime import io_loop
+from geocode_cache import geocode_cache
+from maps_client import MAPS_BASE_URL, ROADS_BASE_URL, fetch_json
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Distance Matrix allows 25 origins, 25 destinations and 100 elements per
+# request. Each probe only needs its own origin -> destination element (the
+# matrix diagonal), so a square batch of 10 packs the most probes per request.
+# Google bills every element, so a batch of n probes bills n*n elements:
+# fewer requests at n times the element cost. 1 bills one element per probe.
+MAX_MATRIX_ELEMENTS = 100
+MAX_MATRIX_SIDE = 25
+PROBE_BATCH_SIZE = max(
+    1,
+    min(
+        int(os.environ.get("TRAFFIC_PROBE_BATCH_SIZE", 10)),
+        MAX_MATRIX_SIDE,
+        int(MAX_MATRIX_ELEMENTS**0.5),
+    ),
+)
+# Offset of each probe's destination from its origin, in degrees
+PROBE_OFFSET = 0.001
+
+# Bump when the probe set layout or the way probes are derived changes
+PROBE_SET_VERSION = 1
+# Directory holding one JSON file per city and grid configuration
+PROBE_SET_DIR = os.environ.get(
+    "TRAFFIC_PROBE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "probe_sets"),
+)
+# Grid around the city center: ~11km in each direction
+GRID_LAT_SPAN = 0.1
+GRID_LNG_SPAN = 0.1
+# snapToRoads accepts at most 100 points per path
+SNAP_BATCH_SIZE = 100
+
+
+def probe_destination(lat: float, lng: float) -> Tuple[float, float]:
+    """Destination paired with a probe origin for the congestion measurement"""
+    return lat + PROBE_OFFSET, lng + PROBE_OFFSET
+
+
+def congestion_from_element(element: Dict) -> Optional[float]:
+    """Ratio of duration_in_traffic to duration for one matrix element"""
+    if element.get("status") != "OK":
+        return None
+
+    duration = element.get("duration", {}).get("value", 0)
+    duration_in_traffic = element.get("duration_in_traffic", {}).get("value", 0)
+    if duration > 0 and duration_in_traffic > 0:
+        return duration_in_traffic / duration
+    return None
+
+
+async def async_measure_congestion(
+    probes: List[Dict[str, Any]],
+    batch_size: int = PROBE_BATCH_SIZE,
+) -> List[Optional[float]]:
+    """
+    Measure the congestion factor at many probes with Distance Matrix calls.
+
+    Probes are packed batch_size at a time into one request whose origins are
+    the probes and whose destinations are their probe destinations, in the
+    same order; element [i][i] of the response belongs to probe i. Every
+    element of the matrix is billed, so a batch costs batch_size times the
+    elements of per-probe requests.
+
+    Args:
+        probes: Dicts with 'lat', 'lng', 'dest_lat' and 'dest_lng'
+        batch_size: Probes per request
+
+    Returns:
+        Congestion factor per probe, in input order (None where unavailable)
+    """
+    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+
+    async def measure_batch(batch):
+        origins_param = "|".join(f"{p['lat']},{p['lng']}" for p in batch)
+        destinations_param = "|".join(f"{p['dest_lat']},{p['dest_lng']}" for p in batch)
+        traffic_url = (
+            f"{MAPS_BASE_URL}/maps/api/distancematrix/json?"
+            f"origins={origins_param}&destinations={destinations_param}"
+            f"&departure_time=now&traffic_model=best_guess&key={api_key}"
+        )
+
+        try:
+            traffic_data = await fetch_json(io_loop.session, traffic_url)
+        except Exception as e:
+            logger.error(f"Error measuring congestion for {len(batch)} probes: {e}")
+            return [None] * len(batch)
+
+        if traffic_data.get("status") != "OK":
+            logger.warning(
+                f"Distance Matrix probe batch failed: {traffic_data.get('status')}"
+            )
+            return [None] * len(batch)
+
+        rows = traffic_data.get("rows", [])
+        factors = []
+        for i in range(len(batch)):
+            elements = rows[i].get("elements", []) if i < len(rows) else []
+            factors.append(
+                congestion_from_element(elements[i]) if i < len(elements) else None
+            )
+        return factors
+
+    batches = [probes[i : i + batch_size] for i in range(0, len(probes), batch_size)]
+    results = await asyncio.gather(*(measure_batch(batch) for batch in batches))
+    return [factor for batch_factors in results for factor in batch_factors]
+
+
+def grid_points(
+    center_lat: float, center_lng: float, sample_points: int
+) -> List[Tuple[float, float]]:
+    """Roughly square grid of sample_points points centered on the city"""
+    grid_size = int(sample_points**0.5)
+    points = []
+    for i in range(grid_size):
+        for j in range(grid_size):
+            lat = center_lat + (i - grid_size / 2) * GRID_LAT_SPAN / grid_size
+            lng = center_lng + (j - grid_size / 2) * GRID_LNG_SPAN / grid_size
+            points.append((lat, lng))
+    return points
+
+
+def make_probe(lat: float, lng: float, place_id: Optional[str]) -> Dict[str, Any]:
+    """Probe at a (snapped) road position together with its probe destination"""
+    dest_lat, dest_lng = probe_destination(lat, lng)
+    return {
+        "lat": lat,
+        "lng": lng,
+        "place_id": place_id,
+        "dest_lat": dest_lat,
+        "dest_lng": dest_lng,
+    }
+
+
+def point_key(lat: float, lng: float) -> str:
+    """Stable key of an unsnapped sample point (~10cm resolution)"""
+    return f"{lat:.6f},{lng:.6f}"
+
+
+async def async_city_center(city: str) -> Optional[Tuple[float, float]]:
+    """Geocode a city name through the shared geocode cache"""
+    found, cached = geocode_cache.get(city)
+    if found:
+        return (cached["lat"], cached["lng"]) if cached else None
+
+    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+    geocode_url = f"{MAPS_BASE_URL}/maps/api/geocode/json?address={city}&key={api_key}"
+    geocode_data = await fetch_json(io_loop.session, geocode_url)
+
+    if geocode_data.get("status") != "OK" or not geocode_data.get("results"):
+        logger.error(f"Failed to geocode city: {city}")
+        return None
+
+    result = geocode_data["results"][0]
+    location = result["geometry"]["location"]
+    geocode_cache.set(
+        city,
+        {
+            "lat": location["lat"],
+            "lng": location["lng"],
+            "formatted_address": result.get("formatted_address", city),
+        },
+    )
+    return location["lat"], location["lng"]
+
+
+async def async_build_probe_set(city: str, sample_points: int) -> List[Dict[str, Any]]:
+    """
+    Geocode the city, lay a grid over it and snap the grid to roads.
+
+    Returns:
+        Probes with snapped 'lat'/'lng', 'place_id' and the probe destination
+        ('dest_lat'/'dest_lng'); empty if geocoding or snapping failed
+    """
+    api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+
+    center = await async_city_center(city)
+    if center is None:
+        return []
+    points = grid_points(center[0], center[1], sample_points)
+
+    async def snap_batch(batch_points):
+        paths = "|".join(f"{lat},{lng}" for lat, lng in batch_points)
+        roads_url = f"{ROADS_BASE_URL}/v1/snapToRoads?path={paths}&interpolate=true&key={api_key}"
+
+        roads_data = await fetch_json(io_loop.session, roads_url)
+
+        if "snappedPoints" not in roads_data:
+            logger.warning(f"snapToRoads returned no points for {city}")
+            return []
+
+        return [
+            make_probe(
+                point["location"]["latitude"],
+                point["location"]["longitude"],
+                point.get("placeId"),
+            )
+            for point in roads_data["snappedPoints"]
+        ]
+
+    snap_tasks = [
+        snap_batch(points[i : i + SNAP_BATCH_SIZE])
+        for i in range(0, len(points), SNAP_BATCH_SIZE)
+    ]
+    return [probe for batch in await asyncio.gather(*snap_tasks) for probe in batch]
+
+
+class ProbeSetStore:
+    """
+    Snapped road probes per city and grid configuration, persisted as JSON.
+
+    Road geometry does not change between scans, so the city geocode and the
+    snapToRoads calls run once per configuration; later scans only measure
+    congestion on the stored probes. Each file records the grid parameters it
+    was built with, and the file name is derived from them (and from
+    PROBE_SET_VERSION), so changing any of them builds a new set.
+    """
+
+    def __init__(self, directory: str = PROBE_SET_DIR):
+        self.directory = directory
+        self._sets: Dict[str, Dict[str, Any]] = {}
+        self._building: Dict[str, asyncio.Task] = {}
+        # Individually snapped points (adaptive sampling), per city
+        self._points: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"loaded": 0, "built": 0, "points_snapped": 0}
+
+    @staticmethod
+    def grid_params(city: str, sample_points: int) -> Dict[str, Any]:
+        """Everything that determines the probes of one configuration"""
+        return {
+            "version": PROBE_SET_VERSION,
+            "city": city,
+            "sample_points": sample_points,
+            "lat_span": GRID_LAT_SPAN,
+            "lng_span": GRID_LNG_SPAN,
+            "probe_offset": PROBE_OFFSET,
+        }
+
+    @staticmethod
+    def point_params(city: str) -> Dict[str, Any]:
+        """Everything that determines the individually snapped points of a city"""
+        return {
+            "version": PROBE_SET_VERSION,
+            "city": city,
+            "kind": "points",
+            "probe_offset": PROBE_OFFSET,
+        }
+
+    @staticmethod
+    def _slug(city: str) -> str:
+        return "".join(c if c.isalnum() else "_" for c in city.casefold())
+
+    def key(self, city: str, sample_points: int) -> str:
+        params = json.dumps(self.grid_params(city, sample_points), sort_keys=True)
+        digest = hashlib.sha1(params.encode("utf-8")).hexdigest()[:10]
+        return f"{self._slug(city)}-{sample_points}-v{PROBE_SET_VERSION}-{digest}"
+
+    def points_key(self, city: str) -> str:
+        return f"{self._slug(city)}-points-v{PROBE_SET_VERSION}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self):
+        """Load every probe set on disk that matches the current version"""
+        if not os.path.isdir(self.directory):
+            return
+
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    probe_set = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable probe set {filename}: {e}")
+                continue
+
+            # Sets built with other grid parameters or an older version are ignored
+            params = probe_set.get("params", {})
+            city, sample_points = params.get("city"), params.get("sample_points")
+            if params == self.point_params(city):
+                self._points[city] = probe_set
+            elif params == self.grid_params(city, sample_points):
+                self._sets[self.key(city, sample_points)] = probe_set
+                self._stats["loaded"] += 1
+
+        logger.info(
+            f"Loaded {len(self._sets)} traffic probe sets from {self.directory}"
+        )
+
+    def _save(self, key: str, probe_set: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(probe_set, f)
+        os.replace(tmp_path, path)
+
+    async def _build(self, key: str, city: str, sample_points: int):
+        try:
+            probes = await async_build_probe_set(city, sample_points)
+            if not probes:
+                # Do not persist failures; the next scan tries again
+                return []
+
+            probe_set = {
+                "params": self.grid_params(city, sample_points),
+                "created_at": time.time(),
+                "probes": probes,
+            }
+            self._sets[key] = probe_set
+            self._stats["built"] += 1
+            try:
+                self._save(key, probe_set)
+            except OSError as e:
+                logger.warning(f"Could not save probe set {key}: {e}")
+            logger.info(f"Built {len(probes)} traffic probes for {key}")
+            return probes
+        finally:
+            self._building.pop(key, None)
+
+    async def get(self, city: str, sample_points: int) -> List[Dict[str, Any]]:
+        """Return the probes for a configuration, building them on first use"""
+        key = self.key(city, sample_points)
+        probe_set = self._sets.get(key)
+        if probe_set is not None:
+            return probe_set["probes"]
+
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._build(key, city, sample_points))
+            self._building[key] = task
+        return await asyncio.shield(task)
+
+    async def snap_points(
+        self, city: str, points: List[Tuple[float, float]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Snap individual sample points to roads, one probe per point.
+
+        Snapped points are remembered per city and persisted, so each point is
+        only ever snapped once. Points snapToRoads cannot place on a road are
+        probed at their raw position (Distance Matrix snaps origins itself).
+
+        Returns:
+            Probes in the same order as points
+        """
+        api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+        point_set = self._points.setdefault(
+            city, {"params": self.point_params(city), "probes": {}}
+        )
+        known = point_set["probes"]
+        missing = list(
+            dict.fromkeys(
+                point_key(lat, lng)
+                for lat, lng in points
+                if point_key(lat, lng) not in known
+            )
+        )
+
+        async def snap_batch(batch_keys):
+            paths = "|".join(batch_keys)
+            roads_url = f"{ROADS_BASE_URL}/v1/snapToRoads?path={paths}&key={api_key}"
+            roads_data = await fetch_json(io_loop.session, roads_url)
+
+            if "snappedPoints" not in roads_data:
+                # Leave the points unsnapped for now and retry on a later scan
+                logger.warning(f"snapToRoads failed for {len(batch_keys)} points")
+                return {}
+
+            snapped = {}
+            for point in roads_data["snappedPoints"]:
+                index = point.get("originalIndex")
+                if index is not None and index < len(batch_keys):
+                    snapped[batch_keys[index]] = make_probe(
+                        point["location"]["latitude"],
+                        point["location"]["longitude"],
+                        point.get("placeId"),
+                    )
+            for key in batch_keys:
+                if key not in snapped:
+                    lat, lng = (float(v) for v in key.split(","))
+                    snapped[key] = make_probe(lat, lng, None)
+            return snapped
+
+        if missing:
+            results = await asyncio.gather(
+                *(
+                    snap_batch(missing[i : i + SNAP_BATCH_SIZE])
+                    for i in range(0, len(missing), SNAP_BATCH_SIZE)
+                )
+            )
+            added = 0
+            for snapped in results:
+                known.update(snapped)
+                added += len(snapped)
+            self._stats["points_snapped"] += added
+            if added:
+                try:
+                    self._save(self.points_key(city), point_set)
+                except OSError as e:
+                    logger.warning(f"Could not save snapped points for {city}: {e}")
+
+        return [
+            known.get(point_key(lat, lng)) or make_probe(lat, lng, None)
+            for lat, lng in points
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Probe set counts per configuration"""
+        return {
+            **self._stats,
+            "sets": {
+                key: len(probe_set["probes"])
+                for key, probe_set in list(self._sets.items())
+            },
+            "snapped_points": {
+                city: len(point_set["probes"])
+                for city, point_set in list(self._points.items())
+            },
+        }
+
+
+# Process-wide probe sets used by the hotspot scan
+probe_store = ProbeSetStore()
@@ -1,10 +1,13 @@
 import os
 import logging
+import argparse
+from chunked_training import DEFAULT_CHUNK_SIZE, train_chunked
 from namma_yatri_recommender import (
     load_data,
     preprocess_data,
     analyze_location_patterns,
     build_time_blocks,
+    resolve_assembly_coordinates,
     save_model,
 )
 
@@ -14,44 +17,71 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def train_and_save_model():
-    """Function to train the model and save it."""
+def train_and_save_model(
+    stream_path=None, chunk_size=DEFAULT_CHUNK_SIZE, refresh_coordinates=False
+):
+    """
+    Function to train the model and save it.
+
+    With stream_path, trips are read a chunk at a time from a directory of
+    per-sheet CSV/Parquet files (or a workbook converted to one), so memory
+    stays bounded however long the trip history is.
+    """
     try:
         # Define file paths
         excel_path = "./namma_yatri_data.xlsx"
         model_path = "./namma_yatri_location_model.pkl"
+        coordinates_path = "./assembly_coordinates.json"
 
-        # Check if Excel file exists
-        if not os.path.exists(excel_path):
-            logger.error(f"Excel file not found: {excel_path}")
-            return
+        if stream_path:
+            if not os.path.exists(stream_path):
+                logger.error(f"Training data not found: {stream_path}")
+                return
 
-        # Load and preprocess the data
-        logger.info(f"Loading data from {excel_path}")
-        trips_df, trip_details_df, duration_df, assembly_df = load_data(excel_path)
+            # Count completed trips chunk by chunk
+            logger.info(f"Streaming data from {stream_path} in chunks of {chunk_size}")
+            top_locations_by_hour, location_totals, duration_map, assembly_map = (
+                train_chunked(stream_path, chunk_size)
+            )
+        else:
+            # Check if Excel file exists
+            if not os.path.exists(excel_path):
+                logger.error(f"Excel file not found: {excel_path}")
+                return
 
-        # Preprocess the data
-        logger.info("Preprocessing data")
-        completed_trips, duration_map, assembly_map = preprocess_data(
-            trips_df, trip_details_df, duration_df, assembly_df
-        )
+            # Load and preprocess the data
+            logger.info(f"Loading data from {excel_path}")
+            trips_df, trip_details_df, duration_df, assembly_df = load_data(excel_path)
 
-        # Analyze patterns
-        logger.info("Analyzing location patterns")
-        top_locations_by_hour, location_totals = analyze_location_patterns(
-            completed_trips
-        )
+            # Preprocess the data
+            logger.info("Preprocessing data")
+            completed_trips, duration_map, assembly_map = preprocess_data(
+                trips_df, trip_details_df, duration_df, assembly_df
+            )
+
+            # Analyze patterns
+            logger.info("Analyzing location patterns")
+            top_locations_by_hour, location_totals = analyze_location_patterns(
+                completed_trips
+            )
 
         # Build time blocks
         logger.info("Building time blocks")
         time_block_locations = build_time_blocks(top_locations_by_hour)
 
+        # Resolve assembly coordinates so the server does not geocode them live
+        logger.info("Resolving assembly coordinates")
+        assembly_coordinates = resolve_assembly_coordinates(
+            assembly_map, coordinates_path, refresh_coordinates
+        )
+
         # Save the model
         model_data = {
             "top_locations_by_hour": top_locations_by_hour,
             "location_totals": location_totals,
             "time_block_locations": time_block_locations,
             "duration_map": duration_map,
+            "assembly_coordinates": assembly_coordinates,
         }
 
         logger.info(f"Saving model to {model_path}")
@@ -62,5 +92,27 @@ def train_and_save_model():
     except Exception as e:
         logger.error(f"Error during training and saving the model: {str(e)}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the location model")
+    parser.add_argument(
+        "--stream",
+        metavar="PATH",
+        help="Train chunk by chunk from a directory of <Sheet>.csv/.parquet files or a workbook",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Rows read at a time in streaming mode",
+    )
+    parser.add_argument(
+        "--refresh-coordinates",
+        action="store_true",
+        help="Geocode every assembly again (needs GOOGLE_MAPS_API_KEY) and rewrite assembly_coordinates.json",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    train_and_save_model()
+    args = parse_args()
+    train_and_save_model(args.stream, args.chunk_size, args.refresh_coordinates)
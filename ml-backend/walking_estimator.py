@@ -0,0 +1,235 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from geo_distance import haversine, top_k
+from geocode_cache import geohash_encode
+from walking_legs import walking_legs
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Used until enough walking legs have been collected to calibrate
+DEFAULT_DETOUR_FACTOR = 1.3
+DEFAULT_WALKING_SPEED = 1.3  # metres per second
+# Walking legs needed before the calibrated model replaces the defaults
+MIN_CALIBRATION_SAMPLES = int(os.environ.get("WALKING_MIN_CALIBRATION_SAMPLES", 20))
+# Destination cells (geohash of this length, ~1.2km) with at least this many
+# legs get their own detour correction, e.g. around a railway or a lake
+AREA_PRECISION = 6
+AREA_MIN_SAMPLES = 5
+# Minimum seconds between refits as new walking legs arrive
+RECALIBRATE_INTERVAL = int(os.environ.get("WALKING_RECALIBRATE_INTERVAL", 600))
+# Spots kept by default in a parking response
+PARKING_TOP_K = int(os.environ.get("PARKING_TOP_K", 10))
+
+# Legs shorter than this are dominated by rounding of the cached endpoints
+MIN_SAMPLE_DISTANCE = 50
+# Walking / straight-line ratios outside this range are treated as bad data
+MIN_DETOUR, MAX_DETOUR = 1.0, 4.0
+
+
+class WalkingTimeEstimator:
+    """
+    Local walking distance and time model for parking spots.
+
+    Walking distance is modelled as intercept + slope * straight-line
+    distance, so the detour factor shrinks with distance the way street
+    grids do. The walking speed is the median speed of the collected legs,
+    and destination areas with enough legs get a correction factor. The
+    model is fitted on the walking legs already collected from Distance
+    Matrix and Directions, and refitted as new legs arrive.
+    """
+
+    def __init__(
+        self,
+        min_samples: int = MIN_CALIBRATION_SAMPLES,
+        recalibrate_interval: int = RECALIBRATE_INTERVAL,
+    ):
+        """
+        Args:
+            min_samples: Walking legs needed before the defaults are replaced
+            recalibrate_interval: Minimum seconds between refits
+        """
+        self.min_samples = min_samples
+        self.recalibrate_interval = recalibrate_interval
+
+        self._lock = threading.Lock()
+        self.intercept = 0.0
+        self.slope = DEFAULT_DETOUR_FACTOR
+        self.speed = DEFAULT_WALKING_SPEED
+        # destination geohash -> multiplicative correction of the walking distance
+        self.area_factors: Dict[str, float] = {}
+        self.samples_used = 0
+        self._calibrated_version = None
+        self._calibrated_at = 0.0
+
+    def calibrate(self, samples: List[Tuple[Tuple, Tuple, int, int]]):
+        """
+        Fit the model to collected walking legs.
+
+        Args:
+            samples: (origin, destination, walking metres, walking seconds) per leg
+        """
+        rows = [s for s in samples if s[2] > 0 and s[3] > 0]
+        if not rows:
+            return
+        origins = np.array([s[0] for s in rows], dtype=float)
+        destinations = np.array([s[1] for s in rows], dtype=float)
+        walked = np.array([s[2] for s in rows], dtype=float)
+        seconds = np.array([s[3] for s in rows], dtype=float)
+        straight = haversine(
+            origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1]
+        )
+
+        valid = straight >= MIN_SAMPLE_DISTANCE
+        ratio = np.divide(walked, straight, out=np.zeros_like(walked), where=valid)
+        valid &= (ratio >= MIN_DETOUR) & (ratio <= MAX_DETOUR)
+        if valid.sum() < self.min_samples:
+            return
+
+        straight, walked, seconds = straight[valid], walked[valid], seconds[valid]
+        slope, intercept = np.polyfit(straight, walked, 1)
+        if slope < MIN_DETOUR or intercept < 0:
+            # Not a plausible street network fit; fall back to a plain ratio
+            slope, intercept = float(np.median(walked / straight)), 0.0
+
+        predicted = intercept + slope * straight
+        areas: Dict[str, List[float]] = {}
+        for destination, actual, expected in zip(
+            destinations[valid], walked, predicted
+        ):
+            area = geohash_encode(destination[0], destination[1], AREA_PRECISION)
+            areas.setdefault(area, []).append(actual / expected)
+
+        with self._lock:
+            self.intercept = float(intercept)
+            self.slope = float(slope)
+            self.speed = float(np.median(walked / seconds))
+            self.area_factors = {
+                area: float(np.median(ratios))
+                for area, ratios in areas.items()
+                if len(ratios) >= AREA_MIN_SAMPLES
+            }
+            self.samples_used = int(valid.sum())
+
+        logger.info(
+            f"Walking model calibrated on {self.samples_used} legs: "
+            f"{self.intercept:.0f}m + {self.slope:.2f}x, {self.speed:.2f}m/s, "
+            f"{len(self.area_factors)} area corrections"
+        )
+
+    def refresh(self):
+        """Refit from the walking leg cache if it has gained legs since the last fit"""
+        version = walking_legs.version
+        if version == self._calibrated_version:
+            return
+        # Refit at once while uncalibrated, then at most every interval
+        if (
+            self.samples_used
+            and time.time() - self._calibrated_at < self.recalibrate_interval
+        ):
+            return
+        self._calibrated_version = version
+        self._calibrated_at = time.time()
+        self.calibrate(walking_legs.samples())
+
+    def estimate(
+        self, origins: np.ndarray, destinations: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Estimated walking metres and seconds for many legs at once.
+
+        Args:
+            origins: (N, 2) array of [lat, lng]
+            destinations: (N, 2) array of [lat, lng]
+
+        Returns:
+            (walking metres, walking seconds), one entry per leg
+        """
+        straight = haversine(
+            origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1]
+        )
+        walked = self.intercept + self.slope * straight
+        if self.area_factors:
+            # Many legs share a destination hotspot; encode each one once
+            factors = {}
+            for lat, lng in destinations.tolist():
+                if (lat, lng) not in factors:
+                    factors[(lat, lng)] = self.area_factors.get(
+                        geohash_encode(lat, lng, AREA_PRECISION), 1.0
+                    )
+            walked *= np.array([factors[tuple(d)] for d in destinations.tolist()])
+        return walked, walked / self.speed
+
+    def rank(
+        self, parking_spots: List[Dict[str, Any]], limit: Optional[int] = PARKING_TOP_K
+    ) -> List[Dict[str, Any]]:
+        """
+        Order parking spots by estimated walking time and keep the best `limit`.
+
+        Official edge locations come first, then other official parking,
+        then alternative (unofficial) places; each group is ordered by
+        estimated walking time to its hotspot. Every spot gains
+        'estimated_walking_seconds'.
+
+        Raises:
+            ValueError: If limit is negative
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must be 0 or more, got {limit}")
+        self.refresh()
+        with_hotspot = [spot for spot in parking_spots if "nearby_hotspot" in spot]
+        without_hotspot = [
+            spot for spot in parking_spots if "nearby_hotspot" not in spot
+        ]
+        if not with_hotspot:
+            return parking_spots[:limit] if limit is not None else parking_spots
+
+        origins = np.array([(s["lat"], s["lng"]) for s in with_hotspot], dtype=float)
+        destinations = np.array(
+            [
+                (s["nearby_hotspot"]["lat"], s["nearby_hotspot"]["lng"])
+                for s in with_hotspot
+            ],
+            dtype=float,
+        )
+        _, seconds = self.estimate(origins, destinations)
+        group = np.array(
+            [
+                (
+                    2
+                    if spot.get("is_unofficial")
+                    else 0 if spot.get("is_edge_location") else 1
+                )
+                for spot in with_hotspot
+            ]
+        )
+
+        # Groups are far apart on this scale, so one key orders both
+        keys = group * 1e7 + seconds
+        count = len(with_hotspot) if limit is None else limit
+        ranked = [
+            {**with_hotspot[i], "estimated_walking_seconds": round(float(seconds[i]))}
+            for i in top_k(keys, count).tolist()
+        ]
+        ranked.extend(without_hotspot)
+        return ranked[:limit] if limit is not None else ranked
+
+    def stats(self) -> Dict[str, Any]:
+        """Current model parameters"""
+        return {
+            "samples": self.samples_used,
+            "intercept_m": round(self.intercept, 1),
+            "detour_slope": round(self.slope, 3),
+            "speed_m_per_s": round(self.speed, 3),
+            "area_corrections": len(self.area_factors),
+        }
+
+
+# Process-wide model calibrated from the shared walking leg cache
+walking_estimator = WalkingTimeEstimator()
@@ -0,0 +1,392 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from async_runtime import io_loop
+from maps_client import MAPS_BASE_URL, fetch_json
+from traffic_probes import MAX_MATRIX_ELEMENTS, MAX_MATRIX_SIDE
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# SQLite file holding walking legs (empty string: memory only)
+DEFAULT_LEGS_PATH = os.environ.get(
+    "WALKING_LEGS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "walking_legs.sqlite3"),
+)
+# Decimals kept of each leg's endpoints: 4 is ~11m
+LEG_PRECISION = int(os.environ.get("WALKING_LEG_PRECISION", 4))
+# Walking legs are fetched again once older than this (seconds)
+LEG_TTL = int(os.environ.get("WALKING_LEG_TTL", 30 * 24 * 3600))
+# Leading spots of a response that get full step-by-step Directions up front;
+# the others are fetched per spot from the walking details endpoint
+DIRECTIONS_LIMIT = int(os.environ.get("WALKING_DIRECTIONS_LIMIT", 0))
+
+# Fields shared by a Distance Matrix summary and a Directions walking_info
+SUMMARY_FIELDS = ("distance", "distance_meters", "duration", "duration_seconds")
+
+Point = Tuple[float, float]
+
+
+def leg_key(origin: Point, destination: Point, precision: int = LEG_PRECISION) -> str:
+    """Cache key of a walking leg: both endpoints rounded to precision decimals"""
+    return (
+        f"{origin[0]:.{precision}f},{origin[1]:.{precision}f}>"
+        f"{destination[0]:.{precision}f},{destination[1]:.{precision}f}"
+    )
+
+
+def summary_from_element(element: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Walking distance and duration from one Distance Matrix element"""
+    if element.get("status") != "OK":
+        return None
+    return {
+        "distance": element.get("distance", {}).get("text", "Unknown"),
+        "distance_meters": element.get("distance", {}).get("value", 0),
+        "duration": element.get("duration", {}).get("text", "Unknown"),
+        "duration_seconds": element.get("duration", {}).get("value", 0),
+    }
+
+
+def walking_info_from_route(route: Dict[str, Any]) -> Dict[str, Any]:
+    """Walking summary, polyline and the first steps of a Directions route"""
+    leg = route["legs"][0]
+    walking_info = {
+        "distance": leg.get("distance", {}).get("text", "Unknown"),
+        "distance_meters": leg.get("distance", {}).get("value", 0),
+        "duration": leg.get("duration", {}).get("text", "Unknown"),
+        "duration_seconds": leg.get("duration", {}).get("value", 0),
+        "steps_count": len(leg.get("steps", [])),
+        "polyline": route.get("overview_polyline", {}).get("points", ""),
+    }
+
+    # Add simplified steps
+    steps = []
+    for step in leg.get("steps", [])[:3]:  # Limit to first 3 steps
+        steps.append(
+            {
+                "instruction": step.get("html_instructions", "")
+                .replace("<b>", "")
+                .replace("</b>", "")
+                .replace("<div>", " ")
+                .replace("</div>", ""),
+                "distance": step.get("distance", {}).get("text", ""),
+                "duration": step.get("duration", {}).get("text", ""),
+            }
+        )
+
+    if steps:
+        walking_info["steps"] = steps
+
+    return walking_info
+
+
+def pack_legs(
+    legs: List[Tuple[Point, Point]],
+    max_elements: int = MAX_MATRIX_ELEMENTS,
+    max_side: int = MAX_MATRIX_SIDE,
+) -> List[Tuple[List[Point], List[Point]]]:
+    """
+    Pack walking legs into Distance Matrix requests without unneeded elements.
+
+    Distance Matrix bills every origin x destination element, so a request
+    only combines destinations that need exactly the same origins, e.g.
+    hotspots close enough to share every parking spot; for those the full
+    product is needed. Any other destination gets requests of its own.
+
+    Returns:
+        (origins, destinations) per request
+    """
+    groups: Dict[Point, List[Point]] = {}
+    for origin, destination in legs:
+        origins = groups.setdefault(destination, [])
+        if origin not in origins:
+            origins.append(origin)
+
+    # Origin chunk -> destinations that need all of it; sorting makes equal
+    # origin sets split into equal chunks
+    side = min(max_side, max_elements)
+    shared: Dict[Tuple[Point, ...], List[Point]] = {}
+    for destination, group in groups.items():
+        group = sorted(group)
+        for start in range(0, len(group), side):
+            chunk = tuple(group[start : start + side])
+            shared.setdefault(chunk, []).append(destination)
+
+    batches = []
+    for chunk, destinations in shared.items():
+        per_request = max(1, min(max_side, max_elements // len(chunk)))
+        for start in range(0, len(destinations), per_request):
+            batches.append((list(chunk), destinations[start : start + per_request]))
+    return batches
+
+
+class WalkingLegCache:
+    """
+    Persistent cache of walking legs from parking spots to hotspots.
+
+    Each leg is keyed by its rounded (origin, destination). It holds a
+    summary (walking distance and duration), filled for many legs at a time
+    by batched Distance Matrix mode=walking requests, and optionally the
+    full walking_info from a Directions request, polyline and steps included.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = DEFAULT_LEGS_PATH,
+        precision: int = LEG_PRECISION,
+        ttl: int = LEG_TTL,
+    ):
+        """
+        Args:
+            db_path: Path of the SQLite file, or None/empty to keep legs in memory only
+            precision: Decimals kept of each endpoint in the cache key
+            ttl: Lifetime of a cached leg in seconds
+        """
+        self.db_path = db_path
+        self.precision = precision
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._conn = None
+        # leg key -> (fetched_at, summary)
+        self._summaries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # leg key -> (fetched_at, walking_info with polyline and steps)
+        self._routes: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # Bumped whenever legs are added, so calibrations know to refresh
+        self.version = 0
+        self._stats = {
+            "summary_hits": 0,
+            "summary_misses": 0,
+            "stale_served": 0,
+            "route_hits": 0,
+            "route_misses": 0,
+            "matrix_requests": 0,
+            "directions_requests": 0,
+        }
+
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS legs (leg_key TEXT, kind TEXT, "
+                    "fetched_at REAL, data TEXT, PRIMARY KEY (leg_key, kind))"
+                )
+                self._conn.execute(
+                    "DELETE FROM legs WHERE fetched_at < ?", (time.time() - ttl,)
+                )
+                self._conn.commit()
+                self._load()
+            except sqlite3.Error as e:
+                logger.error(f"Error opening walking legs at {db_path}: {str(e)}")
+                self._conn = None
+
+    def _load(self):
+        for key, kind, fetched_at, data in self._conn.execute(
+            "SELECT leg_key, kind, fetched_at, data FROM legs"
+        ):
+            target = self._routes if kind == "route" else self._summaries
+            target[key] = (fetched_at, json.loads(data))
+        self.version += 1
+
+        if self._summaries or self._routes:
+            logger.info(
+                f"Loaded {len(self._summaries)} walking leg summaries and "
+                f"{len(self._routes)} routes"
+            )
+
+    def _store(self, kind: str, entries: Dict[str, Dict[str, Any]]):
+        """Remember summaries or routes in memory and on disk"""
+        if not entries:
+            return
+        fetched_at = time.time()
+        target = self._routes if kind == "route" else self._summaries
+        with self._lock:
+            for key, data in entries.items():
+                target[key] = (fetched_at, data)
+            self.version += 1
+
+            if self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO legs (leg_key, kind, fetched_at, data) "
+                        "VALUES (?, ?, ?, ?)",
+                        [
+                            (key, kind, fetched_at, json.dumps(data))
+                            for key, data in entries.items()
+                        ],
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing walking legs: {str(e)}")
+
+    def _fresh(self, entry: Optional[Tuple[float, Dict[str, Any]]]) -> bool:
+        return entry is not None and time.time() - entry[0] < self.ttl
+
+    def key(self, origin: Point, destination: Point) -> str:
+        return leg_key(origin, destination, self.precision)
+
+    async def _fetch_matrix(
+        self, origins: List[Point], destinations: List[Point]
+    ) -> Dict[str, Dict[str, Any]]:
+        """One Distance Matrix mode=walking request; summaries of every element"""
+        api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+        origins_param = "|".join(f"{lat},{lng}" for lat, lng in origins)
+        destinations_param = "|".join(f"{lat},{lng}" for lat, lng in destinations)
+        matrix_url = (
+            f"{MAPS_BASE_URL}/maps/api/distancematrix/json?"
+            f"origins={origins_param}&destinations={destinations_param}"
+            f"&mode=walking&key={api_key}"
+        )
+
+        self._stats["matrix_requests"] += 1
+        try:
+            matrix_data = await fetch_json(io_loop.session, matrix_url)
+        except Exception as e:
+            logger.error(f"Error fetching walking matrix: {str(e)}")
+            return {}
+
+        if matrix_data.get("status") != "OK":
+            logger.warning(f"Walking matrix failed: {matrix_data.get('status')}")
+            return {}
+
+        summaries = {}
+        for origin, row in zip(origins, matrix_data.get("rows", [])):
+            for destination, element in zip(destinations, row.get("elements", [])):
+                summary = summary_from_element(element)
+                if summary is not None:
+                    summaries[self.key(origin, destination)] = summary
+        return summaries
+
+    async def summaries(
+        self, legs: List[Tuple[Point, Point]]
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        Walking distance and duration for many legs at once.
+
+        Cached legs are answered locally; the rest, expired ones included, are
+        fetched with batched Distance Matrix mode=walking requests that bill
+        only needed elements. An expired leg whose refresh fails is returned
+        with 'stale': True.
+
+        Args:
+            legs: (origin, destination) pairs of (lat, lng)
+
+        Returns:
+            Summary per leg, in input order (None where unavailable)
+        """
+        keys = [self.key(origin, destination) for origin, destination in legs]
+        missing = {}
+        for key, leg in zip(keys, legs):
+            route = self._routes.get(key)
+            if self._fresh(self._summaries.get(key)) or self._fresh(route):
+                self._stats["summary_hits"] += 1
+            elif key not in missing:
+                self._stats["summary_misses"] += 1
+                missing[key] = leg
+
+        if missing:
+            fetched = await asyncio.gather(
+                *(
+                    self._fetch_matrix(origins, destinations)
+                    for origins, destinations in pack_legs(list(missing.values()))
+                )
+            )
+            self._store(
+                "summary",
+                {key: summary for batch in fetched for key, summary in batch.items()},
+            )
+
+        results = []
+        for key in keys:
+            route = self._routes.get(key)
+            summary = self._summaries.get(key)
+            if self._fresh(route):
+                results.append({field: route[1][field] for field in SUMMARY_FIELDS})
+            elif self._fresh(summary):
+                results.append(dict(summary[1]))
+            elif summary or route:
+                # The refresh above failed; serve the expired leg flagged as
+                # stale rather than nothing. It stays expired, so the next
+                # request for it tries the refresh again.
+                stale = summary[1] if summary else route[1]
+                results.append(
+                    {**{field: stale[field] for field in SUMMARY_FIELDS}, "stale": True}
+                )
+                self._stats["stale_served"] += 1
+            else:
+                results.append(None)
+        return results
+
+    async def route(
+        self, origin: Point, destination: Point
+    ) -> Optional[Dict[str, Any]]:
+        """Full walking_info of one leg from Directions, cached"""
+        key = self.key(origin, destination)
+        cached = self._routes.get(key)
+        if self._fresh(cached):
+            self._stats["route_hits"] += 1
+            return dict(cached[1])
+        self._stats["route_misses"] += 1
+
+        api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+        directions_url = (
+            f"{MAPS_BASE_URL}/maps/api/directions/json?"
+            f"origin={origin[0]},{origin[1]}&destination={destination[0]},{destination[1]}"
+            f"&mode=walking&key={api_key}"
+        )
+
+        self._stats["directions_requests"] += 1
+        try:
+            directions_data = await fetch_json(io_loop.session, directions_url)
+        except Exception as e:
+            logger.error(f"Error fetching walking directions: {str(e)}")
+            return None
+
+        if directions_data.get("status") != "OK":
+            return None
+
+        walking_info = walking_info_from_route(directions_data["routes"][0])
+        self._store("route", {key: walking_info})
+        return dict(walking_info)
+
+    def samples(self) -> List[Tuple[Point, Point, int, int]]:
+        """
+        Every known leg as (origin, destination, walking metres, walking seconds).
+
+        Endpoints are the rounded ones from the cache key. Directions results
+        are preferred over matrix summaries for legs that have both.
+        """
+        with self._lock:
+            legs = {key: entry[1] for key, entry in self._summaries.items()}
+            legs.update((key, entry[1]) for key, entry in self._routes.items())
+
+        samples = []
+        for key, leg in legs.items():
+            origin, destination = key.split(">")
+            samples.append(
+                (
+                    tuple(map(float, origin.split(","))),
+                    tuple(map(float, destination.split(","))),
+                    leg.get("distance_meters", 0),
+                    leg.get("duration_seconds", 0),
+                )
+            )
+        return samples
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache sizes and hit/request counters"""
+        return {
+            **self._stats,
+            "summaries": len(self._summaries),
+            "routes": len(self._routes),
+        }
+
+
+# Process-wide cache shared by every parking response
+walking_legs = WalkingLegCache()